@@ -1,11 +1,55 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import session_context
+from app.clients.fhir_client import FHIRClient
+from app.services.write_behind import WriteBehindQueue
+from app.db.session import (
+    AsyncReadSessionLocal,
+    ReadSessionLocal,
+    async_session_context,
+    session_context,
+)
 
-__all__ = ["get_db"]
+__all__ = [
+    "get_db",
+    "get_read_db",
+    "get_async_db",
+    "get_async_read_db",
+    "get_fhir_client",
+    "get_write_behind",
+]
 
 
 def get_db() -> Generator[Session, None, None]:
     """FastAPI dependency that yields a DB session with rollback-on-exception."""
     with session_context() as db:
         yield db
+
+
+def get_read_db() -> Generator[Session, None, None]:
+    """Like `get_db`, but from the read-only pool (GET endpoints)."""
+    with session_context(ReadSessionLocal) as db:
+        yield db
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async variant of `get_db` for `async def` endpoints (never blocks the event loop)."""
+    async with async_session_context() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async session from the read-only pool (scoring endpoints)."""
+    async with async_session_context(AsyncReadSessionLocal) as db:
+        yield db
+
+
+def get_fhir_client(request: Request) -> FHIRClient:
+    """The app-wide pooled FHIR client created in the lifespan."""
+    return request.app.state.fhir_client
+
+
+def get_write_behind(request: Request) -> WriteBehindQueue | None:
+    """The write-behind queue when `WRITE_BEHIND_ENABLED`, else None (creates commit inline)."""
+    return getattr(request.app.state, "write_behind", None)
@@ -0,0 +1,33 @@
+"""Conditional GET helpers (ETag / If-None-Match).
+
+ETags are weak validators derived from data versions (see `app.services.data_versions`)
+plus the request path and query, so every page/filter combination gets its own tag.
+"""
+
+import hashlib
+from typing import Any, Optional
+from fastapi import Request, Response
+
+__all__ = ["make_etag", "not_modified"]
+
+
+def make_etag(request: Request, *parts: Any) -> str:
+    key = "|".join([request.url.path, request.url.query, *map(str, parts)])
+    return 'W/"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison: W/"x" and "x" are the same tag
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 if the client already has `etag`; otherwise tag `response` and return None."""
+    if _matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
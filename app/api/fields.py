@@ -0,0 +1,54 @@
+"""Sparse fieldsets and the ORM-free read path for the list endpoints.
+
+`?fields=id,start_time,steps` limits a list response to those fields of the endpoint's
+`*Out` schema; only those columns (plus the keyset columns pagination needs) are selected.
+With or without `fields`, list rows come back as Core tuples and go straight to JSON: no
+identity map, no Pydantic model per row. The `*Out` schemas mirror their tables column for
+column, so the JSON is the same as validating each row would produce.
+"""
+
+from typing import List, Sequence, Type
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlalchemy import Row, Select, select
+
+__all__ = ["FieldsParam", "sparse_fields", "select_fields", "rows_response"]
+
+FieldsParam = Query(
+    None, description="Comma-separated fields to return (default: all fields of the schema)"
+)
+
+
+def sparse_fields(schema: Type[BaseModel], fields: str | None) -> List[str]:
+    """Fields of `schema` named in `fields` (schema order), or all of them; 422 on unknown names."""
+    names = list(schema.model_fields)
+    if not fields:
+        return names
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted.difference(names)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [n for n in names if n in wanted] or names
+
+
+def select_fields(model, names: Sequence[str], *keyset) -> Select:
+    """SELECT of `model`'s `names` columns, then any `keyset` column not among them."""
+    columns = [getattr(model, n) for n in names]
+    columns += [c for c in keyset if c.key not in names]
+    return select(*columns)
+
+
+def rows_response(rows: list, names: Sequence[str], response: Response) -> ORJSONResponse:
+    """JSON list of `rows` restricted to `names`, keeping headers set on `response`.
+
+    Rows are Core rows from `select_fields()` (keyset extras come last, so zipping drops
+    them) or, for archived data, transient ORM instances.
+    """
+    content = [
+        dict(zip(names, r)) if isinstance(r, Row) else {n: getattr(r, n) for n in names}
+        for r in rows
+    ]
+    # ETag / X-Next-Cursor; content-length belongs to the body built here
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return ORJSONResponse(content, headers=headers)
@@ -0,0 +1,128 @@
+"""Keyset (cursor) pagination helpers for the list endpoints.
+
+Lists are ordered newest first on (timestamp, id); the cursor encodes the last row's
+(timestamp, id) so the next page is a range scan from there, however deep the history.
+The cursor for the next page is returned in the `X-Next-Cursor` response header. With user
+sharding each shard returns its own page and the union is re-sorted before trimming.
+
+Statements are column selects (`app.api.fields.select_fields`) that include the keyset
+columns; pages come back as Core rows.
+"""
+
+import base64
+import json
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import Select, tuple_
+from app.db.session import scatter
+
+__all__ = ["DEFAULT_LIMIT", "MAX_LIMIT", "PageParams", "paginate_by_time", "paginate_by_id"]
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# (start, end, before, after, limit) -> extra rows, e.g. from the cold archive
+Key = Tuple[datetime, int]
+ArchivedRows = Callable[
+    [Optional[datetime], Optional[datetime], Optional[Key], Optional[Key], int], List[Any]
+]
+
+
+class PageParams:
+    """Common `limit`/`cursor`/`from`/`to` query parameters (use as a dependency)."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        cursor: str | None = None,
+        from_: datetime | None = Query(None, alias="from"),
+        to: datetime | None = None,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.from_ = from_
+        self.to = to
+
+
+def _encode(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list):
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _page(rows: list, limit: int, response: Response, key) -> list:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = _encode(key(rows[-1]))
+    return rows
+
+
+def paginate_by_time(
+    db,
+    stmt: Select,
+    time_col,
+    id_col,
+    page: PageParams,
+    response: Response,
+    archived: ArchivedRows | None = None,
+):
+    """Newest-first page of rows on (time_col, id_col), filtered by `from`/`to`.
+
+    `archived(start, end, before, after, limit)` supplies rows from cold storage to merge
+    in (see `app.services.archive.archived_rows`); only rows that would sort above the
+    last live row can change the page, so it is asked for nothing below that.
+    """
+    if page.from_ is not None:
+        stmt = stmt.where(time_col >= page.from_)
+    if page.to is not None:
+        stmt = stmt.where(time_col < page.to)
+    before = None
+    if page.cursor:
+        values = _decode(page.cursor)
+        try:
+            before = datetime.fromisoformat(values[0]), int(values[1])
+        except (IndexError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(time_col, id_col) < tuple_(*before))
+    stmt = stmt.order_by(time_col.desc(), id_col.desc()).limit(page.limit + 1)
+    time_attr, id_attr = time_col.key, id_col.key
+
+    def key(r):
+        return getattr(r, time_attr), getattr(r, id_attr)
+
+    # Sharded, unfiltered lists get one page per shard back to back; re-sort the union
+    rows = sorted(db.execute(stmt), key=key, reverse=True)
+    if archived is not None:
+        after = key(rows[page.limit]) if len(rows) > page.limit else None
+        cold = archived(page.from_, page.to, before, after, page.limit + 1)
+        if cold:
+            rows = sorted(rows + cold, key=key, reverse=True)
+    return _page(rows, page.limit, response, key)
+
+
+def paginate_by_id(db, stmt: Select, id_col, limit: int, cursor: str | None, response: Response):
+    """Ascending page of rows on `id_col`."""
+    if cursor:
+        values = _decode(cursor)
+        try:
+            stmt = stmt.where(id_col > int(values[0]))
+        except (IndexError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    stmt = stmt.order_by(id_col).limit(limit + 1)
+    # Every shard's first page, read in parallel, merged on id
+    parts = scatter(db, lambda s: s.execute(stmt).all())
+    rows = sorted((r for part in parts for r in part), key=attrgetter(id_col.key))
+    return _page(rows, limit, response, lambda r: (getattr(r, id_col.key),))
@@ -1,27 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from app.api.deps import get_db
+from app.api.deps import get_db, get_read_db, get_write_behind
+from app.api.etag import make_etag, not_modified
+from app.api.fields import FieldsParam, rows_response, select_fields, sparse_fields
+from app.api.pagination import PageParams, paginate_by_time
+from app.api.write_behind import accept_write
 from app.models.blood_test import BloodTest
 from app.models.user import User
+from app.services import rollups
+from app.services.aggregates import Bucket, aggregate_buckets
+from app.services.data_versions import version_of
+from app.services.bulk_ingest import BulkIngestor, iter_bulk_body
+from app.services.write_behind import WriteBehindQueue
+from app.schemas.aggregate import AggregateBucket
+from app.schemas.bulk import BulkResult
+from app.schemas.ingest import IngestAccepted
 from app.schemas.blood_test import BloodTestCreate, BloodTestUpdate, BloodTestOut
 
 router = APIRouter()
 
 
-@router.post("/", response_model=BloodTestOut)
-def create_blood_test(payload: BloodTestCreate, db: Session = Depends(get_db)):
+@router.post("/", response_model=BloodTestOut, responses={202: {"model": IngestAccepted}})
+def create_blood_test(
+    payload: BloodTestCreate,
+    db: Session = Depends(get_db),
+    write_behind: WriteBehindQueue | None = Depends(get_write_behind),
+):
     if not db.get(User, payload.user_id):
         raise HTTPException(status_code=404, detail="User not found")
+    if write_behind is not None:
+        return accept_write(write_behind, "blood_test", payload)
     obj = BloodTest(**payload.model_dump())
     db.add(obj)
+    rollups.record(db, rollups.blood_test_delta(obj))
     db.commit()
     db.refresh(obj)
     return obj
 
 
+@router.post("/bulk", response_model=BulkResult)
+async def bulk_create_blood_tests(request: Request, db: Session = Depends(get_db)):
+    """Insert many rows from a JSON array or a streamed NDJSON body, reporting errors per row."""
+    rows = iter_bulk_body(request.headers.get("content-type", ""), request.stream())
+    return await BulkIngestor(db, BloodTest, BloodTestCreate, rollups.blood_test_delta).consume(
+        rows
+    )
+
+
+# Declared before /{id} so "aggregate" isn't parsed as an id
+@router.get("/aggregate", response_model=list[AggregateBucket])
+def aggregate_blood_tests(
+    request: Request,
+    response: Response,
+    user_id: int | None = None,
+    bucket: Bucket = "day",
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    db: Session = Depends(get_read_db),
+):
+    """Blood-test values per bucket, one metric per test type (e.g. `glucose`)."""
+    etag = make_etag(request, version_of(db, user_id))
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return aggregate_buckets(
+        db,
+        BloodTest.measured_at,
+        [BloodTest.value],
+        bucket,
+        user_id=user_id,
+        start=from_,
+        end=to,
+        group_by=BloodTest.test_type,
+    )
+
+
 @router.get("/{bt_id}", response_model=BloodTestOut)
-def get_blood_test(bt_id: int, db: Session = Depends(get_db)):
+def get_blood_test(bt_id: int, db: Session = Depends(get_read_db)):
     obj = db.get(BloodTest, bt_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Not found")
@@ -29,11 +85,24 @@ def get_blood_test(bt_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[BloodTestOut])
-def list_blood_tests(user_id: int | None = None, db: Session = Depends(get_db)):
-    stmt = select(BloodTest)
+def list_blood_tests(
+    request: Request,
+    response: Response,
+    user_id: int | None = None,
+    page: PageParams = Depends(),
+    fields: str | None = FieldsParam,
+    db: Session = Depends(get_read_db),
+):
+    names = sparse_fields(BloodTestOut, fields)
+    etag = make_etag(request, version_of(db, user_id))
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    stmt = select_fields(BloodTest, names, BloodTest.measured_at, BloodTest.id)
     if user_id is not None:
         stmt = stmt.where(BloodTest.user_id == user_id)
-    return db.execute(stmt.order_by(BloodTest.measured_at.desc())).scalars().all()
+    rows = paginate_by_time(db, stmt, BloodTest.measured_at, BloodTest.id, page, response)
+    return rows_response(rows, names, response)
 
 
 @router.put("/{bt_id}", response_model=BloodTestOut)
@@ -41,8 +110,10 @@ def update_blood_test(bt_id: int, payload: BloodTestUpdate, db: Session = Depend
     obj = db.get(BloodTest, bt_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Not found")
+    before = rollups.blood_test_delta(obj, sign=-1)
     for k, v in payload.model_dump(exclude_unset=True).items():
         setattr(obj, k, v)
+    rollups.record(db, before, rollups.blood_test_delta(obj))
     db.commit()
     db.refresh(obj)
     return obj
@@ -53,6 +124,7 @@ def delete_blood_test(bt_id: int, db: Session = Depends(get_db)):
     obj = db.get(BloodTest, bt_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Not found")
+    rollups.record(db, rollups.blood_test_delta(obj, sign=-1))
     db.delete(obj)
     db.commit()
     return {"ok": True}
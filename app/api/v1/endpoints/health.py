@@ -1,28 +1,180 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, datetime
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.api.deps import get_db
+from app.api.deps import get_async_read_db, get_fhir_client, get_read_db
+from app.api.etag import make_etag, not_modified
+from app.core.config import get_settings
+from app.models.health_score import HealthScore
 from app.models.user import User
-from app.services.health_score import compute_health_score
-from app.services.fhir import build_health_observation
-from app.clients.fhir_client import fetch_patient
+from app.schemas.health import HealthScoreBatchRequest
+from app.services.health_score import (
+    compute_health_score_trend_async,
+    compute_health_score_windows_async,
+    compute_health_scores,
+)
+from app.services.fhir import build_bundle, build_health_observation, build_not_found_outcome
+from app.services.data_versions import version_of
+from app.services.fhir_export import EXPORT_TYPES, NDJSON_MEDIA_TYPE, export_ndjson, gzip_chunks
+from app.services.score_store import dirty_users, stored_payload
+from app.clients.fhir_client import FHIRClient
 
 router = APIRouter()
 
 
+def _parse_windows(days: str) -> List[int]:
+    """`days=30` or `days=7,30,90` -> distinct positive window lengths, in request order."""
+    try:
+        windows = [int(d) for d in days.split(",") if d.strip()]
+    except ValueError:
+        windows = []
+    if not windows or any(d <= 0 for d in windows):
+        raise HTTPException(status_code=422, detail="days must be positive integers, e.g. 7,30,90")
+    return list(dict.fromkeys(windows))
+
+
 @router.get("/get_health_score")
 async def get_health_score(
-    user_id: int, days: int = 30, fhir: bool = True, db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    user_id: int,
+    days: str = Query("30", description="window length(s) in days, e.g. 30 or 7,30,90"),
+    fhir: bool = True,
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    user = db.get(User, user_id)
+    """Health score for one window, or several (`days=7,30,90`) computed together.
+
+    Several windows return a Bundle with one Observation per window (`fhir=true`) or
+    `{"windows": [{"days": d, ...payload}]}`.
+    """
+    windows = _parse_windows(days)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    payload = compute_health_score(db, user_id=user_id, days=days)
+    # Serve precomputed rows; compute live only windows the refresher hasn't stored.
+    # A stored score changes only when recomputed; a live one depends on everyone's data
+    # (population bounds) and on the day the window starts.
+    stored = {
+        row.days: row
+        for row in await db.scalars(
+            select(HealthScore).where(HealthScore.user_id == user_id, HealthScore.days.in_(windows))
+        )
+    }
+    live = [d for d in windows if d not in stored]
+    tag = [f"{d}@{row.computed_at.isoformat()}" for d, row in sorted(stored.items())]
+    if live:
+        global_version = await db.run_sync(version_of)
+        tag += ["live", global_version, datetime.utcnow().date().isoformat()]
+    etag = make_etag(request, *tag)
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+
+    payloads = {d: stored_payload(row) for d, row in stored.items()}
+    if live:
+        payloads.update(await compute_health_score_windows_async(user_id, live))
+        # Only windows the refresher stores; any other window is always computed live
+        if any(d in get_settings().HEALTH_SCORE_WINDOWS for d in live):
+            dirty_users.add([user_id])
+    # Plain dicts of JSON types: hand them to orjson directly, skipping jsonable_encoder
+    headers = {"ETag": etag}
+    if len(windows) == 1:
+        payload = payloads[windows[0]]
+        if fhir:
+            return ORJSONResponse(build_health_observation(user_id, payload), headers=headers)
+        return ORJSONResponse(payload, headers=headers)
     if fhir:
-        return build_health_observation(user_id, payload)
-    return payload
+        observations = [build_health_observation(user_id, payloads[d]) for d in windows]
+        return ORJSONResponse(build_bundle(observations), headers=headers)
+    return ORJSONResponse(
+        {"windows": [{"days": d, **payloads[d]} for d in windows]}, headers=headers
+    )
+
+
+@router.get("/trend")
+async def get_health_score_trend(
+    request: Request,
+    response: Response,
+    user_id: int,
+    days: int = Query(30, ge=1, le=365),
+    points: int = Query(30, ge=1, le=365),
+    end: date | None = Query(None, description="last day of the series (default today)"),
+    fhir: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Daily health-score series: one `days`-window score per day for `points` days.
+
+    Returns `{"days", "end", "series": [{"date", ...payload}]}`, or a Bundle with one
+    Observation per day (`fhir=true`).
+    """
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    end = end or datetime.utcnow().date()
+    # Every point depends on everyone's data in its window
+    global_version = await db.run_sync(version_of)
+    etag = make_etag(request, global_version, end.isoformat())
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+
+    trend = await compute_health_score_trend_async(user_id, days, points, end)
+    headers = {"ETag": etag}
+    if fhir:
+        observations = [
+            build_health_observation(user_id, point, effective=point["date"])
+            for point in trend["series"]
+        ]
+        return ORJSONResponse(build_bundle(observations), headers=headers)
+    return ORJSONResponse(trend, headers=headers)
+
+
+@router.post("/scores")
+def get_health_scores(payload: HealthScoreBatchRequest, db: Session = Depends(get_read_db)):
+    """Score many users (or "all") in one pass; optionally as a Bundle of Observations.
+
+    A plain `def`: scoring everyone is seconds of NumPy work, run in the threadpool.
+    """
+    user_ids = None if payload.user_ids == "all" else payload.user_ids
+    result = compute_health_scores(db, user_ids=user_ids, days=payload.days)
+    if payload.fhir:
+        resources = [build_health_observation(s["user_id"], s) for s in result["scores"]]
+        if result["missing"]:
+            resources.append(build_not_found_outcome(result["missing"]))
+        return ORJSONResponse(build_bundle(resources))
+    return ORJSONResponse(result)
+
+
+@router.get("/$export")
+def export_population(
+    request: Request,
+    types: str = Query("Observation", alias="_type"),
+    since: datetime | None = Query(None, alias="_since"),
+    days: int = Query(30, ge=1),
+):
+    """Stream every user's health-score Observation (and/or Patient) as NDJSON.
+
+    `_type` is a comma list of Observation/Patient; `_since` keeps users created, or whose
+    data changed, since then. Sent gzip-encoded when the client accepts it.
+    """
+    requested = [t.strip() for t in types.split(",") if t.strip()]
+    unknown = set(requested) - set(EXPORT_TYPES)
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400, detail=f"_type must be among {', '.join(EXPORT_TYPES)}"
+        )
+    chunks = export_ndjson(requested, days, since, get_settings().EXPORT_CHUNK_SIZE)
+    headers = {"Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE, headers=headers)
 
 
 @router.get("/external_patient/{patient_id}")
-async def external_patient(patient_id: str):
+async def external_patient(patient_id: str, client: FHIRClient = Depends(get_fhir_client)):
     """Demonstrate integration with external FHIR (fetch Patient)."""
-    return await fetch_patient(patient_id)
+    return await client.fetch_patient(patient_id)
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.api.deps import get_read_db, get_write_behind
+from app.models.ingest_receipt import IngestReceipt
+from app.schemas.ingest import IngestStatus
+from app.services.write_behind import WriteBehindQueue
+
+router = APIRouter()
+
+
+@router.get("/{ticket}", response_model=IngestStatus)
+def get_ingest_status(
+    ticket: str,
+    db: Session = Depends(get_read_db),
+    write_behind: WriteBehindQueue | None = Depends(get_write_behind),
+):
+    """Whether a `202 Accepted` create is still queued, failed, or persisted (with its id).
+
+    Queued and failed tickets are known only to the worker that accepted them; persisted
+    ones to every worker, until the receipt TTL passes.
+    """
+    if write_behind is not None:
+        status = write_behind.status(ticket)
+        if status is not None:
+            return status
+    receipt = db.scalars(select(IngestReceipt).where(IngestReceipt.ticket == ticket)).first()
+    if receipt is None:
+        raise HTTPException(status_code=404, detail="Unknown ticket")
+    return {
+        "ticket": receipt.ticket,
+        "kind": receipt.kind,
+        "status": "persisted",
+        "record_id": receipt.record_id,
+        "persisted_at": receipt.persisted_at,
+    }
@@ -1,48 +1,130 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from app.api.deps import get_db
+from app.api.deps import get_db, get_read_db, get_write_behind
+from app.api.etag import make_etag, not_modified
+from app.api.fields import FieldsParam, rows_response, select_fields, sparse_fields
+from app.api.pagination import PageParams, paginate_by_time
+from app.api.write_behind import accept_write
 from app.models.sleep import SleepActivity
 from app.models.user import User
+from app.services import rollups
+from app.services.aggregates import Bucket, aggregate_buckets
+from app.services.archive import archived_record, archived_rows, is_archived
+from app.services.data_versions import version_of
+from app.services.bulk_ingest import BulkIngestor, iter_bulk_body
+from app.services.write_behind import WriteBehindQueue
+from app.schemas.aggregate import AggregateBucket
+from app.schemas.bulk import BulkResult
+from app.schemas.ingest import IngestAccepted
 from app.schemas.sleep import SleepCreate, SleepUpdate, SleepOut
 
 router = APIRouter()
 
 
-@router.post("/", response_model=SleepOut)
-def create_sleep(payload: SleepCreate, db: Session = Depends(get_db)):
+@router.post("/", response_model=SleepOut, responses={202: {"model": IngestAccepted}})
+def create_sleep(
+    payload: SleepCreate,
+    db: Session = Depends(get_db),
+    write_behind: WriteBehindQueue | None = Depends(get_write_behind),
+):
     if not db.get(User, payload.user_id):
         raise HTTPException(status_code=404, detail="User not found")
+    if write_behind is not None:
+        return accept_write(write_behind, "sleep", payload)
     obj = SleepActivity(**payload.model_dump())
     db.add(obj)
+    rollups.record(db, rollups.sleep_delta(obj))
     db.commit()
     db.refresh(obj)
     return obj
 
 
+@router.post("/bulk", response_model=BulkResult)
+async def bulk_create_sleeps(request: Request, db: Session = Depends(get_db)):
+    """Insert many rows from a JSON array or a streamed NDJSON body, reporting errors per row."""
+    rows = iter_bulk_body(request.headers.get("content-type", ""), request.stream())
+    return await BulkIngestor(db, SleepActivity, SleepCreate, rollups.sleep_delta).consume(rows)
+
+
+# Declared before /{id} so "aggregate" isn't parsed as an id
+@router.get("/aggregate", response_model=list[AggregateBucket])
+def aggregate_sleeps(
+    request: Request,
+    response: Response,
+    user_id: int | None = None,
+    bucket: Bucket = "day",
+    from_: datetime | None = Query(None, alias="from"),
+    to: datetime | None = None,
+    db: Session = Depends(get_read_db),
+):
+    """Sleep minutes and quality per hour/day/week bucket (by sleep start)."""
+    etag = make_etag(request, version_of(db, user_id))
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return aggregate_buckets(
+        db,
+        SleepActivity.start_time,
+        [SleepActivity.duration_minutes, SleepActivity.sleep_quality],
+        bucket,
+        user_id=user_id,
+        start=from_,
+        end=to,
+    )
+
+
 @router.get("/{sleep_id}", response_model=SleepOut)
-def get_sleep(sleep_id: int, db: Session = Depends(get_db)):
+def get_sleep(sleep_id: int, db: Session = Depends(get_read_db)):
     obj = db.get(SleepActivity, sleep_id)
+    if obj is None:
+        obj = archived_record(db, SleepActivity, sleep_id)
     if not obj:
         raise HTTPException(status_code=404, detail="Not found")
     return obj
 
 
 @router.get("/", response_model=list[SleepOut])
-def list_sleeps(user_id: int | None = None, db: Session = Depends(get_db)):
-    stmt = select(SleepActivity)
+def list_sleeps(
+    request: Request,
+    response: Response,
+    user_id: int | None = None,
+    page: PageParams = Depends(),
+    fields: str | None = FieldsParam,
+    db: Session = Depends(get_read_db),
+):
+    names = sparse_fields(SleepOut, fields)
+    etag = make_etag(request, version_of(db, user_id))
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    stmt = select_fields(SleepActivity, names, SleepActivity.start_time, SleepActivity.id)
     if user_id is not None:
         stmt = stmt.where(SleepActivity.user_id == user_id)
-    return db.execute(stmt.order_by(SleepActivity.start_time.desc())).scalars().all()
+    rows = paginate_by_time(
+        db,
+        stmt,
+        SleepActivity.start_time,
+        SleepActivity.id,
+        page,
+        response,
+        archived=partial(archived_rows, db, SleepActivity, user_id),
+    )
+    return rows_response(rows, names, response)
 
 
 @router.put("/{sleep_id}", response_model=SleepOut)
 def update_sleep(sleep_id: int, payload: SleepUpdate, db: Session = Depends(get_db)):
     obj = db.get(SleepActivity, sleep_id)
     if not obj:
+        if is_archived(db, SleepActivity, sleep_id):
+            raise HTTPException(status_code=409, detail="Archived records are read-only")
         raise HTTPException(status_code=404, detail="Not found")
+    before = rollups.sleep_delta(obj, sign=-1)
     for k, v in payload.model_dump(exclude_unset=True).items():
         setattr(obj, k, v)
+    rollups.record(db, before, rollups.sleep_delta(obj))
     db.commit()
     db.refresh(obj)
     return obj
@@ -52,7 +134,10 @@ def update_sleep(sleep_id: int, payload: SleepUpdate, db: Session = Depends(get_
 def delete_sleep(sleep_id: int, db: Session = Depends(get_db)):
     obj = db.get(SleepActivity, sleep_id)
     if not obj:
+        if is_archived(db, SleepActivity, sleep_id):
+            raise HTTPException(status_code=409, detail="Archived records are read-only")
         raise HTTPException(status_code=404, detail="Not found")
+    rollups.record(db, rollups.sleep_delta(obj, sign=-1))
     db.delete(obj)
     db.commit()
     return {"ok": True}
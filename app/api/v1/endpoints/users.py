@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
-from app.api.deps import get_db
+from app.api.deps import get_db, get_read_db
+from app.api.etag import make_etag, not_modified
+from app.api.fields import FieldsParam, rows_response, select_fields, sparse_fields
+from app.api.pagination import DEFAULT_LIMIT, MAX_LIMIT, paginate_by_id
+from app.core.config import get_settings
 from app.models.user import User
-from app.schemas.user import UserCreate, UserUpdate, UserOut
+from app.services import rollups
+from app.services.data_versions import version_of
+from app.services.user_purge import history_counts, purge_jobs, purge_user
+from app.schemas.user import PurgeJobOut, UserCreate, UserUpdate, UserOut
 
 router = APIRouter()
 
@@ -13,13 +21,15 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email already exists")
     user = User(**payload.model_dump())
     db.add(user)
+    db.flush()
+    rollups.mark_touched(db, user.id)
     db.commit()
     db.refresh(user)
     return user
 
 
 @router.get("/{user_id}", response_model=UserOut)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, db: Session = Depends(get_read_db)):
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -27,8 +37,21 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[UserOut])
-def list_users(db: Session = Depends(get_db)):
-    return db.query(User).order_by(User.id).all()
+def list_users(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: str | None = None,
+    fields: str | None = FieldsParam,
+    db: Session = Depends(get_read_db),
+):
+    names = sparse_fields(UserOut, fields)
+    etag = make_etag(request, version_of(db))
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    rows = paginate_by_id(db, select_fields(User, names, User.id), User.id, limit, cursor, response)
+    return rows_response(rows, names, response)
 
 
 @router.put("/{user_id}", response_model=UserOut)
@@ -38,16 +61,45 @@ def update_user(user_id: int, payload: UserUpdate, db: Session = Depends(get_db)
         raise HTTPException(status_code=404, detail="User not found")
     for k, v in payload.model_dump(exclude_unset=True).items():
         setattr(user, k, v)
+    rollups.mark_touched(db, user.id)
     db.commit()
     db.refresh(user)
     return user
 
 
-@router.delete("/{user_id}")
+def _purge_accepted(job) -> ORJSONResponse:
+    return ORJSONResponse(
+        job.as_dict(),
+        status_code=202,
+        headers={"Location": f"/api/v1/users/purges/{job.job_id}"},
+    )
+
+
+@router.delete("/{user_id}", responses={202: {"model": PurgeJobOut}})
 def delete_user(user_id: int, db: Session = Depends(get_db)):
+    """Delete a user and their history without loading it.
+
+    Short histories are deleted inline (`{"ok": true}`); longer ones by a background job,
+    answered with `202` and the job (poll `GET /users/purges/{job_id}`).
+    """
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(user)
-    db.commit()
+    running = purge_jobs.running_for(user_id)
+    if running is not None:
+        return _purge_accepted(running)
+    total = sum(history_counts(db, user_id).values())
+    if total > get_settings().PURGE_INLINE_MAX_ROWS:
+        db.rollback()
+        return _purge_accepted(purge_jobs.start(user_id, total))
+    purge_user(db, user_id)
     return {"ok": True}
+
+
+@router.get("/purges/{job_id}", response_model=PurgeJobOut)
+def get_purge_job(job_id: str):
+    """Progress of a background user purge (known to the worker that started it)."""
+    job = purge_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown purge job")
+    return job.as_dict()
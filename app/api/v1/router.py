@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import users, activities, sleeps, blood_tests, health
+from .endpoints import users, activities, sleeps, blood_tests, health, ingest
 
 api_router = APIRouter(prefix="/api/v1")
 
@@ -8,3 +8,4 @@ api_router.include_router(activities.router, prefix="/activities", tags=["activi
 api_router.include_router(sleeps.router, prefix="/sleeps", tags=["sleeps"])
 api_router.include_router(blood_tests.router, prefix="/blood-tests", tags=["blood-tests"])
 api_router.include_router(health.router, prefix="/health", tags=["health"])
+api_router.include_router(ingest.router, prefix="/ingest", tags=["ingest"])
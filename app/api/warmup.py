@@ -0,0 +1,58 @@
+"""Run the hot read statements once at startup, so first requests don't compile them.
+
+SQLAlchemy caches compiled SQL per engine, keyed by statement shape. These go through the
+same helpers as the endpoints, for an id no row has (ids start at 1), which also gets the
+ORM mappers configured before the first request.
+"""
+
+from typing import List
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.api.fields import select_fields, sparse_fields
+from app.api.pagination import DEFAULT_LIMIT, PageParams, paginate_by_id, paginate_by_time
+from app.models.activity import PhysicalActivity
+from app.models.blood_test import BloodTest
+from app.models.health_score import HealthScore
+from app.models.sleep import SleepActivity
+from app.models.user import User
+from app.schemas.activity import ActivityOut
+from app.schemas.blood_test import BloodTestOut
+from app.schemas.sleep import SleepOut
+from app.schemas.user import UserOut
+from app.services.data_versions import version_of
+
+__all__ = ["warm_statements", "warm_statements_async"]
+
+_NO_ROW = 0
+
+
+def warm_statements(db: Session) -> None:
+    """Gets by id, data versions and first list pages, as the CRUD endpoints issue them."""
+    for model in (User, PhysicalActivity, SleepActivity, BloodTest):
+        db.get(model, _NO_ROW)
+    version_of(db, _NO_ROW)
+    version_of(db)
+    page = PageParams(limit=DEFAULT_LIMIT, cursor=None, from_=None, to=None)
+    for model, schema, time_col in (
+        (PhysicalActivity, ActivityOut, PhysicalActivity.start_time),
+        (SleepActivity, SleepOut, SleepActivity.start_time),
+        (BloodTest, BloodTestOut, BloodTest.measured_at),
+    ):
+        stmt = select_fields(model, sparse_fields(schema, None), time_col, model.id)
+        stmt = stmt.where(model.user_id == _NO_ROW)
+        paginate_by_time(db, stmt, time_col, model.id, page, Response())
+    stmt = select_fields(User, sparse_fields(UserOut, None), User.id)
+    paginate_by_id(db, stmt, User.id, DEFAULT_LIMIT, None, Response())
+    db.rollback()
+
+
+async def warm_statements_async(db: AsyncSession, windows: List[int]) -> None:
+    """The health score endpoint's user lookup and stored-score read."""
+    await db.get(User, _NO_ROW)
+    await db.scalars(
+        select(HealthScore).where(HealthScore.user_id == _NO_ROW, HealthScore.days.in_(windows))
+    )
+    await db.run_sync(version_of)
+    await db.rollback()
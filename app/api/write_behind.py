@@ -0,0 +1,28 @@
+"""Answering creates from the write-behind queue (see `app.services.write_behind`)."""
+
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from app.services.write_behind import QueueFull, WriteBehindQueue
+
+__all__ = ["INGEST_STATUS_PATH", "RETRY_AFTER_SECONDS", "accept_write"]
+
+INGEST_STATUS_PATH = "/api/v1/ingest/{ticket}"
+RETRY_AFTER_SECONDS = 1
+
+
+def accept_write(queue: WriteBehindQueue, kind: str, payload: BaseModel) -> ORJSONResponse:
+    """Queue a validated create: `202` with its ticket, or `503` while the queue is full."""
+    try:
+        ticket = queue.submit(kind, payload)
+    except QueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Ingestion queue is full",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+    return ORJSONResponse(
+        {"ticket": ticket, "kind": kind, "status": "queued"},
+        status_code=202,
+        headers={"Location": INGEST_STATUS_PATH.format(ticket=ticket)},
+    )
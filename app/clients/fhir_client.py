@@ -1,15 +1,114 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
 import httpx
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
 
-settings = get_settings()
+# Upstream statuses worth retrying (transient gateway/server trouble)
+_RETRY_STATUSES = {502, 503, 504}
 
 
-async def fetch_patient(patient_id: str) -> dict:
-    """Fetch a FHIR Patient resource from an external FHIR server (demo)."""
+class FHIRClient:
+    """Long-lived client for an external FHIR server (demo).
 
-    base = settings.EXTERNAL_FHIR_BASE_URL.rstrip("/")
-    url = f"{base}/Patient/{patient_id}"
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.get(url)
+    One pooled `httpx.AsyncClient` (HTTP/2 keep-alive) is shared by all requests. Patient
+    resources are kept in a bounded LRU cache: within the TTL they are served without any
+    network call; after it, they are revalidated with `If-None-Match` and a 304 just
+    refreshes the entry.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        timeout: float = 10.0,
+        retries: int = 2,
+        retry_backoff: float = 0.2,
+        max_connections: int = 20,
+        http2: bool = True,
+        cache_size: int = 1024,
+        cache_ttl: float = 300.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # key -> (resource, etag, fetched_at)
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], str | None, float]]" = OrderedDict()
+        limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            headers={"Accept": "application/fhir+json"},
+            transport=transport or httpx.AsyncHTTPTransport(limits=limits, http2=http2),
+        )
+
+    @classmethod
+    def from_settings(cls, settings: Settings | None = None, **kwargs: Any) -> "FHIRClient":
+        s = settings or get_settings()
+        return cls(
+            s.EXTERNAL_FHIR_BASE_URL,
+            timeout=s.FHIR_TIMEOUT_SECONDS,
+            retries=s.FHIR_RETRIES,
+            max_connections=s.FHIR_MAX_CONNECTIONS,
+            http2=s.FHIR_HTTP2,
+            cache_size=s.FHIR_CACHE_SIZE,
+            cache_ttl=s.FHIR_CACHE_TTL_SECONDS,
+            **kwargs,
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def fetch_patient(self, patient_id: str) -> dict:
+        """Fetch a FHIR Patient resource, from cache when fresh."""
+        return await self._read(f"Patient/{patient_id}")
+
+    async def _read(self, path: str) -> dict:
+        entry = self._cache.get(path)
+        now = time.monotonic()
+        if entry is not None:
+            resource, etag, fetched_at = entry
+            if now - fetched_at < self.cache_ttl:
+                self._cache.move_to_end(path)
+                return resource
+
+        headers = {"If-None-Match": entry[1]} if entry is not None and entry[1] else {}
+        r = await self._get(f"{self.base_url}/{path}", headers)
+        if r.status_code == 304 and entry is not None:
+            self._store(path, entry[0], entry[1])
+            return entry[0]
         r.raise_for_status()
-        return r.json()
+        resource = r.json()
+        self._store(path, resource, r.headers.get("ETag"))
+        return resource
+
+    async def _get(self, url: str, headers: Dict[str, str]) -> httpx.Response:
+        """GET with retries on transport errors and 502/503/504 (exponential backoff)."""
+        attempt = 0
+        while True:
+            try:
+                r = await self._http.get(url, headers=headers)
+                if r.status_code not in _RETRY_STATUSES or attempt >= self.retries:
+                    return r
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+            await asyncio.sleep(self.retry_backoff * 2**attempt)
+            attempt += 1
+
+    def _store(self, path: str, resource: Dict[str, Any], etag: str | None) -> None:
+        self._cache[path] = (resource, etag, time.monotonic())
+        self._cache.move_to_end(path)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, path: str | None = None) -> None:
+        if path is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(path, None)
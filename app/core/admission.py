@@ -0,0 +1,228 @@
+"""Admission control: per-route-class concurrency limits and per-client rate limits.
+
+API requests fall into a route class (`route_class()`): `score` for scoring and trends
+under `/api/v1/health/`, `export` for the bulk `$export` stream (few, long-lived),
+`external` for `external_patient` (waits on the remote FHIR server, not on CPU), `write`
+for other creates/updates/deletes and `read` for the rest. Each class admits
+`ADMISSION_LIMITS[class]` requests at a time; the next ones wait in a FIFO queue of
+`ADMISSION_QUEUE_SIZES[class]` for at most `ADMISSION_QUEUE_TIMEOUT_SECONDS`. A full queue
+or an expired wait is answered `503` with `Retry-After` at once, so a spike of expensive
+score requests can't hold the threadpool and the database away from cheap CRUD.
+
+With `RATE_LIMIT_PER_SECOND` set, each client also gets a token bucket (sustained rate,
+`RATE_LIMIT_BURST` burst); requests beyond it get `429` with `Retry-After`.
+
+Limits are per process and the state lives on the event loop, so no locking is needed.
+"""
+
+from __future__ import annotations
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+import orjson
+
+from app.core.config import get_settings
+from app.core.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_SHED,
+    ADMISSION_WAIT,
+)
+
+__all__ = ["AdmissionMiddleware", "ConcurrencyLimit", "TokenBuckets", "route_class"]
+
+_HEALTH_PREFIX = "/api/v1/health/"
+_WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+# Buckets kept for this many distinct clients; the least recently seen are forgotten
+_MAX_CLIENTS = 10000
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Route class of a request, or None for paths never limited (/metrics, /docs, ...)."""
+    if not path.startswith("/api/"):
+        return None
+    if path.startswith(_HEALTH_PREFIX):
+        endpoint = path[len(_HEALTH_PREFIX) :]
+        if endpoint == "$export":
+            return "export"
+        if endpoint.startswith("external_patient/"):
+            return "external"
+        return "score"
+    return "write" if method in _WRITE_METHODS else "read"
+
+
+class ConcurrencyLimit:
+    """At most `limit` requests at once, with a bounded FIFO queue of waiters."""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot: None once admitted, else why not (`queue_full` or `timeout`)."""
+        if self.active < self.limit and not self._waiters:
+            self._set_active(self.active + 1)
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters), route_class=self.name)
+        started = time.perf_counter()
+        try:
+            # A slot handed over just as the deadline passes still counts as admitted
+            await asyncio.wait_for(waiter, self.timeout)
+            return None
+        except asyncio.TimeoutError:
+            return "timeout"
+        except BaseException:
+            # Client gone after the slot was handed over: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter.cancelled() and waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_QUEUE_DEPTH.set(len(self._waiters), route_class=self.name)
+            ADMISSION_WAIT.observe(time.perf_counter() - started, route_class=self.name)
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the oldest live waiter if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._set_active(self.active - 1)
+
+    def _set_active(self, value: int) -> None:
+        self.active = value
+        ADMISSION_IN_FLIGHT.set(value, route_class=self.name)
+
+
+class TokenBuckets:
+    """Token bucket per client key: `rate` tokens/s, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = _MAX_CLIENTS) -> None:
+        self.rate = rate
+        self.burst = float(max(burst, 1))
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    def take(self, client: str) -> float:
+        """Spend a token: 0 if there was one, else seconds until the next one."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying `ConcurrencyLimit`s per route class and `TokenBuckets`."""
+
+    def __init__(
+        self,
+        app,
+        limits: Dict[str, ConcurrencyLimit],
+        buckets: TokenBuckets | None = None,
+        client_header: str = "",
+        retry_after: int = 1,
+    ) -> None:
+        self.app = app
+        self.limits = limits
+        self.buckets = buckets
+        self.client_header = client_header.lower().encode()
+        self.retry_after = retry_after
+
+    @classmethod
+    def settings_kwargs(cls) -> Dict:
+        """Constructor arguments from `Settings` (for `app.add_middleware`)."""
+        s = get_settings()
+        limits = {}
+        if s.ADMISSION_ENABLED:
+            limits = {
+                name: ConcurrencyLimit(
+                    name,
+                    limit,
+                    s.ADMISSION_QUEUE_SIZES.get(name, 0),
+                    s.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                )
+                for name, limit in s.ADMISSION_LIMITS.items()
+            }
+        buckets = None
+        if s.RATE_LIMIT_PER_SECOND > 0:
+            buckets = TokenBuckets(s.RATE_LIMIT_PER_SECOND, s.RATE_LIMIT_BURST)
+        return {
+            "limits": limits,
+            "buckets": buckets,
+            "client_header": s.RATE_LIMIT_CLIENT_HEADER,
+            "retry_after": s.ADMISSION_RETRY_AFTER_SECONDS,
+        }
+
+    async def __call__(self, scope, receive, send):
+        name = None
+        if scope["type"] == "http":
+            name = route_class(scope.get("method", ""), scope.get("path", ""))
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.buckets is not None:
+            wait = self.buckets.take(self._client(scope))
+            if wait > 0:
+                ADMISSION_SHED.inc(route_class=name, reason="rate_limited")
+                await _reject(send, 429, "Rate limit exceeded", math.ceil(wait))
+                return
+
+        limit = self.limits.get(name)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        refused = await limit.acquire()
+        if refused is not None:
+            ADMISSION_SHED.inc(route_class=name, reason=refused)
+            await _reject(send, 503, "Server busy, retry later", self.retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+    def _client(self, scope) -> str:
+        if self.client_header:
+            for key, value in scope.get("headers", ()):
+                if key == self.client_header:
+                    # X-Forwarded-For style lists: the first entry is the client
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else ""
+
+
+async def _reject(send, status: int, detail: str, retry_after: int) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(retry_after, 1)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
@@ -8,9 +9,125 @@ class Settings(BaseSettings):
     # SQLAlchemy URL (SQLite by default for local/dev)
     DATABASE_URL: str = "sqlite:///./health.db"
 
+    # Optional asyncio URL; derived from DATABASE_URL when unset (sqlite -> aiosqlite)
+    ASYNC_DATABASE_URL: str | None = None
+
+    # Engine profile: "throughput" (WAL + tuned pragmas + reader pool) or "default" (driver defaults)
+    DB_ENGINE_PROFILE: str = "throughput"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Size of the separate read-only pool used by GET and scoring endpoints (SQLite files)
+    DB_READ_POOL_SIZE: int = 10
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64 * 1024  # negative = KiB, i.e. 64 MiB per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_TEMP_STORE: str = "MEMORY"
+
+    # User sharding: > 1 spreads users over that many SQLite files. Shard 0 is DATABASE_URL,
+    # shard i sits next to it as `<name>.shard<i>.db`.
+    DB_SHARDS: int = 1
+
     # External FHIR server base URL (demo)
     EXTERNAL_FHIR_BASE_URL: str = "https://hapi.fhir.org/baseR4"
 
+    # Pooled FHIR client: timeouts/retries, connection pool and Patient cache
+    FHIR_TIMEOUT_SECONDS: float = 10.0
+    FHIR_RETRIES: int = 2
+    FHIR_MAX_CONNECTIONS: int = 20
+    FHIR_HTTP2: bool = True
+    FHIR_CACHE_SIZE: int = 1024
+    FHIR_CACHE_TTL_SECONDS: float = 300.0
+
+    # Seconds a cached population min/max (per scoring window) stays valid
+    POPULATION_STATS_TTL_SECONDS: float = 300.0
+
+    # Population normalization: "minmax" (observed min/max), "percentile" (rank in the
+    # population) or "clipped" (min/max over the CLIP quantiles). The last two read persisted
+    # KLL sketches of size SKETCH_K instead of every user's averages.
+    HEALTH_SCORE_NORMALIZATION: Literal["minmax", "percentile", "clipped"] = "minmax"
+    NORMALIZATION_CLIP_LOW: float = 0.05
+    NORMALIZATION_CLIP_HIGH: float = 0.95
+    SKETCH_K: int = 200
+
+    # Precomputed health scores: windows (days) kept in `health_scores` and the refresher's
+    # cadence (dirty users every interval, everyone every full-refresh period)
+    HEALTH_SCORE_WINDOWS: list[int] = [30]
+    SCORE_WORKER_ENABLED: bool = True
+    SCORE_REFRESH_INTERVAL_SECONDS: float = 5.0
+    SCORE_FULL_REFRESH_SECONDS: float = 900.0
+
+    # Rows per transaction for the /bulk ingestion endpoints
+    BULK_CHUNK_SIZE: int = 500
+
+    # Write-behind ingestion: POST creates answer 202 with a ticket and are group-committed
+    # by a background flusher (batch size or flush interval, whichever comes first). A full
+    # queue makes POSTs wait up to the enqueue timeout, then fail with 503. Receipts
+    # (GET /ingest/{ticket}) are kept for the receipt TTL.
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_QUEUE_SIZE: int = 10000
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_SECONDS: float = 0.05
+    WRITE_BEHIND_ENQUEUE_TIMEOUT_SECONDS: float = 1.0
+    WRITE_BEHIND_RECEIPT_TTL_SECONDS: float = 3600.0
+
+    # User deletion: raw rows are deleted PURGE_CHUNK_SIZE at a time, one transaction each.
+    # Users with more than PURGE_INLINE_MAX_ROWS raw rows are purged by a background job.
+    PURGE_CHUNK_SIZE: int = 2000
+    PURGE_INLINE_MAX_ROWS: int = 10000
+
+    # Cold storage for raw activities/sleeps: whole months older than ARCHIVE_AFTER_DAYS are
+    # moved into compressed per-user, per-month column files under ARCHIVE_DIR (by
+    # `python -m scripts.archive_old_rows`). Lists and aggregates read them back transparently;
+    # ARCHIVE_CACHE_SEGMENTS decoded files are kept in memory.
+    ARCHIVE_DIR: str = "./archive"
+    ARCHIVE_AFTER_DAYS: int = 365
+    ARCHIVE_CACHE_SEGMENTS: int = 256
+
+    # Users per chunk when streaming /health/$export
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    # Fast cold start: skip DDL when the stored schema fingerprint matches, open
+    # STARTUP_PREWARM_CONNECTIONS per pool and run the hot read statements once at startup
+    FAST_STARTUP: bool = False
+    STARTUP_PREWARM_CONNECTIONS: int = 2
+
+    # Admission control: concurrent requests per route class (`score` = health scores and
+    # trends, `export` = /api/v1/health/$export streams, `external` = external_patient FHIR
+    # fetches, `write` = other API POST/PUT/PATCH/DELETE, `read` = other API GETs; classes
+    # missing from ADMISSION_LIMITS are unlimited). Requests over the limit queue (up to
+    # ADMISSION_QUEUE_SIZES per class) for at most ADMISSION_QUEUE_TIMEOUT_SECONDS; a full
+    # queue or an expired wait gets 503 with Retry-After: ADMISSION_RETRY_AFTER_SECONDS.
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: dict[str, int] = {
+        "score": 8,
+        "export": 2,
+        "external": 20,
+        "write": 32,
+        "read": 64,
+    }
+    ADMISSION_QUEUE_SIZES: dict[str, int] = {
+        "score": 32,
+        "export": 4,
+        "external": 64,
+        "write": 256,
+        "read": 256,
+    }
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # Per-client token buckets on API routes: RATE_LIMIT_PER_SECOND sustained (0 disables),
+    # bursts up to RATE_LIMIT_BURST; over the limit gets 429. Clients are keyed by the
+    # RATE_LIMIT_CLIENT_HEADER value (e.g. x-api-key, x-forwarded-for) when set and sent,
+    # else by peer address.
+    RATE_LIMIT_PER_SECOND: float = 0.0
+    RATE_LIMIT_BURST: int = 20
+    RATE_LIMIT_CLIENT_HEADER: str = ""
+
+    # Prometheus /metrics endpoint, request/SQL instrumentation and X-SQL-* response headers
+    METRICS_ENABLED: bool = True
+    SQL_TIMING_HEADERS: bool = True
+
     # Load from .env (case-insensitive keys)
     model_config = SettingsConfigDict(
         env_file=".env",
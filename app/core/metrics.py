@@ -0,0 +1,289 @@
+"""Request metrics and SQL instrumentation, exposed in Prometheus text format.
+
+- `MetricsMiddleware` (pure ASGI) records per-route latency and response-size histograms,
+  request counts by status and the number of in-flight requests.
+- `instrument_engine()` hooks SQLAlchemy cursor events so every query is counted and timed,
+  globally and against the request that issued it (via a context variable, which also
+  reaches sync endpoints in the threadpool and `AsyncSession.run_sync` greenlets).
+- Responses carry `X-SQL-Queries` / `X-SQL-Time-Ms` when SQL timing headers are enabled.
+"""
+
+from __future__ import annotations
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _fmt(self, values: LabelValues, extra: Iterable[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return super().render() + [f"{self.name}{self._fmt(k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> ([count per bucket incl. +Inf], sum)
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(c), s)) for k, (c, s) in self._values.items()]
+        lines = super().render()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{self._fmt(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._fmt(key)} {total}")
+            lines.append(f"{self.name}_count{self._fmt(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+)
+HTTP_LATENCY = REGISTRY.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being served")
+)
+HTTP_RESPONSE_SIZE = REGISTRY.register(
+    Histogram(
+        "http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS
+    )
+)
+REQUEST_SQL_QUERIES = REGISTRY.register(
+    Histogram(
+        "http_request_sql_queries", "SQL queries per HTTP request", ("route",), QUERY_COUNT_BUCKETS
+    )
+)
+REQUEST_SQL_SECONDS = REGISTRY.register(
+    Histogram("http_request_sql_seconds", "SQL time per HTTP request", ("route",))
+)
+SQL_QUERIES = REGISTRY.register(Counter("sql_queries_total", "SQL statements executed"))
+SQL_LATENCY = REGISTRY.register(
+    Histogram("sql_query_duration_seconds", "SQL statement execution time")
+)
+
+STARTUP_SECONDS = REGISTRY.register(
+    Gauge("app_startup_seconds", "Time spent in each startup phase of this worker", ("phase",))
+)
+WRITE_BEHIND_DEPTH = REGISTRY.register(
+    Gauge("write_behind_queue_depth", "Creates waiting in the write-behind queue")
+)
+WRITE_BEHIND_WRITES = REGISTRY.register(
+    Counter(
+        "write_behind_writes_total",
+        "Write-behind creates by outcome (persisted, failed, rejected)",
+        ("outcome",),
+    )
+)
+WRITE_BEHIND_BATCH_SIZE = REGISTRY.register(
+    Histogram(
+        "write_behind_batch_size",
+        "Creates per write-behind group commit",
+        buckets=(1, 5, 10, 50, 100, 250, 500, 1000, 5000),
+    )
+)
+ADMISSION_IN_FLIGHT = REGISTRY.register(
+    Gauge("admission_in_flight", "Requests admitted and running, per route class", ("route_class",))
+)
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(
+    Gauge(
+        "admission_queue_depth", "Requests waiting for admission, per route class", ("route_class",)
+    )
+)
+ADMISSION_SHED = REGISTRY.register(
+    Counter(
+        "admission_shed_total",
+        "Requests refused by admission control (queue_full, timeout, rate_limited)",
+        ("route_class", "reason"),
+    )
+)
+ADMISSION_WAIT = REGISTRY.register(
+    Histogram("admission_wait_seconds", "Time queued before admission or refusal", ("route_class",))
+)
+
+
+class SQLStats:
+    """Mutable per-request SQL counters (shared by reference across threads/greenlets)."""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_current_sql: ContextVar[Optional[SQLStats]] = ContextVar("current_sql_stats", default=None)
+
+
+def current_sql_stats() -> Optional[SQLStats]:
+    return _current_sql.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    SQL_QUERIES.inc()
+    SQL_LATENCY.observe(elapsed)
+    stats = _current_sql.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time every statement executed through `engine` (a sync Engine)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request metrics and (optionally) SQL timing headers."""
+
+    def __init__(self, app, sql_headers: bool = True) -> None:
+        self.app = app
+        self.sql_headers = sql_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = SQLStats()
+        token = _current_sql.set(stats)
+        started = time.perf_counter()
+        status = {"code": 500}
+        size = {"bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if self.sql_headers:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-sql-queries", str(stats.queries).encode()))
+                    headers.append((b"x-sql-time-ms", f"{stats.seconds * 1000:.3f}".encode()))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _current_sql.reset(token)
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=path, status=str(status["code"]))
+            HTTP_LATENCY.observe(elapsed, method=method, route=path)
+            HTTP_RESPONSE_SIZE.observe(size["bytes"], method=method, route=path)
+            REQUEST_SQL_QUERIES.observe(stats.queries, route=path)
+            REQUEST_SQL_SECONDS.observe(stats.seconds, route=path)
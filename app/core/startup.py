@@ -0,0 +1,42 @@
+"""Startup-time breakdown of a worker (imports, schema, pool prewarm, statement warmup, ...).
+
+Phases are logged once startup completes, kept on `app.state.startup_timings` and exported
+as the `app_startup_seconds{phase=...}` gauge.
+"""
+
+from __future__ import annotations
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from app.core.metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Seconds per named startup phase, in the order they ran."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        STARTUP_SECONDS.set(seconds, phase=name)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def report(self) -> Dict[str, float]:
+        """Log the breakdown and return it (milliseconds, plus a `total`)."""
+        timings = {name: round(s * 1000, 3) for name, s in self.phases.items()}
+        timings["total"] = round(sum(self.phases.values()) * 1000, 3)
+        STARTUP_SECONDS.set(sum(self.phases.values()), phase="total")
+        logger.info("startup took %s", ", ".join(f"{k}={v:.1f}ms" for k, v in timings.items()))
+        return timings
@@ -1,23 +1,245 @@
-from contextlib import contextmanager
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.core.config import get_settings
+import asyncio
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import copy_context
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, TypeVar
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    delete,
+    event,
+    exc,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.engine import URL, Dialect, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.util import await_only
+from app.core.config import Settings, get_settings
+from app.db.sharding import (
+    GLOBAL_SHARD,
+    SHARD_ID_BITS,
+    UserShardedSession,
+    shard_database_url,
+    shard_of,
+    shard_routing,
+)
+
+T = TypeVar("T")
+
+# Sync drivers whose asyncio counterpart has a different dialect name
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync SQLAlchemy URL onto an asyncio driver (psycopg 3 handles both)."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _is_sqlite_file(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def _read_only_url(url: URL) -> URL:
+    """Open the same SQLite file through a `mode=ro` URI."""
+    return url.set(database=f"file:{url.database}", query={"mode": "ro", "uri": "true"})
+
+
+def sqlite_pragmas(settings: Settings, read_only: bool = False) -> List[str]:
+    """PRAGMAs issued on every new connection for the "throughput" profile."""
+    pragmas = [
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+    ]
+    # WAL is persistent in the file; only writers need to (re)assert it
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    else:
+        pragmas.insert(0, "PRAGMA journal_mode=WAL")
+    return pragmas
+
+
+def _engine_options(url: URL, settings: Settings, profile: str, is_async: bool) -> Dict[str, Any]:
+    options: Dict[str, Any] = {}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    if profile == "throughput" and url.database not in (None, "", ":memory:"):
+        options.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+        if _is_sqlite_file(url):
+            options["connect_args"]["timeout"] = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+            if is_async:
+                # aiosqlite defaults to NullPool; keep connections open instead
+                options["poolclass"] = AsyncAdaptedQueuePool
+    return options
+
+
+def _install_pragmas(sync_engine: Engine, pragmas: List[str]) -> None:
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def build_engine(
+    url: str,
+    settings: Settings | None = None,
+    profile: str | None = None,
+    read_only: bool = False,
+    is_async: bool = False,
+) -> Engine | AsyncEngine:
+    """Create a sync or asyncio engine configured for the given engine profile.
+
+    "default" keeps driver defaults. "throughput" turns on WAL and the SQLITE_* pragmas for
+    SQLite files, sizes the pool from DB_POOL_SIZE/DB_MAX_OVERFLOW, and lets `read_only`
+    open the file through a `mode=ro` URI for a separate reader pool.
+    """
+    settings = settings or get_settings()
+    profile = profile or settings.DB_ENGINE_PROFILE
+    parsed = make_url(url)
+    if read_only and _is_sqlite_file(parsed):
+        parsed = _read_only_url(parsed)
+    options = _engine_options(parsed, settings, profile, is_async)
+    if read_only:
+        options.update(pool_size=settings.DB_READ_POOL_SIZE, max_overflow=0)
+    if is_async:
+        new_engine = create_async_engine(parsed, **options)
+    else:
+        new_engine = create_engine(parsed, **options)
+    if profile == "throughput" and _is_sqlite_file(make_url(url)):
+        sync_engine = new_engine.sync_engine if is_async else new_engine
+        _install_pragmas(sync_engine, sqlite_pragmas(settings, read_only=read_only))
+    return new_engine
+
 
 settings = get_settings()
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {},
+shard_count = max(settings.DB_SHARDS, 1)
+_shard_urls = [shard_database_url(settings.DATABASE_URL, i) for i in range(shard_count)]
+# Readers get their own pool only where it buys something (SQLite files in WAL mode)
+_split_reads = settings.DB_ENGINE_PROFILE == "throughput" and _is_sqlite_file(
+    make_url(settings.DATABASE_URL)
+)
+
+
+@dataclass
+class ShardEngines:
+    """The four engines over one database file (the readers may be the writers)."""
+
+    engine: Engine
+    read_engine: Engine
+    async_engine: AsyncEngine
+    async_read_engine: AsyncEngine
+
+
+def _build_shard(url: str, async_url: str) -> ShardEngines:
+    write = build_engine(url, settings)
+    async_write = build_engine(async_url, settings, is_async=True)
+    if not _split_reads:
+        return ShardEngines(write, write, async_write, async_write)
+    return ShardEngines(
+        write,
+        build_engine(url, settings, read_only=True),
+        async_write,
+        build_engine(async_url, settings, read_only=True, is_async=True),
+    )
+
+
+shards = [
+    _build_shard(
+        url,
+        (i == 0 and settings.ASYNC_DATABASE_URL) or async_database_url(url),
+    )
+    for i, url in enumerate(_shard_urls)
+]
+_routing = shard_routing(shard_count)
+
+
+def _sessionmaker(engines: List[Engine]) -> sessionmaker:
+    if len(engines) == 1:
+        return sessionmaker(autocommit=False, autoflush=False, bind=engines[0])
+    return sessionmaker(
+        class_=UserShardedSession,
+        autocommit=False,
+        autoflush=False,
+        shards=dict(enumerate(engines)),
+        **_routing,
+    )
+
+
+def _async_sessionmaker(engines: List[AsyncEngine]) -> async_sessionmaker:
+    if len(engines) == 1:
+        return async_sessionmaker(engines[0], autoflush=False, expire_on_commit=False)
+    return async_sessionmaker(
+        sync_session_class=UserShardedSession,
+        autoflush=False,
+        expire_on_commit=False,
+        shards={i: e.sync_engine for i, e in enumerate(engines)},
+        **_routing,
+    )
+
+
+# Shard 0 is DATABASE_URL itself; unsharded, it is the only one
+engine = shards[0].engine
+read_engine = shards[0].read_engine
+SessionLocal = _sessionmaker([s.engine for s in shards])
+ReadSessionLocal = _sessionmaker([s.read_engine for s in shards])
+
+# Asyncio engines over the same database(s), used by `async def` endpoints
+async_engine = shards[0].async_engine
+async_read_engine = shards[0].async_read_engine
+AsyncSessionLocal = _async_sessionmaker([s.async_engine for s in shards])
+AsyncReadSessionLocal = _async_sessionmaker([s.async_read_engine for s in shards])
+
+# Plain per-shard readers for scatter-gather, over engines of their own: a request already
+# holding a connection from the main pools must never wait on those same pools again.
+_scatter_engines = (
+    [build_engine(url, settings, read_only=_split_reads) for url in _shard_urls]
+    if shard_count > 1
+    else []
+)
+_async_scatter_engines = (
+    [
+        build_engine(async_database_url(url), settings, read_only=_split_reads, is_async=True)
+        for url in _shard_urls
+    ]
+    if shard_count > 1
+    else []
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_shard_readers = [_sessionmaker([e]) for e in _scatter_engines]
+_async_shard_readers = [_async_sessionmaker([e]) for e in _async_scatter_engines]
+_scatter_pool = ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix="shard-scatter")
 
 
 @contextmanager
-def session_context():
+def session_context(session_factory: sessionmaker = SessionLocal):
     """Yield a DB session and ensure rollback on error, always closing.
 
     If an exception bubbles up, we rollback.
     """
-    db = SessionLocal()
+    db = session_factory()
     try:
         yield db
     except Exception:
@@ -25,3 +247,187 @@ def session_context():
         raise
     finally:
         db.close()
+
+
+@asynccontextmanager
+async def async_session_context(session_factory: async_sessionmaker = AsyncSessionLocal):
+    """Async counterpart of `session_context` (rollback on error, always close)."""
+    db = session_factory()
+    try:
+        yield db
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+def is_sharded(db: Session) -> bool:
+    return isinstance(db, ShardedSession)
+
+
+def all_engines() -> List[Engine]:
+    """Every distinct sync engine, including the sync side of the asyncio ones."""
+    found = {id(e): e for e in _sync_engines()}
+    for e in _async_engines():
+        found.setdefault(id(e.sync_engine), e.sync_engine)
+    return list(found.values())
+
+
+def _sync_engines() -> List[Engine]:
+    engines = [e for s in shards for e in (s.engine, s.read_engine)]
+    return list({id(e): e for e in engines + _scatter_engines}.values())
+
+
+def _async_engines() -> List[AsyncEngine]:
+    engines = [e for s in shards for e in (s.async_engine, s.async_read_engine)]
+    return list({id(e): e for e in engines + _async_scatter_engines}.values())
+
+
+async def dispose_engines() -> None:
+    for e in _async_engines():
+        await e.dispose()
+
+
+def _prewarm_count(pool: Pool, connections: int) -> int:
+    # Only pools that keep idle connections (QueuePool); NullPool would just close them
+    size = getattr(pool, "size", None)
+    return min(connections, size()) if callable(size) else 0
+
+
+def prewarm_pools(connections: int) -> int:
+    """Open up to `connections` connections per sync engine now instead of on first use.
+
+    They go straight back to the pool with their PRAGMAs applied. Returns how many opened.
+    """
+    opened = 0
+    for e in _sync_engines():
+        held = [e.connect() for _ in range(_prewarm_count(e.pool, connections))]
+        opened += len(held)
+        for conn in held:
+            conn.close()
+    return opened
+
+
+async def prewarm_async_pools(connections: int) -> int:
+    """Asyncio counterpart of `prewarm_pools`."""
+    opened = 0
+    for e in _async_engines():
+        held = [await e.connect() for _ in range(_prewarm_count(e.pool, connections))]
+        opened += len(held)
+        for conn in held:
+            await conn.close()
+    return opened
+
+
+# Kept outside the app's metadata: it describes that metadata
+_schema_state = MetaData()
+_fingerprints = Table(
+    "schema_fingerprint",
+    _schema_state,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+)
+
+
+def schema_fingerprint(metadata: MetaData, dialect: Dialect) -> str:
+    """SHA-256 of the DDL (tables and indexes) `metadata` compiles to on `dialect`."""
+    ddl = []
+    for table in metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda i: str(i.name)):
+            ddl.append(str(CreateIndex(index).compile(dialect=dialect)))
+    return hashlib.sha256("\n".join(ddl).encode()).hexdigest()
+
+
+def _stored_fingerprint(target: Engine) -> str | None:
+    try:
+        with target.connect() as conn:
+            return conn.execute(select(_fingerprints.c.fingerprint)).scalar()
+    except exc.DBAPIError:
+        # No fingerprint table yet: a new database, or one created before fingerprints
+        return None
+
+
+def create_schema(metadata: MetaData, skip_if_current: bool = False) -> bool:
+    """Create missing tables on every shard; returns whether any DDL ran.
+
+    Sharded, tables keyed by an integer `id` use AUTOINCREMENT, and shard i's sequences
+    start at `i << SHARD_ID_BITS` so its ids name it (shard 0 keeps counting from 1).
+
+    Each shard stores a fingerprint of the schema it was created with. `skip_if_current`
+    leaves shards whose fingerprint matches alone (one SELECT instead of a reflection
+    query per table); it doesn't notice tables changed behind the app's back.
+    """
+    id_tables = [
+        t
+        for t in metadata.sorted_tables
+        if t.autoincrement_column is not None and t.autoincrement_column.name == "id"
+    ]
+    if shard_count > 1:
+        for table in id_tables:
+            table.dialect_kwargs["sqlite_autoincrement"] = True
+    fingerprint = schema_fingerprint(metadata, engine.dialect)
+    seed = text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+    )
+    ran = False
+    for index, shard in enumerate(shards):
+        if skip_if_current and _stored_fingerprint(shard.engine) == fingerprint:
+            continue
+        metadata.create_all(bind=shard.engine)
+        _schema_state.create_all(bind=shard.engine)
+        with shard.engine.begin() as conn:
+            if index > 0:
+                for table in id_tables:
+                    conn.execute(seed, {"name": table.name, "seq": index << SHARD_ID_BITS})
+            conn.execute(delete(_fingerprints))
+            conn.execute(insert(_fingerprints).values(id=1, fingerprint=fingerprint))
+        ran = True
+    return ran
+
+
+def shard_groups(
+    db: Session, items: Iterable[T], user_id: Callable[[T], int]
+) -> Dict[int, List[T]]:
+    """Split `items` by the shard of `user_id(item)` (a single group when unsharded).
+
+    For Core writes: run the statement once per group with
+    `bind_arguments={"shard_id": shard}` (harmless on a plain Session).
+    """
+    if not is_sharded(db):
+        return {GLOBAL_SHARD: list(items)}
+    groups: Dict[int, List[T]] = defaultdict(list)
+    for item in items:
+        groups[shard_of(user_id(item))].append(item)
+    return groups
+
+
+async def _run_on(factory: async_sessionmaker, fn: Callable[[Session], T]) -> T:
+    async with async_session_context(factory) as db:
+        return await db.run_sync(fn)
+
+
+def _run_in_thread(factory: sessionmaker, fn: Callable[[Session], T]) -> T:
+    with session_context(factory) as db:
+        return fn(db)
+
+
+def scatter(db: Session, fn: Callable[[Session], T]) -> List[T]:
+    """Run read-only `fn(session)` on every shard in parallel; `[fn(db)]` when unsharded.
+
+    Each shard gets its own reader session. Under `AsyncSession.run_sync` the shards are
+    queried concurrently on the event loop; otherwise on a thread pool.
+    """
+    if not is_sharded(db):
+        return [fn(db)]
+    if db.get_bind().dialect.is_async:
+        gathered = asyncio.gather(*(_run_on(factory, fn) for factory in _async_shard_readers))
+        return await_only(gathered)
+    futures = [
+        # copy_context: per-request SQL metrics keep counting in the workers
+        _scatter_pool.submit(copy_context().run, _run_in_thread, factory, fn)
+        for factory in _shard_readers
+    ]
+    return [f.result() for f in futures]
@@ -0,0 +1,139 @@
+"""User sharding: which database file a row lives on.
+
+With `DB_SHARDS` > 1 every user, and everything they own, lives in one of K SQLite files.
+Each shard hands out ids above `index << SHARD_ID_BITS` (seeded AUTOINCREMENT), so any user
+or record id names its shard, and `db.get(Model, id)` or a `user_id == x` filter is routed
+without a directory lookup. New users are placed by a hash of their email. Population-wide
+tables (sketches) live on shard 0, which is `DATABASE_URL` itself, so an existing
+single-file database becomes shard 0 unchanged.
+"""
+
+import os
+import zlib
+from typing import Any, Callable, Dict, List, Set
+from sqlalchemy import BindParameter, ColumnClause, Tuple
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+
+__all__ = [
+    "GLOBAL_SHARD",
+    "SHARD_ID_BITS",
+    "UserShardedSession",
+    "criteria_shards",
+    "placement_shard",
+    "shard_database_url",
+    "shard_of",
+    "shard_routing",
+]
+
+SHARD_ID_BITS = 40
+GLOBAL_SHARD = 0
+
+# Columns whose values carry their shard: every `id` is shard-ranged, `user_id` points at one
+_ROUTING_COLUMNS = ("id", "user_id")
+_USERS_TABLE = "users"
+
+
+def shard_database_url(url: str, index: int) -> str:
+    """URL of shard `index`: `url` itself for 0, `name.shard<i>.db` next to it otherwise."""
+    if index == 0:
+        return url
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        raise ValueError("DB_SHARDS > 1 needs DATABASE_URL to point at a SQLite file")
+    root, ext = os.path.splitext(parsed.database)
+    return parsed.set(database=f"{root}.shard{index}{ext}").render_as_string(hide_password=False)
+
+
+def shard_of(row_id: int) -> int:
+    """Shard holding a user or record id."""
+    return max(int(row_id), 0) >> SHARD_ID_BITS
+
+
+def placement_shard(key: str, count: int) -> int:
+    """Shard for a new user, from a stable hash of `key` (their email)."""
+    return zlib.crc32(key.strip().lower().encode()) % count
+
+
+def criteria_shards(clause, params: Dict[str, Any] | None = None) -> Set[int]:
+    """Shards named by `id`/`user_id` equality or IN comparisons anywhere in `clause`.
+
+    The union over every comparison found: a superset, as long as routing columns are only
+    ever constrained positively (which is how this app filters them). `params` supplies
+    values for bind parameters passed at execution time (e.g. by `Session.get`).
+    """
+    found: Set[int] = set()
+    params = params or {}
+
+    def visit_binary(binary) -> None:
+        left, right = binary.left, binary.right
+        if not isinstance(right, BindParameter):
+            return
+        value = params.get(right.key, right.effective_value)
+        if isinstance(left, Tuple) and binary.operator is operators.in_op:
+            # tuple_(user_id, day).in_([...]): route on the leading column
+            left = left.clauses[0]
+            values = [v[0] for v in value or ()]
+        elif binary.operator is operators.eq:
+            values = [value]
+        elif binary.operator is operators.in_op:
+            values = list(value or ())
+        else:
+            return
+        if isinstance(left, ColumnClause) and left.name in _ROUTING_COLUMNS:
+            found.update(shard_of(v) for v in values if isinstance(v, int))
+
+    if clause is not None:
+        visitors.traverse(clause, {}, {"binary": visit_binary})
+    return found
+
+
+class UserShardedSession(ShardedSession):
+    """`ShardedSession` whose bare `get_bind()` (dialect lookups) answers with shard 0."""
+
+    def get_bind(self, mapper=None, *, shard_id=None, **kw: Any):
+        if shard_id is None and mapper is None:
+            shard_id = GLOBAL_SHARD
+        return super().get_bind(mapper, shard_id=shard_id, **kw)
+
+
+def shard_routing(count: int) -> Dict[str, Callable]:
+    """`ShardedSession` chooser callables for `count` shards."""
+    everywhere = list(range(count))
+
+    def valid(shards: Set[int]) -> List[int]:
+        # Ids beyond the last shard can't exist anywhere; shard 0 answers "not found"
+        return sorted(s for s in shards if s < count) or [GLOBAL_SHARD]
+
+    def shard_chooser(mapper, instance, clause=None, **kw: Any) -> int:
+        if instance is None:
+            return GLOBAL_SHARD
+        user_id = getattr(instance, "user_id", None)
+        if user_id is not None:
+            return valid({shard_of(user_id)})[0]
+        if mapper is not None and mapper.local_table.name == _USERS_TABLE:
+            if instance.id is not None:
+                return valid({shard_of(instance.id)})[0]
+            return placement_shard(instance.email, count)
+        return GLOBAL_SHARD
+
+    def identity_chooser(mapper, primary_key, **kw: Any) -> List[int]:
+        if mapper.primary_key[0].name not in _ROUTING_COLUMNS:
+            return [GLOBAL_SHARD]
+        return valid({shard_of(primary_key[0])})
+
+    def execute_chooser(context) -> List[int]:
+        params = context.parameters if isinstance(context.parameters, dict) else None
+        shards = criteria_shards(getattr(context.statement, "whereclause", None), params)
+        if shards:
+            return valid(shards)
+        if context.is_insert:
+            raise ValueError("Sharded INSERT needs bind_arguments={'shard_id': ...}")
+        return everywhere
+
+    return {
+        "shard_chooser": shard_chooser,
+        "identity_chooser": identity_chooser,
+        "execute_chooser": execute_chooser,
+    }
@@ -0,0 +1,11 @@
+from typing import Callable, Optional
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Dialects whose insert() supports on_conflict_do_update()
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def upsert_insert(dialect_name: str) -> Optional[Callable]:
+    """Return the dialect's `insert()` with ON CONFLICT support, or None if it has none."""
+    return _UPSERT_INSERTS.get(dialect_name)
@@ -1,16 +1,101 @@
+import time
+
+# Startup timing starts here: everything below (FastAPI, SQLAlchemy, routers) is import cost
+_import_started = time.perf_counter()
+
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.db.session import engine
+from fastapi.responses import ORJSONResponse
+from app.core.admission import AdmissionMiddleware
+from app.core.config import get_settings
+from app.core.metrics import MetricsMiddleware, instrument_engine
+from app.core.startup import StartupTimer
+from app.db.session import (
+    AsyncReadSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+    all_engines,
+    async_session_context,
+    create_schema,
+    dispose_engines,
+    prewarm_async_pools,
+    prewarm_pools,
+    session_context,
+)
 from app.db.base import Base
+from app.api import metrics
+from app.api.warmup import warm_statements, warm_statements_async
 from app.api.v1.router import api_router
+from app.clients.fhir_client import FHIRClient
+from app.services.rollups import backfill_daily_rollups
+from app.services.score_store import ScoreRefresher
+from app.services.write_behind import WriteBehindQueue
+from starlette.concurrency import run_in_threadpool
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # For SQLite demo: create tables on startup
-    Base.metadata.create_all(bind=engine)
+    timer = StartupTimer()
+    timer.record("import", _import_seconds)
+    # For SQLite demo: create tables on startup (fast startup: only if the schema changed)
+    with timer.phase("schema"):
+        created = create_schema(Base.metadata, skip_if_current=settings.FAST_STARTUP)
+    if created:
+        # Databases created before the rollup table existed get their rollups built once
+        with timer.phase("rollup_backfill"), session_context() as db:
+            backfill_daily_rollups(db)
+    if settings.FAST_STARTUP:
+        with timer.phase("pool_prewarm"):
+            prewarm_pools(settings.STARTUP_PREWARM_CONNECTIONS)
+            await prewarm_async_pools(settings.STARTUP_PREWARM_CONNECTIONS)
+        with timer.phase("statement_warmup"):
+            for factory in (SessionLocal, ReadSessionLocal):
+                with session_context(factory) as db:
+                    warm_statements(db)
+            async with async_session_context(AsyncReadSessionLocal) as adb:
+                await warm_statements_async(adb, settings.HEALTH_SCORE_WINDOWS)
+    app.state.fhir_client = FHIRClient.from_settings()
+    refresher = None
+    if settings.SCORE_WORKER_ENABLED:
+        refresher = ScoreRefresher(
+            settings.HEALTH_SCORE_WINDOWS,
+            settings.SCORE_REFRESH_INTERVAL_SECONDS,
+            settings.SCORE_FULL_REFRESH_SECONDS,
+        )
+        refresher.start()
+    app.state.score_refresher = refresher
+    write_behind = None
+    if settings.WRITE_BEHIND_ENABLED:
+        write_behind = WriteBehindQueue.from_settings()
+        write_behind.start()
+    app.state.write_behind = write_behind
+    app.state.startup_timings = timer.report()
     yield
+    if write_behind is not None:
+        # Drains the queue: everything acknowledged before shutdown gets committed
+        await run_in_threadpool(write_behind.stop)
+    if refresher is not None:
+        await refresher.stop()
+    await app.state.fhir_client.aclose()
+    await dispose_engines()
+
 
+settings = get_settings()
 
-app = FastAPI(title="Health Tracker API", version="1.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="Health Tracker API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 app.include_router(api_router)
+# Added before MetricsMiddleware so that one (outermost) also counts shed requests
+app.add_middleware(AdmissionMiddleware, **AdmissionMiddleware.settings_kwargs())
+
+if settings.METRICS_ENABLED:
+    for sql_engine in all_engines():
+        instrument_engine(sql_engine)
+    app.add_middleware(MetricsMiddleware, sql_headers=settings.SQL_TIMING_HEADERS)
+    app.include_router(metrics.router)
+
+_import_seconds = time.perf_counter() - _import_started
@@ -0,0 +1,22 @@
+from datetime import date, datetime
+from sqlalchemy import Date, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+
+class ArchiveSegment(Base):
+    """One user's archived raw rows of one kind for one month (a compressed column file)."""
+
+    __tablename__ = "archive_segments"
+
+    # No FK: the user purge removes segments together with their files
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(16), primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+    # Relative to ARCHIVE_DIR; a new version is written whenever the month gets more rows
+    path: Mapped[str] = mapped_column(String(255))
+    version: Mapped[int] = mapped_column(Integer, default=1)
+    rows: Mapped[int] = mapped_column(Integer)
+    min_time: Mapped[datetime] = mapped_column(DateTime)
+    max_time: Mapped[datetime] = mapped_column(DateTime, index=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime)
@@ -0,0 +1,17 @@
+from datetime import date
+from sqlalchemy import Date, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+
+class ArchivedRecord(Base):
+    """Where an archived raw row went: its id -> the (user, month) segment holding it."""
+
+    __tablename__ = "archived_records"
+
+    # `id` first: it names the shard, so a lookup by id goes to the right database
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    kind: Mapped[str] = mapped_column(String(16), primary_key=True)
+    # No FK: the user purge removes these together with the segments
+    user_id: Mapped[int] = mapped_column(Integer, index=True)
+    month: Mapped[date] = mapped_column(Date)
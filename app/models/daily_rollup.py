@@ -0,0 +1,26 @@
+from datetime import date, datetime
+from sqlalchemy import ForeignKey, Integer, Float, Date, DateTime
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.db.base import Base
+
+
+class UserDailyRollup(Base):
+    """Per-user daily sums, kept current by the activity/sleep/blood-test handlers."""
+
+    __tablename__ = "user_daily_rollups"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True, index=True)
+    activity_count: Mapped[int] = mapped_column(Integer, default=0)
+    steps_sum: Mapped[int] = mapped_column(Integer, default=0)
+    sleep_count: Mapped[int] = mapped_column(Integer, default=0)
+    sleep_minutes_sum: Mapped[int] = mapped_column(Integer, default=0)
+    sleep_quality_sum: Mapped[int] = mapped_column(Integer, default=0)
+    sleep_quality_count: Mapped[int] = mapped_column(Integer, default=0)
+    glucose_count: Mapped[int] = mapped_column(Integer, default=0)
+    glucose_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    user = relationship("User", back_populates="daily_rollups")
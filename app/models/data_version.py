@@ -0,0 +1,19 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+# `user_id` of the row counting changes to any user's data (population-wide reads)
+GLOBAL_VERSION_ID = 0
+
+
+class UserDataVersion(Base):
+    """Monotonic counter bumped by every commit that changes a user's data."""
+
+    __tablename__ = "user_data_versions"
+
+    # No FK: row 0 is the global version, and versions outlive deleted users so an
+    # ETag for a deleted user's listing can't come back around
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
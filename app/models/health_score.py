@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Any
+from sqlalchemy import ForeignKey, Integer, Float, DateTime, JSON
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.db.base import Base
+
+
+class HealthScore(Base):
+    """Latest computed health-score payload per (user, window), refreshed in the background."""
+
+    __tablename__ = "health_scores"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    days: Mapped[int] = mapped_column(Integer, primary_key=True)
+    score: Mapped[float] = mapped_column(Float)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+    user = relationship("User", back_populates="health_scores")
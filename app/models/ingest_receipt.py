@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+
+class IngestReceipt(Base):
+    """Proof that a write-behind ticket was committed, and the id of the row it created."""
+
+    __tablename__ = "ingest_receipts"
+
+    ticket: Mapped[str] = mapped_column(String(32), primary_key=True)
+    # No FK: a receipt is only a record of what happened, and is pruned after a while
+    user_id: Mapped[int] = mapped_column(Integer)
+    kind: Mapped[str] = mapped_column(String(16))
+    record_id: Mapped[int] = mapped_column(Integer)
+    persisted_at: Mapped[datetime] = mapped_column(DateTime, index=True)
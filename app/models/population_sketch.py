@@ -0,0 +1,17 @@
+from datetime import date, datetime
+from typing import Any
+from sqlalchemy import Date, DateTime, Integer, JSON, String
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base import Base
+
+
+class PopulationSketch(Base):
+    """Persisted quantile sketch of one score component across users, per scoring window."""
+
+    __tablename__ = "population_sketches"
+
+    days: Mapped[int] = mapped_column(Integer, primary_key=True)
+    component: Mapped[str] = mapped_column(String(16), primary_key=True)
+    since_day: Mapped[date] = mapped_column(Date)
+    sketch: Mapped[dict[str, Any]] = mapped_column(JSON)
+    built_at: Mapped[datetime] = mapped_column(DateTime)
@@ -28,3 +28,7 @@ class User(Base):
     )
     sleeps = relationship("SleepActivity", back_populates="user", cascade="all, delete-orphan")
     blood_tests = relationship("BloodTest", back_populates="user", cascade="all, delete-orphan")
+    daily_rollups = relationship(
+        "UserDailyRollup", back_populates="user", cascade="all, delete-orphan"
+    )
+    health_scores = relationship("HealthScore", back_populates="user", cascade="all, delete-orphan")
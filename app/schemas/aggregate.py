@@ -0,0 +1,16 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class MetricStats(BaseModel):
+    count: int
+    sum: float | None = None
+    avg: float | None = None
+    min: float | None = None
+    max: float | None = None
+
+
+class AggregateBucket(BaseModel):
+    start: datetime
+    count: int
+    metrics: dict[str, MetricStats]
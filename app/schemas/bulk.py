@@ -0,0 +1,12 @@
+from typing import Any
+from pydantic import BaseModel
+
+
+class BulkRowError(BaseModel):
+    index: int
+    detail: Any
+
+
+class BulkResult(BaseModel):
+    inserted: int
+    errors: list[BulkRowError]
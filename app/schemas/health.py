@@ -0,0 +1,8 @@
+from typing import Literal
+from pydantic import BaseModel, Field
+
+
+class HealthScoreBatchRequest(BaseModel):
+    user_ids: list[int] | Literal["all"] = "all"
+    days: int = Field(30, gt=0)
+    fhir: bool = False
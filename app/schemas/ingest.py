@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel
+
+
+class IngestAccepted(BaseModel):
+    ticket: str
+    kind: str
+    status: Literal["queued"]
+
+
+class IngestStatus(BaseModel):
+    ticket: str
+    kind: str
+    status: Literal["queued", "persisted", "failed"]
+    record_id: int | None = None
+    persisted_at: datetime | None = None
+    detail: str | None = None
@@ -1,4 +1,5 @@
 from datetime import date, datetime
+from typing import Literal
 from pydantic import BaseModel, EmailStr
 from app.models.user import GenderEnum
 
@@ -26,7 +27,22 @@ class UserUpdate(BaseModel):
 
 class UserOut(UserBase):
     id: int
+    # Validated as EmailStr on the way in; re-running email validation per row on the way
+    # out dominated list_users serialization time
+    email: str
     created_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class PurgeJobOut(BaseModel):
+    job_id: str
+    user_id: int
+    # Raw rows (activities, sleeps, blood tests) to delete, and deleted so far
+    total: int
+    deleted: int
+    status: Literal["running", "done", "failed"]
+    started_at: datetime
+    finished_at: datetime | None = None
+    error: str | None = None
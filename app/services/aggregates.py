@@ -0,0 +1,121 @@
+"""Time-bucketed aggregates for the chart endpoints, computed in SQL.
+
+Rows are grouped on the start of their hour/day/week (weeks start on Monday) and reduced
+to count/sum/avg/min/max per metric, so a chart needs tens of buckets instead of the raw
+rows. Bucketing is dialect-specific: `strftime` on SQLite, `date_trunc` on PostgreSQL.
+With user sharding an unfiltered query returns partial buckets per shard; they are merged,
+and so are buckets over archived rows (`app.services.archive`).
+"""
+
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Dict, List, Literal, Sequence
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.services.archive import archived_buckets
+
+__all__ = ["Bucket", "aggregate_buckets", "bucket_start"]
+
+Bucket = Literal["hour", "day", "week"]
+
+_SQLITE_BUCKETS = {
+    "hour": ("%Y-%m-%d %H:00:00",),
+    "day": ("%Y-%m-%d 00:00:00",),
+    # 'weekday 0' moves forward to Sunday (or stays), -6 days lands on that week's Monday
+    "week": ("%Y-%m-%d 00:00:00", "weekday 0", "-6 days"),
+}
+
+
+def bucket_start(column, bucket: Bucket, dialect_name: str):
+    """SQL expression for the start of the bucket containing `column`."""
+    if dialect_name == "sqlite":
+        fmt, *modifiers = _SQLITE_BUCKETS[bucket]
+        return func.strftime(fmt, column, *modifiers)
+    return func.date_trunc(bucket, column)
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def _stats(column, prefix: str) -> list:
+    return [
+        func.count(column).label(f"{prefix}_count"),
+        func.sum(column).label(f"{prefix}_sum"),
+        func.avg(column).label(f"{prefix}_avg"),
+        func.min(column).label(f"{prefix}_min"),
+        func.max(column).label(f"{prefix}_max"),
+    ]
+
+
+def _merge_stats(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two partial count/sum/avg/min/max results over disjoint rows."""
+    if not b["count"]:
+        return a
+    if not a["count"]:
+        return b
+    count, total = a["count"] + b["count"], a["sum"] + b["sum"]
+    return {
+        "count": count,
+        "sum": total,
+        "avg": total / count,
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+    }
+
+
+def aggregate_buckets(
+    db: Session,
+    time_column,
+    columns: Sequence,
+    bucket: Bucket,
+    user_id: int | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    group_by=None,
+) -> List[Dict[str, Any]]:
+    """Per-bucket `{"start", "count", "metrics": {name: {count, sum, avg, min, max}}}`.
+
+    Metrics are keyed by column name, or by the `group_by` value when given (one column,
+    e.g. blood-test values per test type). `start`/`end` bound `time_column` as [start, end);
+    buckets without rows are omitted.
+    """
+    model = time_column.class_
+    key = bucket_start(time_column, bucket, db.get_bind().dialect.name).label("bucket")
+    fields = [key, func.count().label("rows")]
+    group = [key]
+    if group_by is not None:
+        fields.append(group_by.label("group"))
+        group.append(group_by)
+    for i, column in enumerate(columns):
+        fields += _stats(column, f"m{i}")
+    stmt = select(*fields).group_by(*group).order_by(key)
+    if user_id is not None:
+        stmt = stmt.where(model.user_id == user_id)
+    if start is not None:
+        stmt = stmt.where(time_column >= start)
+    if end is not None:
+        stmt = stmt.where(time_column < end)
+
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    for row in db.execute(stmt).mappings():
+        when = _as_datetime(row["bucket"])
+        out = buckets.setdefault(when, {"start": when, "count": 0, "metrics": {}})
+        out["count"] += row["rows"]
+        for i, column in enumerate(columns):
+            name = row["group"] if group_by is not None else column.key
+            stats = {s: row[f"m{i}_{s}"] for s in ("count", "sum", "avg", "min", "max")}
+            if name in out["metrics"]:
+                # Sharded, unfiltered: the same bucket comes back once per shard
+                stats = _merge_stats(out["metrics"][name], stats)
+            out["metrics"][name] = stats
+    if group_by is None:
+        names = [column.key for column in columns]
+        for when, cold in archived_buckets(db, model, names, bucket, user_id, start, end).items():
+            out = buckets.setdefault(when, {"start": when, "count": 0, "metrics": {}})
+            out["count"] += cold["count"]
+            for name, stats in cold["metrics"].items():
+                if name in out["metrics"]:
+                    stats = _merge_stats(out["metrics"][name], stats)
+                out["metrics"][name] = stats
+    return sorted(buckets.values(), key=itemgetter("start"))
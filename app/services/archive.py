@@ -0,0 +1,395 @@
+"""Hot/cold tiering of raw activities and sleeps.
+
+`archive_old_rows()` moves every row from a month wholly before the cutoff out of the hot
+table into one compressed, column-oriented `.npz` file per (kind, user, month) under
+`ARCHIVE_DIR`, recorded in `archive_segments`. Daily rollups are left alone, so scores and
+daily summaries don't change. Files are immutable: a month that gets more rows later is
+rewritten under the next version and the old file removed after the commit, so a crash
+never leaves a segment pointing at a half-written file.
+
+`archived_rows()` and `archived_buckets()` are the read side: list and aggregate endpoints
+merge them with live rows whenever a query's range reaches archived months (a segment
+lookup decides; most requests read no file at all). `archived_records` maps each archived
+id to its segment, so `archived_record()` can still fetch one by id; archived records are
+read-only, and updating or deleting one is refused with `409` rather than `404`.
+
+`rebuild_daily_rollups()` recomputes from the hot tables only; run it before archiving, not
+after.
+"""
+
+from __future__ import annotations
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter, itemgetter
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+from sqlalchemy import DateTime, Integer, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.session import shard_groups
+from app.models.activity import PhysicalActivity
+from app.models.archive_segment import ArchiveSegment
+from app.models.archived_record import ArchivedRecord
+from app.models.sleep import SleepActivity
+
+__all__ = [
+    "ARCHIVED_MODELS",
+    "archive_old_rows",
+    "archived_buckets",
+    "archived_record",
+    "archived_rows",
+    "is_archived",
+    "drop_user_archive",
+    "remove_files",
+]
+
+# kind -> (model, time column name)
+ARCHIVED_MODELS = {
+    "activity": (PhysicalActivity, "start_time"),
+    "sleep": (SleepActivity, "start_time"),
+}
+_KINDS = {model: kind for kind, (model, _) in ARCHIVED_MODELS.items()}
+_DELETE_CHUNK = 500
+
+Key = Tuple[datetime, int]
+
+
+def _root() -> str:
+    return get_settings().ARCHIVE_DIR
+
+
+def _month(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _stored_columns(model) -> list:
+    # user_id is the same for the whole file; it lives in the segment row
+    return [c for c in model.__table__.columns if c.name != "user_id"]
+
+
+def _to_arrays(model, rows: Sequence) -> Dict[str, np.ndarray]:
+    arrays = {}
+    for column in _stored_columns(model):
+        values = [getattr(r, column.name) for r in rows]
+        if isinstance(column.type, DateTime):
+            arrays[column.name] = np.array(values, dtype="datetime64[us]")
+        elif column.primary_key:
+            arrays[column.name] = np.array(values, dtype=np.int64)
+        else:
+            # Nullable numbers: NaN stands for NULL
+            arrays[column.name] = np.array(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+    return arrays
+
+
+def _write(relative: str, arrays: Dict[str, np.ndarray]) -> None:
+    path = os.path.join(_root(), relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+
+
+@lru_cache(maxsize=get_settings().ARCHIVE_CACHE_SEGMENTS)
+def _load(relative: str) -> Dict[str, np.ndarray]:
+    # Safe to cache by path: a path is never rewritten (new versions get new names)
+    with np.load(os.path.join(_root(), relative)) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def remove_files(paths: Sequence[str]) -> None:
+    for relative in paths:
+        try:
+            os.remove(os.path.join(_root(), relative))
+        except FileNotFoundError:
+            pass
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _archive_month(db: Session, kind: str, user_id: int, month: date) -> int:
+    """Move one user's rows of one month into its segment, in a transaction of its own."""
+    model, time_name = ARCHIVED_MODELS[kind]
+    table = model.__table__
+    time_col = table.c[time_name]
+    lo = datetime(month.year, month.month, 1)
+    hi = datetime.combine(_next_month(month), datetime.min.time())
+    rows = db.execute(
+        select(table)
+        .where(table.c.user_id == user_id, time_col >= lo, time_col < hi)
+        .order_by(time_col, table.c.id)
+    ).all()
+    if not rows:
+        return 0
+    superseded = []
+    arrays = _to_arrays(model, rows)
+    segment = db.get(ArchiveSegment, (user_id, kind, month))
+    if segment is None:
+        segment = ArchiveSegment(user_id=user_id, kind=kind, month=month, version=0)
+        db.add(segment)
+    else:
+        # Late rows for an archived month: merge into a new version of the file
+        old = _load(segment.path)
+        arrays = {name: np.concatenate([old[name], arrays[name]]) for name in arrays}
+        order = np.lexsort((arrays["id"], arrays[time_name]))
+        arrays = {name: values[order] for name, values in arrays.items()}
+        superseded.append(segment.path)
+    segment.version += 1
+    segment.path = f"{kind}/{user_id}/{month:%Y-%m}.{segment.version}.npz"
+    segment.rows = len(arrays["id"])
+    segment.min_time = arrays[time_name][0].item()
+    segment.max_time = arrays[time_name][-1].item()
+    segment.archived_at = datetime.utcnow()
+    _write(segment.path, arrays)
+    ids = [r.id for r in rows]
+    entries = [{"id": i, "kind": kind, "user_id": user_id, "month": month} for i in ids]
+    for shard, part in shard_groups(db, entries, itemgetter("user_id")).items():
+        db.execute(insert(ArchivedRecord.__table__), part, bind_arguments={"shard_id": shard})
+    for i in range(0, len(ids), _DELETE_CHUNK):
+        db.execute(
+            delete(table)
+            .where(table.c.id.in_(ids[i : i + _DELETE_CHUNK]))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    remove_files(superseded)
+    return len(ids)
+
+
+def _archive_user(db: Session, kind: str, user_id: int, cutoff: datetime) -> int:
+    model, time_name = ARCHIVED_MODELS[kind]
+    time_col = getattr(model, time_name)
+    moved = 0
+    since = None
+    while True:
+        # Oldest remaining month first; only one month of rows is ever held in memory
+        stmt = select(func.min(time_col)).where(model.user_id == user_id, time_col < cutoff)
+        if since is not None:
+            stmt = stmt.where(time_col >= since)
+        first = db.scalar(stmt)
+        if first is None:
+            db.rollback()
+            return moved
+        month = _month(first)
+        moved += _archive_month(db, kind, user_id, month)
+        since = datetime.combine(_next_month(month), datetime.min.time())
+
+
+def archive_old_rows(db: Session, older_than: datetime) -> Dict[str, int]:
+    """Archive rows from months wholly before `older_than`; rows moved per kind.
+
+    One transaction per (kind, user, month), so the hot table is never locked for long and
+    memory holds one month of one user's rows at a time.
+    """
+    cutoff = datetime(older_than.year, older_than.month, 1)
+    moved: Dict[str, int] = {}
+    for kind, (model, time_name) in ARCHIVED_MODELS.items():
+        time_col = getattr(model, time_name)
+        user_ids = set(db.scalars(select(model.user_id).where(time_col < cutoff).distinct()))
+        db.rollback()
+        moved[kind] = sum(_archive_user(db, kind, u, cutoff) for u in sorted(user_ids))
+    return moved
+
+
+def drop_user_archive(db: Session, user_id: int) -> List[str]:
+    """Delete a user's segment rows (caller commits); returns their files to remove after."""
+    paths = list(db.scalars(select(ArchiveSegment.path).where(ArchiveSegment.user_id == user_id)))
+    for model in (ArchiveSegment, ArchivedRecord):
+        db.execute(
+            delete(model)
+            .where(model.user_id == user_id)
+            .execution_options(synchronize_session=False)
+        )
+    return paths
+
+
+def _segments(
+    db: Session, kind: str, user_id: int | None, lo: datetime | None, hi: datetime | None
+) -> List[ArchiveSegment]:
+    stmt = select(ArchiveSegment).where(ArchiveSegment.kind == kind)
+    if user_id is not None:
+        stmt = stmt.where(ArchiveSegment.user_id == user_id)
+    if lo is not None:
+        stmt = stmt.where(ArchiveSegment.max_time >= lo)
+    if hi is not None:
+        stmt = stmt.where(ArchiveSegment.min_time <= hi)
+    return sorted(db.scalars(stmt), key=attrgetter("month"), reverse=True)
+
+
+def _range_mask(times: np.ndarray, start: datetime | None, end: datetime | None) -> np.ndarray:
+    mask = np.ones(len(times), dtype=bool)
+    if start is not None:
+        mask &= times >= np.datetime64(start, "us")
+    if end is not None:
+        mask &= times < np.datetime64(end, "us")
+    return mask
+
+
+def _key_mask(times: np.ndarray, ids: np.ndarray, key: Key, below: bool) -> np.ndarray:
+    t, i = np.datetime64(key[0], "us"), key[1]
+    if below:
+        return (times < t) | ((times == t) & (ids < i))
+    return (times > t) | ((times == t) & (ids > i))
+
+
+def _to_models(model, user_id: int, arrays: Dict[str, np.ndarray], idx: np.ndarray) -> list:
+    columns = _stored_columns(model)
+    decoded = {}
+    for column in columns:
+        values = arrays[column.name][idx]
+        if isinstance(column.type, DateTime):
+            decoded[column.name] = values.astype(datetime).tolist()
+        elif column.primary_key:
+            decoded[column.name] = values.tolist()
+        else:
+            cast = int if isinstance(column.type, Integer) else float
+            decoded[column.name] = [None if np.isnan(v) else cast(v) for v in values]
+    names = list(decoded)
+    return [
+        model(user_id=user_id, **dict(zip(names, values)))
+        for values in zip(*(decoded[n] for n in names))
+    ]
+
+
+def archived_rows(
+    db: Session,
+    model,
+    user_id: int | None,
+    start: datetime | None,
+    end: datetime | None,
+    before: Key | None,
+    after: Key | None,
+    limit: int,
+) -> list:
+    """Newest-first archived rows (transient `model` instances) for a keyset page.
+
+    Rows fall in [start, end), sort below `before` and above `after` on (time, id); at most
+    `limit` are returned. Months are read newest first and reading stops once a month
+    leaves `limit` rows in hand, since older months can't sort above them.
+    """
+    kind = _KINDS.get(model)
+    if kind is None:
+        return []
+    time_name = ARCHIVED_MODELS[kind][1]
+    lo = max([v for v in (start, after and after[0]) if v is not None], default=None)
+    hi = min([v for v in (end, before and before[0]) if v is not None], default=None)
+    found: list = []
+    for _, segments in groupby(_segments(db, kind, user_id, lo, hi), attrgetter("month")):
+        if len(found) >= limit:
+            break
+        for segment in segments:
+            arrays = _load(segment.path)
+            times, ids = arrays[time_name], arrays["id"]
+            mask = _range_mask(times, start, end)
+            if before is not None:
+                mask &= _key_mask(times, ids, before, below=True)
+            if after is not None:
+                mask &= _key_mask(times, ids, after, below=False)
+            found += _to_models(model, segment.user_id, arrays, np.nonzero(mask)[0])
+    found.sort(key=lambda r: (getattr(r, time_name), r.id), reverse=True)
+    return found[:limit]
+
+
+def is_archived(db: Session, model, record_id: int) -> bool:
+    """Whether `record_id` of `model` was moved to the archive."""
+    kind = _KINDS.get(model)
+    return kind is not None and db.get(ArchivedRecord, (record_id, kind)) is not None
+
+
+def archived_record(db: Session, model, record_id: int):
+    """Archived row `record_id` as a transient `model` instance, or None."""
+    kind = _KINDS.get(model)
+    if kind is None:
+        return None
+    entry = db.get(ArchivedRecord, (record_id, kind))
+    if entry is None:
+        return None
+    segment = db.get(ArchiveSegment, (entry.user_id, kind, entry.month))
+    if segment is None:
+        return None
+    arrays = _load(segment.path)
+    found = _to_models(model, entry.user_id, arrays, np.nonzero(arrays["id"] == record_id)[0])
+    return found[0] if found else None
+
+
+def _bucket_keys(times: np.ndarray, bucket: str) -> np.ndarray:
+    # Same boundaries as `aggregates.bucket_start` (weeks start on Monday)
+    if bucket == "hour":
+        return times.astype("datetime64[h]")
+    days = times.astype("datetime64[D]")
+    if bucket == "week":
+        # Day 0 (1970-01-01) was a Thursday: +3 makes Monday 0
+        days = days - (days.astype(np.int64) + 3) % 7
+    return days
+
+
+def _column_stats(values: np.ndarray, inverse: np.ndarray, n: int, integer: bool) -> list:
+    present = ~np.isnan(values)
+    counts = np.bincount(inverse, weights=present, minlength=n).astype(np.int64)
+    sums = np.bincount(inverse, weights=np.where(present, values, 0.0), minlength=n)
+    mins = np.full(n, np.inf)
+    maxs = np.full(n, -np.inf)
+    np.fmin.at(mins, inverse, values)
+    np.fmax.at(maxs, inverse, values)
+    cast = int if integer else float
+    stats = []
+    for count, total, low, high in zip(counts.tolist(), sums, mins, maxs):
+        if not count:
+            stats.append({"count": 0, "sum": None, "avg": None, "min": None, "max": None})
+            continue
+        stats.append(
+            {
+                "count": count,
+                "sum": cast(total),
+                "avg": float(total) / count,
+                "min": cast(low),
+                "max": cast(high),
+            }
+        )
+    return stats
+
+
+def archived_buckets(
+    db: Session,
+    model,
+    names: Sequence[str],
+    bucket: str,
+    user_id: int | None,
+    start: datetime | None,
+    end: datetime | None,
+) -> Dict[datetime, Dict[str, Any]]:
+    """`{bucket start: {"count", "metrics": {name: stats}}}` over archived rows in [start, end)."""
+    kind = _KINDS.get(model)
+    if kind is None:
+        return {}
+    time_name = ARCHIVED_MODELS[kind][1]
+    parts: Dict[str, List[np.ndarray]] = defaultdict(list)
+    for segment in _segments(db, kind, user_id, start, end):
+        arrays = _load(segment.path)
+        mask = _range_mask(arrays[time_name], start, end)
+        for name in (time_name, *names):
+            parts[name].append(arrays[name][mask])
+    if not parts or not sum(len(a) for a in parts[time_name]):
+        return {}
+    keys, inverse = np.unique(
+        _bucket_keys(np.concatenate(parts[time_name]), bucket), return_inverse=True
+    )
+    n = len(keys)
+    rows = np.bincount(inverse, minlength=n).tolist()
+    integer = {c.name: isinstance(c.type, Integer) for c in model.__table__.columns}
+    metrics = {
+        name: _column_stats(np.concatenate(parts[name]), inverse, n, integer[name])
+        for name in names
+    }
+    return {
+        when: {"count": rows[i], "metrics": {name: metrics[name][i] for name in names}}
+        for i, when in enumerate(keys.astype("datetime64[us]").astype(datetime).tolist())
+    }
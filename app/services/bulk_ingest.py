@@ -0,0 +1,145 @@
+"""Bulk ingestion of activities, sleeps and blood tests.
+
+Bodies are either a JSON array or NDJSON (one object per line, read as it streams in).
+Rows are validated with the regular `*Create` schemas, each distinct user is checked once,
+and valid rows are inserted with executemany in chunks (split by shard), one transaction per
+chunk.
+"""
+
+from __future__ import annotations
+import json
+from operator import attrgetter
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.db.base import Base
+from app.db.session import shard_groups
+from app.models.user import User
+from app.services import rollups
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+RowError = Dict[str, Any]
+Parsed = Tuple[int, Optional[Any], Optional[RowError]]
+
+
+def _error(index: int, detail: Any) -> RowError:
+    return {"index": index, "detail": detail}
+
+
+async def iter_bulk_body(content_type: str, stream: AsyncIterator[bytes]) -> AsyncIterator[Parsed]:
+    """Yield `(index, obj, error)` per row; NDJSON rows are yielded as lines arrive."""
+    if content_type.split(";")[0].strip().lower() in NDJSON_CONTENT_TYPES:
+        index, buffer = 0, b""
+        async for chunk in stream:
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(index, line)
+                    index += 1
+        if buffer.strip():
+            yield _parse_line(index, buffer)
+        return
+
+    body = b"".join([chunk async for chunk in stream])
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        yield 0, None, _error(0, f"Invalid JSON body: {e}")
+        return
+    if not isinstance(items, list):
+        yield 0, None, _error(0, "Expected a JSON array or an NDJSON body")
+        return
+    for index, item in enumerate(items):
+        yield index, item, None
+
+
+def _parse_line(index: int, line: bytes) -> Parsed:
+    try:
+        return index, json.loads(line), None
+    except ValueError as e:
+        return index, None, _error(index, f"Invalid JSON: {e}")
+
+
+class BulkIngestor:
+    """Validate and insert rows for one model, chunk by chunk."""
+
+    def __init__(
+        self,
+        db: Session,
+        model: Type[Base],
+        schema: Type[BaseModel],
+        delta: Callable[[Any], Optional[rollups.RollupDelta]],
+        chunk_size: int | None = None,
+    ) -> None:
+        self.db = db
+        self.model = model
+        self.schema = schema
+        self.delta = delta
+        self.chunk_size = chunk_size or get_settings().BULK_CHUNK_SIZE
+        self.inserted = 0
+        self.errors: List[RowError] = []
+        self._pending: List[Tuple[int, BaseModel]] = []
+        self._known_users: Dict[int, bool] = {}
+
+    async def consume(self, rows: AsyncIterator[Parsed]) -> Dict[str, Any]:
+        async for index, obj, error in rows:
+            if error is not None:
+                self.errors.append(error)
+                continue
+            try:
+                self._pending.append((index, self.schema.model_validate(obj)))
+            except ValidationError as e:
+                self.errors.append(
+                    _error(index, e.errors(include_url=False, include_context=False))
+                )
+            if len(self._pending) >= self.chunk_size:
+                await run_in_threadpool(self.flush)
+        if self._pending:
+            await run_in_threadpool(self.flush)
+        return self.result()
+
+    def flush(self) -> None:
+        chunk, self._pending = self._pending, []
+        unknown = {p.user_id for _, p in chunk} - self._known_users.keys()
+        if unknown:
+            found = set(self.db.execute(select(User.id).where(User.id.in_(unknown))).scalars())
+            self._known_users.update({uid: uid in found for uid in unknown})
+
+        valid = []
+        for index, payload in chunk:
+            if self._known_users[payload.user_id]:
+                valid.append(payload)
+            else:
+                self.errors.append(_error(index, "User not found"))
+        if not valid:
+            return
+
+        try:
+            stmt = insert(self.model.__table__)
+            for shard, part in shard_groups(self.db, valid, attrgetter("user_id")).items():
+                self.db.execute(
+                    stmt, [p.model_dump() for p in part], bind_arguments={"shard_id": shard}
+                )
+            rollups.record(self.db, *(self.delta(p) for p in valid))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            self.errors.extend(
+                _error(index, f"Chunk failed: {e.__class__.__name__}")
+                for index, p in chunk
+                if self._known_users[p.user_id]
+            )
+            return
+        self.inserted += len(valid)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "errors": sorted(self.errors, key=lambda e: e["index"]),
+        }
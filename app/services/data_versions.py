@@ -0,0 +1,78 @@
+"""Per-user data versions for conditional GETs.
+
+Every commit that changes a user's data (anything passed through `rollups.record()` or
+`rollups.mark_touched()`) bumps that user's row in `user_data_versions`, plus the global
+row, in the same transaction. Read endpoints turn the versions into ETags, so a client
+polling unchanged data costs one primary-key lookup and an empty 304.
+"""
+
+from __future__ import annotations
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, Iterable
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.db.session import scatter, shard_groups
+from app.db.upsert import upsert_insert
+from app.models.data_version import GLOBAL_VERSION_ID, UserDataVersion
+from app.services import rollups
+
+
+def bump(db: Session, user_ids: Iterable[int]) -> None:
+    """Increment the versions of `user_ids` and the global version. Caller commits."""
+    ids = sorted(set(user_ids) | {GLOBAL_VERSION_ID})
+    now = datetime.utcnow()
+    insert_fn = upsert_insert(db.get_bind().dialect.name)
+    if insert_fn is None:
+        for user_id in ids:
+            row = db.get(UserDataVersion, user_id)
+            if row is None:
+                db.add(UserDataVersion(user_id=user_id, version=1, updated_at=now))
+            else:
+                row.version += 1
+                row.updated_at = now
+        return
+    stmt = insert_fn(UserDataVersion.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={
+            "version": UserDataVersion.__table__.c.version + 1,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    rows = [{"user_id": i, "version": 1, "updated_at": now} for i in ids[1:]]
+    for shard, part in shard_groups(db, rows, itemgetter("user_id")).items():
+        # Sharded, every shard written to keeps its own global row
+        part.insert(0, {"user_id": GLOBAL_VERSION_ID, "version": 1, "updated_at": now})
+        db.execute(stmt, part, bind_arguments={"shard_id": shard})
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_touched(session: Session) -> None:
+    user_ids = rollups.touched_users(session)
+    if user_ids:
+        bump(session, user_ids)
+
+
+def get_versions(db: Session, *user_ids: int) -> Dict[int, int]:
+    """Current versions of `user_ids` (0 for users never changed)."""
+    found = dict(
+        db.execute(
+            select(UserDataVersion.user_id, UserDataVersion.version).where(
+                UserDataVersion.user_id.in_(user_ids)
+            )
+        ).all()
+    )
+    return {user_id: found.get(user_id, 0) for user_id in user_ids}
+
+
+def version_of(db: Session, user_id: int | None = None) -> int:
+    """Version of one user's data, or of everyone's when `user_id` is None.
+
+    Sharded, the global version is the sum of the shards' global rows: each only grows,
+    so the sum moves on any write anywhere.
+    """
+    if user_id is not None:
+        return get_versions(db, user_id)[user_id]
+    return sum(scatter(db, lambda s: get_versions(s, GLOBAL_VERSION_ID)[GLOBAL_VERSION_ID]))
@@ -1,70 +1,118 @@
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 # Minimal FHIR Observation constructor for our health score
 # NOTE: This is a pragmatic subset for the assignment, not a full FHIR model.
 
+_UCUM = "http://unitsofmeasure.org"
+_METRICS_SYSTEM = "http://example.org/fhir/CodeSystem/health-metrics"
 
-def build_health_observation(user_id: int, score_payload: Dict[str, Any]) -> Dict[str, Any]:
-    now = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
-    components = []
-
-    def comp(code: str, display: str, value: float, unit: str = "points"):
-        return {
-            "code": {
-                "coding": [
-                    {
-                        "system": "http://example.org/fhir/CodeSystem/health-metrics",
-                        "code": code,
-                        "display": display,
-                    }
-                ],
-                "text": display,
-            },
-            "valueQuantity": {
-                "value": round(float(value), 2),
-                "unit": unit,
-                "system": "http://unitsofmeasure.org",
-            },
+# Static parts of the Observation, built once and shared by every resource we emit.
+# Treat them as read-only: callers serialize Observations, they don't edit them in place.
+_CATEGORY = [
+    {
+        "coding": [
+            {
+                "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                "code": "activity",
+                "display": "Activity",
+            }
+        ]
+    }
+]
+_CODE = {
+    "coding": [
+        {
+            "system": "http://loinc.org",
+            "code": "76484-0",
+            "display": "Composite health score",
         }
+    ],
+    "text": "Composite health score",
+}
+
+
+def _component_code(code: str, display: str) -> Dict[str, Any]:
+    return {
+        "coding": [{"system": _METRICS_SYSTEM, "code": code, "display": display}],
+        "text": display,
+    }
 
-    c = score_payload.get("components", {})
-    components.append(comp("steps-score", "Steps sub-score", c.get("steps_score", 0)))
-    components.append(comp("sleep-score", "Sleep sub-score", c.get("sleep_score", 0)))
-    components.append(comp("glucose-score", "Glucose sub-score", c.get("glucose_score", 0)))
 
+# (payload key, component CodeableConcept)
+_COMPONENTS = (
+    ("steps_score", _component_code("steps-score", "Steps sub-score")),
+    ("sleep_score", _component_code("sleep-score", "Sleep sub-score")),
+    ("glucose_score", _component_code("glucose-score", "Glucose sub-score")),
+)
+
+
+def _points(value: float) -> Dict[str, Any]:
+    return {"value": value, "unit": "points", "system": _UCUM}
+
+
+def build_health_observation(
+    user_id: int, score_payload: Dict[str, Any], effective: str | None = None
+) -> Dict[str, Any]:
+    """Observation for one score payload; `effective` overrides the (default: now) time."""
+    effective = effective or datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    c = score_payload.get("components", {})
     observation = {
         "resourceType": "Observation",
         "status": "final",
-        "category": [
-            {
-                "coding": [
-                    {
-                        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                        "code": "activity",
-                        "display": "Activity",
-                    }
-                ]
-            }
-        ],
-        "code": {
-            "coding": [
-                {
-                    "system": "http://loinc.org",
-                    "code": "76484-0",
-                    "display": "Composite health score",
-                }
-            ],
-            "text": "Composite health score",
-        },
+        "category": _CATEGORY,
+        "code": _CODE,
         "subject": {"reference": f"Patient/{user_id}"},
-        "effectiveDateTime": now,
-        "valueQuantity": {
-            "value": score_payload.get("score", 0.0),
-            "unit": "points",
-            "system": "http://unitsofmeasure.org",
-        },
-        "component": components,
+        "effectiveDateTime": effective,
+        "valueQuantity": _points(score_payload.get("score", 0.0)),
+        "component": [
+            {"code": code, "valueQuantity": _points(round(float(c.get(key, 0)), 2))}
+            for key, code in _COMPONENTS
+        ],
         "note": [{"text": f"Window since {score_payload.get('since')}"}],
     }
+    if score_payload.get("computed_at"):
+        # Precomputed scores: when the value was actually derived
+        observation["issued"] = score_payload["computed_at"] + "Z"
     return observation
+
+
+def build_patient(user: Any) -> Dict[str, Any]:
+    """Minimal FHIR Patient for one of our users (id, name, email, gender, birth date)."""
+    patient: Dict[str, Any] = {
+        "resourceType": "Patient",
+        "id": str(user.id),
+        "telecom": [{"system": "email", "value": user.email}],
+    }
+    if user.full_name:
+        patient["name"] = [{"text": user.full_name}]
+    if user.gender:
+        patient["gender"] = user.gender
+    if user.date_of_birth:
+        patient["birthDate"] = user.date_of_birth.isoformat()
+    return patient
+
+
+def build_not_found_outcome(user_ids: List[int]) -> Dict[str, Any]:
+    """OperationOutcome with one `not-found` issue per requested user that doesn't exist."""
+    return {
+        "resourceType": "OperationOutcome",
+        "issue": [
+            {
+                "severity": "error",
+                "code": "not-found",
+                "diagnostics": f"Patient/{user_id} not found",
+            }
+            for user_id in user_ids
+        ],
+    }
+
+
+def build_bundle(resources: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Wrap resources in a FHIR `collection` Bundle."""
+    return {
+        "resourceType": "Bundle",
+        "type": "collection",
+        "total": len(resources),
+        "entry": [{"resource": r} for r in resources],
+    }
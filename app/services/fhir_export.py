@@ -0,0 +1,68 @@
+"""FHIR Bulk Data style `$export`: the whole population as streamed NDJSON.
+
+One resource per line, produced chunk by chunk (users walked by id), so memory stays flat
+however many users are exported. The read transaction is ended between chunks so a long
+export doesn't pin a snapshot (and, on SQLite/WAL, doesn't block checkpoints).
+"""
+
+from __future__ import annotations
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator, List
+import orjson
+from sqlalchemy import select
+
+from app.db.session import ReadSessionLocal, session_context
+from app.models.user import User
+from app.services.fhir import build_health_observation, build_patient
+from app.services.health_score import iter_health_score_chunks
+
+EXPORT_TYPES = ("Patient", "Observation")
+NDJSON_MEDIA_TYPE = "application/fhir+ndjson"
+
+
+def _lines(resources: Iterable[dict]) -> bytes:
+    return b"".join(orjson.dumps(r, option=orjson.OPT_APPEND_NEWLINE) for r in resources)
+
+
+def _patient_chunks(db, since: datetime | None, chunk_size: int) -> Iterator[bytes]:
+    stmt = select(User).order_by(User.id).limit(chunk_size)
+    if since is not None:
+        stmt = stmt.where(User.created_at >= since)
+    last_id = 0
+    while True:
+        # Sharded, each shard returns its own next chunk: keep the lowest ids overall
+        users = sorted(db.execute(stmt.where(User.id > last_id)).scalars(), key=lambda u: u.id)
+        users = users[:chunk_size]
+        if not users:
+            return
+        last_id = users[-1].id
+        yield _lines(build_patient(u) for u in users)
+        db.rollback()
+
+
+def _observation_chunks(db, days: int, since: datetime | None, chunk_size: int) -> Iterator[bytes]:
+    for scores in iter_health_score_chunks(db, days, updated_since=since, chunk_size=chunk_size):
+        yield _lines(build_health_observation(s["user_id"], s) for s in scores)
+        db.rollback()
+
+
+def export_ndjson(
+    types: List[str], days: int, since: datetime | None, chunk_size: int
+) -> Iterator[bytes]:
+    """NDJSON chunks for the requested resource types, in `EXPORT_TYPES` order."""
+    with session_context(ReadSessionLocal) as db:
+        if "Patient" in types:
+            yield from _patient_chunks(db, since, chunk_size)
+        if "Observation" in types:
+            yield from _observation_chunks(db, days, since, chunk_size)
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally (one gzip member)."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
@@ -6,17 +6,45 @@ Formula (composite, 0..100):
 - Glucose (20%): average glucose; lower is better; reversed min-max across users
 
 Returned components are also 0..100.
+
+Aggregates are read from the per-user daily rollups (see `app.services.rollups`), so the
+window starts at midnight of its first day and a request costs O(days in window).
+
+`HEALTH_SCORE_NORMALIZATION` swaps the min-max step: "percentile" scores a component by
+its rank in the population, "clipped" runs min-max between two population quantiles so a
+single outlier can't squash everyone else. Both read per-component KLL sketches.
 """
 
 from __future__ import annotations
-from datetime import datetime, timedelta
-from typing import Any, Dict
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, TypeVar
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import func, select
+from sqlalchemy import case, func, or_, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.db.session import ReadSessionLocal, scatter, session_context
+from app.models.daily_rollup import UserDailyRollup
+from app.models.user import User
+from app.services.data_versions import version_of
+from app.services.population_stats import (
+    PopulationSketches,
+    PopulationStats,
+    population_sketches,
+    population_stats,
+    read_sketches,
+    write_sketches,
+)
+from app.services.quantile_sketch import KLLSketch
 
-from app.models.activity import PhysicalActivity
-from app.models.sleep import SleepActivity
-from app.models.blood_test import BloodTest, BloodTestType
+# Rows fetched per round trip when streaming the population into sketches
+_SKETCH_BATCH = 1000
+
+T = TypeVar("T")
 
 
 def _normalize_minmax(value: float, vmin: float, vmax: float, reverse: bool = False) -> float:
@@ -41,101 +69,311 @@ def _target_duration_score(minutes: float, target_min: float = 450.0) -> float:
     return base * 100.0
 
 
-def compute_health_score(db: Session, user_id: int, days: int = 30) -> Dict[str, Any]:
-    now = datetime.utcnow()
-    since = now - timedelta(days=days)
-
-    # --- User aggregates ---
-    # Activity: average steps per day (sum steps / distinct days)
-    user_steps_sum, user_days = db.execute(
-        select(
-            func.coalesce(func.sum(PhysicalActivity.steps), 0),
-            func.count(func.distinct(func.date(PhysicalActivity.start_time))),
-        ).where(PhysicalActivity.user_id == user_id, PhysicalActivity.start_time >= since)
-    ).one()
-    user_steps_avg = (user_steps_sum / max(user_days, 1)) if user_steps_sum is not None else 0.0
-
-    # Sleep: average duration and quality
-    sleep_rows = db.execute(
-        select(
-            func.coalesce(func.avg(SleepActivity.duration_minutes), 0),
-            func.coalesce(func.avg(SleepActivity.sleep_quality), 0),
-        ).where(SleepActivity.user_id == user_id, SleepActivity.start_time >= since)
-    ).one()
-    user_sleep_avg_minutes = float(sleep_rows[0] or 0)
-    user_sleep_avg_quality = float(sleep_rows[1] or 0)
-    user_sleep_duration_score = _target_duration_score(user_sleep_avg_minutes)
-    user_sleep_mix = 0.7 * user_sleep_duration_score + 0.3 * (user_sleep_avg_quality)
-
-    # Glucose: average value for glucose tests
-    glucose_row = db.execute(
-        select(func.coalesce(func.avg(BloodTest.value), 0)).where(
-            BloodTest.user_id == user_id,
-            BloodTest.measured_at >= since,
-            BloodTest.test_type == BloodTestType.glucose,
-        )
-    ).one()
-    user_glucose_avg = float(glucose_row[0] or 0)
-
-    # --- Population aggregates per user ---
-    # Steps per-user averages
-    steps_per_user = db.execute(
-        select(
-            PhysicalActivity.user_id,
-            func.coalesce(func.sum(PhysicalActivity.steps), 0).label("sum_steps"),
-            func.count(func.distinct(func.date(PhysicalActivity.start_time))).label("days"),
+def _normalize_minmax_array(
+    values: np.ndarray, vmin: float | None, vmax: float | None, reverse: bool = False
+) -> np.ndarray:
+    """Vectorized `_normalize_minmax` (same bounds handling, same clamp)."""
+    if vmin is None or vmax is None or vmax <= vmin:
+        return np.full(values.shape, 50.0)
+    norm = (values - vmin) / (vmax - vmin)
+    if reverse:
+        norm = 1.0 - norm
+    return np.clip(norm, 0.0, 1.0) * 100.0
+
+
+def _target_duration_score_array(minutes: np.ndarray, target_min: float = 450.0) -> np.ndarray:
+    """Vectorized `_target_duration_score`."""
+    deviation = np.abs(minutes - target_min)
+    base = np.where(deviation <= 30, 1.0, np.maximum(0.0, 1.0 - (deviation - 30) / 360))
+    return np.where(minutes <= 0, 0.0, base * 100.0)
+
+
+def _normalize_sketch_array(
+    values: np.ndarray, sketch: KLLSketch, mode: str, reverse: bool = False
+) -> np.ndarray:
+    """Normalize against a population sketch: percentile rank, or min-max between quantiles."""
+    if mode == "percentile":
+        norm = sketch.rank(values)
+        if reverse:
+            norm = 1.0 - norm
+        return norm * 100.0
+    settings = get_settings()
+    return _normalize_minmax_array(
+        values,
+        sketch.quantile(settings.NORMALIZATION_CLIP_LOW),
+        sketch.quantile(settings.NORMALIZATION_CLIP_HIGH),
+        reverse=reverse,
+    )
+
+
+_SUM_COLUMNS = (
+    "steps_sum",
+    "days",
+    "sleep_count",
+    "sleep_minutes",
+    "sleep_quality",
+    "sleep_quality_count",
+    "glucose_count",
+    "glucose_sum",
+)
+
+
+def _rollup_sums(since_day: date | None = None, suffix: str = ""):
+    """Window aggregates over `user_daily_rollups` shared by the user and population queries.
+
+    With `since_day`, each sum only counts days from then on (conditional aggregation), so
+    several windows can be read in one scan; their labels then carry `suffix`.
+    """
+    R = UserDailyRollup
+
+    def total(expr):
+        if since_day is not None:
+            expr = case((R.day >= since_day, expr), else_=0)
+        return func.coalesce(func.sum(expr), 0)
+
+    return (
+        total(R.steps_sum).label("steps_sum" + suffix),
+        total(case((R.activity_count > 0, 1), else_=0)).label("days" + suffix),
+        total(R.sleep_count).label("sleep_count" + suffix),
+        total(R.sleep_minutes_sum).label("sleep_minutes" + suffix),
+        total(R.sleep_quality_sum).label("sleep_quality" + suffix),
+        total(R.sleep_quality_count).label("sleep_quality_count" + suffix),
+        total(R.glucose_count).label("glucose_count" + suffix),
+        total(R.glucose_sum).label("glucose_sum" + suffix),
+    )
+
+
+def _window_sums(since_days: Dict[int, date]) -> list:
+    """`_rollup_sums()` for several windows at once, labels suffixed with `_<days>`."""
+    return [c for days, since in since_days.items() for c in _rollup_sums(since, f"_{days}")]
+
+
+def _window_row(row, days: int) -> SimpleNamespace:
+    """One window's sums out of a `_window_sums()` row, under the plain `_rollup_sums()` names."""
+    return SimpleNamespace(**{col: getattr(row, f"{col}_{days}") for col in _SUM_COLUMNS})
+
+
+def _since_days(windows: Iterable[int], now: datetime | None = None) -> Dict[int, date]:
+    now = now or datetime.utcnow()
+    return {days: (now - timedelta(days=days)).date() for days in dict.fromkeys(windows)}
+
+
+def _sleep_mix(avg_minutes: float, avg_quality: float) -> float:
+    return 0.7 * _target_duration_score(avg_minutes) + 0.3 * avg_quality
+
+
+def _metrics(row) -> Dict[str, float]:
+    """Per-user averages from a `_rollup_sums()` row (same semantics as the raw-row AVGs)."""
+    sleep_minutes = row.sleep_minutes / row.sleep_count if row.sleep_count else 0.0
+    sleep_quality = row.sleep_quality / row.sleep_quality_count if row.sleep_quality_count else 0.0
+    return {
+        "steps_avg": (row.steps_sum / max(row.days, 1)) if row.steps_sum is not None else 0.0,
+        "sleep_avg_minutes": float(sleep_minutes),
+        "sleep_avg_quality": float(sleep_quality),
+        "sleep_mix": _sleep_mix(float(sleep_minutes), float(sleep_quality)),
+        "glucose_avg": float(row.glucose_sum / row.glucose_count) if row.glucose_count else 0.0,
+    }
+
+
+def _component_values(row) -> Iterator[tuple[str, float]]:
+    """(component, value) pairs a user contributes to the population for one window."""
+    m = _metrics(row)
+    if row.days:
+        yield "steps", m["steps_avg"]
+    if row.sleep_count:
+        yield "sleep", m["sleep_mix"]
+    if row.glucose_count:
+        yield "glucose", m["glucose_avg"]
+
+
+def _on_read_session(fn: Callable[..., T], *args: Any) -> T:
+    # The `*_async` wrappers run whole computations here, in the threadpool: scoring is
+    # NumPy/sketch work, and `AsyncSession.run_sync` would keep it on the event loop
+    with session_context(ReadSessionLocal) as db:
+        return fn(db, *args)
+
+
+async def compute_health_score_async(
+    user_id: int, days: int = 30, now: datetime | None = None
+) -> Dict[str, Any]:
+    """`compute_health_score` in the threadpool, on a read-pool session."""
+    return await run_in_threadpool(_on_read_session, compute_health_score, user_id, days, now)
+
+
+async def compute_health_score_windows_async(
+    user_id: int, windows: Sequence[int], now: datetime | None = None
+) -> Dict[int, Dict[str, Any]]:
+    """`compute_health_score_windows` in the threadpool, on a read-pool session."""
+    return await run_in_threadpool(
+        _on_read_session, compute_health_score_windows, user_id, windows, now
+    )
+
+
+async def compute_health_score_trend_async(
+    user_id: int, days: int = 30, points: int = 30, end: date | None = None
+) -> Dict[str, Any]:
+    """`compute_health_score_trend` in the threadpool, on a read-pool session."""
+    return await run_in_threadpool(
+        _on_read_session, compute_health_score_trend, user_id, days, points, end
+    )
+
+
+def _iter_population(
+    db: Session, since_days: Dict[int, date], until_day: date | None = None
+) -> Iterator[tuple[int, Dict[int, SimpleNamespace]]]:
+    """Stream one grouped rollup pass covering every window: (user_id, {days: sums})."""
+    R = UserDailyRollup
+    stmt = (
+        select(R.user_id, *_window_sums(since_days))
+        .where(R.day >= min(since_days.values()))
+        .group_by(R.user_id)
+        .execution_options(yield_per=_SKETCH_BATCH)
+    )
+    if until_day is not None:
+        stmt = stmt.where(R.day <= until_day)
+    for row in db.execute(stmt):
+        yield row.user_id, {days: _window_row(row, days) for days in since_days}
+
+
+def _population_values(
+    db: Session, since_days: Dict[int, date], until_day: date | None = None
+) -> Dict[int, Dict[str, Dict[int, float]]]:
+    """{days: {component: {user_id: value}}} for the users in `db` (one shard)."""
+    values = {days: {"steps": {}, "sleep": {}, "glucose": {}} for days in since_days}
+    for user_id, windows in _iter_population(db, since_days, until_day):
+        for days, row in windows.items():
+            for component, value in _component_values(row):
+                values[days][component][user_id] = value
+    return values
+
+
+def _load_populations(
+    db: Session, since_days: Dict[int, date], until_day: date | None = None
+) -> Dict[int, PopulationStats]:
+    """Per-user component values across all users for each window, from one pass."""
+    # Sharded, each shard is read in parallel; a user's rows never span shards
+    stats, *rest = scatter(db, lambda s: _population_values(s, since_days, until_day))
+    for part in rest:
+        for days, components in part.items():
+            for component, values in components.items():
+                stats[days][component].update(values)
+    return {
+        days: PopulationStats(since_day=since_days[days], **values)
+        for days, values in stats.items()
+    }
+
+
+def _shard_sketches(
+    db: Session, since_days: Dict[int, date], until_day: date | None = None
+) -> Dict[int, Dict[str, KLLSketch]]:
+    """Stream one grouped rollup pass (one shard) into sketches."""
+    k = get_settings().SKETCH_K
+    sketches = {
+        days: {c: KLLSketch(k) for c in ("steps", "sleep", "glucose")} for days in since_days
+    }
+    for _, windows in _iter_population(db, since_days, until_day):
+        for days, row in windows.items():
+            for component, value in _component_values(row):
+                sketches[days][component].update(value)
+    return sketches
+
+
+def _build_sketches(
+    db: Session, since_days: Dict[int, date], until_day: date | None = None
+) -> Dict[int, PopulationSketches]:
+    """Population sketches per window (memory independent of user count).
+
+    Sharded, every shard builds its own sketches in parallel and they are merged.
+    """
+    sketches, *rest = scatter(db, lambda s: _shard_sketches(s, since_days, until_day))
+    for part in rest:
+        for days, components in part.items():
+            for component, sketch in components.items():
+                sketches[days][component].merge(sketch)
+    return {
+        days: PopulationSketches(since_day=since_days[days], **values)
+        for days, values in sketches.items()
+    }
+
+
+def _load_sketches(db: Session, since_days: Dict[int, date]) -> Dict[int, PopulationSketches]:
+    """Persisted sketches where fresh ones exist; the rest are built in one pass."""
+    ttl = get_settings().POPULATION_STATS_TTL_SECONDS
+    found = {days: read_sketches(db, days, since, ttl) for days, since in since_days.items()}
+    stale = {days: since_days[days] for days, sketches in found.items() if sketches is None}
+    if stale:
+        found.update(_build_sketches(db, stale))
+    return found
+
+
+def _populations(db: Session, since_days: Dict[int, date], mode: str) -> Dict[int, Any]:
+    """Population stats (minmax) or sketches per window, loading cache misses together."""
+    cache = population_stats if mode == "minmax" else population_sketches
+    found = {days: cache.peek(days, since) for days, since in since_days.items()}
+    missing = {days: since_days[days] for days, entry in found.items() if entry is None}
+    if missing:
+        loader = _load_populations if mode == "minmax" else _load_sketches
+        for days, entry in loader(db, missing).items():
+            found[days] = cache.get(days, missing[days], lambda entry=entry: entry)
+    return found
+
+
+def refresh_sketches(db: Session, days: int, force: bool = False) -> PopulationSketches:
+    """Rebuild and persist the sketches for a window unless fresh ones exist. Caller commits."""
+    since_day = _since_days([days])[days]
+    sketches = None
+    if not force:
+        ttl = get_settings().POPULATION_STATS_TTL_SECONDS
+        sketches = read_sketches(db, days, since_day, ttl)
+    if sketches is None:
+        sketches = _build_sketches(db, {days: since_day})[days]
+        write_sketches(db, days, sketches)
+        population_sketches.invalidate(days)
+    return sketches
+
+
+def _score(user: Dict[str, float], pop: Any, mode: str, since_day: date) -> Dict[str, Any]:
+    """Score one user's window metrics against the window's population stats/sketches."""
+    user_steps_avg = user["steps_avg"]
+    user_sleep_avg_minutes = user["sleep_avg_minutes"]
+    user_sleep_avg_quality = user["sleep_avg_quality"]
+    user_sleep_mix = user["sleep_mix"]
+    user_glucose_avg = user["glucose_avg"]
+
+    if mode == "minmax":
+        # --- Population min/max ---
+        steps_min = pop.steps_min if pop.steps else 0.0
+        steps_max = pop.steps_max if pop.steps else 0.0
+        sleep_min = pop.sleep_min if pop.sleep else 0.0
+        sleep_max = pop.sleep_max if pop.sleep else 0.0
+        # Glucose: lower is better, reverse scale
+        glu_min = pop.glu_min if pop.glucose else user_glucose_avg
+        glu_max = pop.glu_max if pop.glucose else user_glucose_avg
+
+        # --- Normalize ---
+        steps_score = _normalize_minmax(user_steps_avg, steps_min, steps_max)
+        sleep_score = _normalize_minmax(user_sleep_mix, sleep_min, sleep_max)
+        glucose_score = (
+            _normalize_minmax(user_glucose_avg, glu_min, glu_max, reverse=True)
+            if user_glucose_avg > 0
+            else 50.0
         )
-        .where(PhysicalActivity.start_time >= since)
-        .group_by(PhysicalActivity.user_id)
-    ).all()
-    steps_avgs = [
-        (s.sum_steps / max(s.days, 1)) if s.sum_steps is not None else 0.0 for s in steps_per_user
-    ]
-    steps_min = min(steps_avgs) if steps_avgs else 0.0
-    steps_max = max(steps_avgs) if steps_avgs else 0.0
-
-    # Sleep mix per-user
-    sleep_avgs = []
-    sleep_rows = db.execute(
-        select(
-            SleepActivity.user_id,
-            func.coalesce(func.avg(SleepActivity.duration_minutes), 0).label("avg_minutes"),
-            func.coalesce(func.avg(SleepActivity.sleep_quality), 0).label("avg_quality"),
+    else:
+        # --- Population sketches ---
+        def norm(value: float, sketch: KLLSketch, reverse: bool = False) -> float:
+            return float(_normalize_sketch_array(np.array([value]), sketch, mode, reverse)[0])
+
+        steps_score = norm(user_steps_avg, pop.steps)
+        sleep_score = norm(user_sleep_mix, pop.sleep)
+        glucose_score = (
+            norm(user_glucose_avg, pop.glucose, reverse=True) if user_glucose_avg > 0 else 50.0
         )
-        .where(SleepActivity.start_time >= since)
-        .group_by(SleepActivity.user_id)
-    ).all()
-    for r in sleep_rows:
-        d_score = _target_duration_score(float(r.avg_minutes or 0))
-        mix = 0.7 * d_score + 0.3 * float(r.avg_quality or 0)
-        sleep_avgs.append(mix)
-    sleep_min = min(sleep_avgs) if sleep_avgs else 0.0
-    sleep_max = max(sleep_avgs) if sleep_avgs else 0.0
-
-    # Glucose per-user averages (lower is better, reverse scale)
-    glu_rows = db.execute(
-        select(BloodTest.user_id, func.coalesce(func.avg(BloodTest.value), 0).label("avg_val"))
-        .where(BloodTest.measured_at >= since, BloodTest.test_type == BloodTestType.glucose)
-        .group_by(BloodTest.user_id)
-    ).all()
-    glu_avgs = [float(r.avg_val or 0) for r in glu_rows]
-    glu_min = min(glu_avgs) if glu_avgs else user_glucose_avg
-    glu_max = max(glu_avgs) if glu_avgs else user_glucose_avg
-
-    # --- Normalize ---
-    steps_score = _normalize_minmax(user_steps_avg, steps_min, steps_max)
-    sleep_score = _normalize_minmax(user_sleep_mix, sleep_min, sleep_max)
-    glucose_score = (
-        _normalize_minmax(user_glucose_avg, glu_min, glu_max, reverse=True)
-        if user_glucose_avg > 0
-        else 50.0
-    )
 
     # Composite
     total = 0.5 * steps_score + 0.3 * sleep_score + 0.2 * glucose_score
 
     return {
-        "since": since.isoformat(),
+        "since": datetime.combine(since_day, time.min).isoformat(),
         "components": {
             "steps_avg_per_day": user_steps_avg,
             "steps_score": steps_score,
@@ -147,3 +385,436 @@ def compute_health_score(db: Session, user_id: int, days: int = 30) -> Dict[str,
         },
         "score": round(total, 2),
     }
+
+
+def compute_health_score_windows(
+    db: Session, user_id: int, windows: Sequence[int], now: datetime | None = None
+) -> Dict[int, Dict[str, Any]]:
+    """Score one user over several windows (days) at once: {days: payload}.
+
+    The user's sums for every window come from one conditional-aggregation scan of their
+    rollups; population values for uncached windows likewise share one grouped pass.
+    `now` scores as of an earlier moment (data after its day is ignored, nothing cached).
+    """
+    since_days = _since_days(windows, now)
+    until_day = now.date() if now is not None else None
+    R = UserDailyRollup
+
+    # --- User aggregates (one pass over the user's daily rollups, all windows) ---
+    stmt = select(*_window_sums(since_days)).where(
+        R.user_id == user_id, R.day >= min(since_days.values())
+    )
+    if until_day is not None:
+        stmt = stmt.where(R.day <= until_day)
+    user_row = db.execute(stmt).one()
+
+    # --- Population stats/sketches (cached per window length) ---
+    mode = get_settings().HEALTH_SCORE_NORMALIZATION
+    if until_day is None:
+        pops = _populations(db, since_days, mode)
+    elif mode == "minmax":
+        pops = _load_populations(db, since_days, until_day)
+    else:
+        pops = _build_sketches(db, since_days, until_day)
+    return {
+        days: _score(_metrics(_window_row(user_row, days)), pops[days], mode, since)
+        for days, since in since_days.items()
+    }
+
+
+def compute_health_score(
+    db: Session, user_id: int, days: int = 30, now: datetime | None = None
+) -> Dict[str, Any]:
+    return compute_health_score_windows(db, user_id, [days], now)[days]
+
+
+def _safe_div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+
+def _metric_arrays(rows) -> Dict[str, np.ndarray]:
+    """Vectorized `_metrics` over `_rollup_sums()` rows that also carry `user_id`."""
+    sums = {
+        col: np.array([getattr(r, col) for r in rows], dtype=np.float64) for col in _SUM_COLUMNS
+    }
+    return {
+        "user_id": np.array([r.user_id for r in rows], dtype=np.int64),
+        **_metrics_from_sums(sums),
+    }
+
+
+def _metrics_from_sums(sums: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Vectorized `_metrics` over arrays of `_SUM_COLUMNS` sums (any shape)."""
+    sleep_minutes = _safe_div(sums["sleep_minutes"], sums["sleep_count"])
+    sleep_quality = _safe_div(sums["sleep_quality"], sums["sleep_quality_count"])
+    return {
+        "steps_avg": sums["steps_sum"] / np.maximum(sums["days"], 1),
+        "sleep_avg_minutes": sleep_minutes,
+        "sleep_avg_quality": sleep_quality,
+        "sleep_mix": 0.7 * _target_duration_score_array(sleep_minutes) + 0.3 * sleep_quality,
+        "glucose_avg": _safe_div(sums["glucose_sum"], sums["glucose_count"]),
+        "has_steps": sums["days"] > 0,
+        "has_sleep": sums["sleep_count"] > 0,
+        "has_glucose": sums["glucose_count"] > 0,
+    }
+
+
+def _pick(metrics: Dict[str, np.ndarray], ids: List[int]) -> Dict[str, np.ndarray]:
+    """Metric values for `ids` (sorted); users without rollups in the window get zeros."""
+    pop_ids = metrics["user_id"]
+    target = np.array(ids, dtype=np.int64)
+    if not len(pop_ids):
+        return {k: np.zeros(len(target)) for k in metrics if not k.startswith("has_")}
+    pos = np.minimum(np.searchsorted(pop_ids, target), len(pop_ids) - 1)
+    found = pop_ids[pos] == target
+    return {k: np.where(found, v[pos], 0.0) for k, v in metrics.items() if not k.startswith("has_")}
+
+
+def _payloads(
+    ids: List[int], since: str, u: Dict[str, np.ndarray], scores: tuple
+) -> List[Dict[str, Any]]:
+    steps_score, sleep_score, glucose_score = scores
+    total = np.round(0.5 * steps_score + 0.3 * sleep_score + 0.2 * glucose_score, 2)
+    return [
+        {
+            "user_id": int(uid),
+            "since": since,
+            "components": {
+                "steps_avg_per_day": float(u["steps_avg"][i]),
+                "steps_score": float(steps_score[i]),
+                "sleep_avg_minutes": float(u["sleep_avg_minutes"][i]),
+                "sleep_avg_quality": float(u["sleep_avg_quality"][i]),
+                "sleep_score": float(sleep_score[i]),
+                "glucose_avg": float(u["glucose_avg"][i]),
+                "glucose_score": float(glucose_score[i]),
+            },
+            "score": float(total[i]),
+        }
+        for i, uid in enumerate(ids)
+    ]
+
+
+def _sketch_scores(
+    db: Session, days: int, since_day: date, u: Dict[str, np.ndarray], mode: str
+) -> tuple:
+    sk = _populations(db, {days: since_day}, mode)[days]
+    glu_score = _normalize_sketch_array(u["glucose_avg"], sk.glucose, mode, reverse=True)
+    return (
+        _normalize_sketch_array(u["steps_avg"], sk.steps, mode),
+        _normalize_sketch_array(u["sleep_mix"], sk.sleep, mode),
+        np.where(u["glucose_avg"] > 0, glu_score, 50.0),
+    )
+
+
+def _minmax_scores(u: Dict[str, np.ndarray], bounds: Dict[str, tuple]) -> tuple:
+    glu_score = _normalize_minmax_array(u["glucose_avg"], *bounds["glucose"], reverse=True)
+    return (
+        _normalize_minmax_array(u["steps_avg"], *bounds["steps"]),
+        _normalize_minmax_array(u["sleep_mix"], *bounds["sleep"]),
+        np.where(u["glucose_avg"] > 0, glu_score, 50.0),
+    )
+
+
+def compute_health_scores(
+    db: Session, user_ids: Iterable[int] | None = None, days: int = 30
+) -> Dict[str, Any]:
+    """Score many users at once with a constant number of queries.
+
+    `user_ids=None` scores every user. Runs one grouped rollup pass for the whole
+    population and does the per-user math over NumPy arrays; unknown ids are reported
+    under "missing". Scores match `compute_health_score` for the same data.
+    """
+    now = datetime.utcnow()
+    since_day = (now - timedelta(days=days)).date()
+    R = UserDailyRollup
+
+    stmt = select(User.id).order_by(User.id)
+    if user_ids is not None:
+        requested = list(dict.fromkeys(user_ids))
+        stmt = stmt.where(User.id.in_(requested))
+    ids = sorted(db.execute(stmt).scalars())
+    missing = sorted(set(requested) - set(ids)) if user_ids is not None else []
+
+    population = (
+        select(R.user_id, *_rollup_sums())
+        .where(R.day >= since_day)
+        .group_by(R.user_id)
+        .order_by(R.user_id)
+    )
+    # Shards are read in parallel; each part is in user order, so a sort merges them
+    parts = scatter(db, lambda s: s.execute(population).all())
+    rows = sorted((row for part in parts for row in part), key=lambda r: r.user_id)
+
+    # Population arrays: one entry per user with rollups in the window
+    pop = _metric_arrays(rows)
+    u = _pick(pop, ids)
+
+    mode = get_settings().HEALTH_SCORE_NORMALIZATION
+    if mode == "minmax":
+
+        def bounds(values: np.ndarray, mask: np.ndarray) -> tuple[float | None, float | None]:
+            if not mask.any():
+                return None, None
+            return float(values[mask].min()), float(values[mask].max())
+
+        scores = _minmax_scores(
+            u,
+            {
+                "steps": bounds(pop["steps_avg"], pop["has_steps"]),
+                "sleep": bounds(pop["sleep_mix"], pop["has_sleep"]),
+                "glucose": bounds(pop["glucose_avg"], pop["has_glucose"]),
+            },
+        )
+    else:
+        scores = _sketch_scores(db, days, since_day, u, mode)
+
+    since = datetime.combine(since_day, time.min).isoformat()
+    return {"since": since, "scores": _payloads(ids, since, u, scores), "missing": missing}
+
+
+def iter_health_score_chunks(
+    db: Session,
+    days: int = 30,
+    updated_since: datetime | None = None,
+    chunk_size: int = 1000,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield `compute_health_scores`-style payloads for every user, `chunk_size` at a time.
+
+    Users are walked by id (keyset) and each chunk reads only its own rollups; the
+    population side comes from the cached stats/sketches, so memory doesn't grow with
+    the export. `updated_since` keeps users created, or with rollups changed, since then.
+    """
+    since_day = (datetime.utcnow() - timedelta(days=days)).date()
+    since = datetime.combine(since_day, time.min).isoformat()
+    R = UserDailyRollup
+    mode = get_settings().HEALTH_SCORE_NORMALIZATION
+    if mode == "minmax":
+        pop = _populations(db, {days: since_day}, mode)[days]
+        bounds = {
+            "steps": (pop.steps_min, pop.steps_max),
+            "sleep": (pop.sleep_min, pop.sleep_max),
+            "glucose": (pop.glu_min, pop.glu_max),
+        }
+
+    stmt = select(User.id).order_by(User.id).limit(chunk_size)
+    if updated_since is not None:
+        changed = (
+            select(R.user_id).where(R.user_id == User.id, R.updated_at >= updated_since).exists()
+        )
+        stmt = stmt.where(or_(User.created_at >= updated_since, changed))
+
+    last_id = 0
+    while True:
+        # Sharded, each shard returns its own next chunk: keep the lowest ids overall
+        ids = sorted(db.execute(stmt.where(User.id > last_id)).scalars())[:chunk_size]
+        if not ids:
+            return
+        rows = sorted(
+            db.execute(
+                select(R.user_id, *_rollup_sums())
+                .where(R.user_id.in_(ids), R.day >= since_day)
+                .group_by(R.user_id)
+                .order_by(R.user_id)
+            ),
+            key=lambda r: r.user_id,
+        )
+        u = _pick(_metric_arrays(rows), ids)
+        if mode == "minmax":
+            scores = _minmax_scores(u, bounds)
+        else:
+            scores = _sketch_scores(db, days, since_day, u, mode)
+        yield _payloads(ids, since, u, scores)
+        last_id = ids[-1]
+
+
+# `_metrics()` keys, as consumed by `_score()`
+_USER_METRICS = ("steps_avg", "sleep_avg_minutes", "sleep_avg_quality", "sleep_mix", "glucose_avg")
+# Population component -> (metric, "has data" mask) in `_metrics_from_sums()` output
+_TREND_COMPONENTS = {
+    "steps": ("steps_avg", "has_steps"),
+    "sleep": ("sleep_mix", "has_sleep"),
+    "glucose": ("glucose_avg", "has_glucose"),
+}
+# Users per dense (column, user, day) block when sliding windows over the population
+_TREND_USERS_PER_BLOCK = 256
+# Recent trend populations kept, keyed by (days, points, end, mode)
+_TREND_CACHE_SIZE = 32
+
+
+def _trend_select(start: date, end: date):
+    """Daily rollup sums (`_SUM_COLUMNS` order) from `start` to `end`, with user and day."""
+    R = UserDailyRollup
+    return select(
+        R.user_id,
+        R.day,
+        R.steps_sum,
+        case((R.activity_count > 0, 1), else_=0),
+        R.sleep_count,
+        R.sleep_minutes_sum,
+        R.sleep_quality_sum,
+        R.sleep_quality_count,
+        R.glucose_count,
+        R.glucose_sum,
+    ).where(R.day >= start, R.day <= end)
+
+
+def _sliding_metrics(
+    rows: Sequence, user_ids: List[int], start: date, days: int, points: int
+) -> Dict[str, np.ndarray]:
+    """`_metrics_from_sums()` of every `days`-window ending on each of the `points` days.
+
+    Rows are `_trend_select()` rows of `user_ids`; results have shape (user, point). Point j
+    covers days j .. j + days of the span (inclusive), read off prefix sums over the days.
+    """
+    span = days + points
+    index = {uid: i for i, uid in enumerate(user_ids)}
+    daily = np.zeros((len(_SUM_COLUMNS), len(user_ids), span))
+    if rows:
+        ui = np.fromiter((index[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+        di = np.fromiter(((r[1] - start).days for r in rows), dtype=np.int64, count=len(rows))
+        daily[:, ui, di] = np.array([r[2:] for r in rows], dtype=np.float64).T
+    prefix = np.concatenate((np.zeros(daily.shape[:2] + (1,)), np.cumsum(daily, axis=2)), axis=2)
+    window = prefix[:, :, days + 1 : days + 1 + points] - prefix[:, :, :points]
+    return _metrics_from_sums(dict(zip(_SUM_COLUMNS, window)))
+
+
+class _TrendPopulation:
+    """Population side of a score series: per point, min/max (minmax) or sketches.
+
+    Filled block by block from `_sliding_metrics()` output, so memory depends on the number
+    of points, not of users; shards' partial populations merge.
+    """
+
+    def __init__(self, points: int, mode: str) -> None:
+        self.mode = mode
+        if mode == "minmax":
+            self.count = {c: np.zeros(points, dtype=np.int64) for c in _TREND_COMPONENTS}
+            self.low = {c: np.full(points, np.inf) for c in _TREND_COMPONENTS}
+            self.high = {c: np.full(points, -np.inf) for c in _TREND_COMPONENTS}
+        else:
+            k = get_settings().SKETCH_K
+            self.sketches = [{c: KLLSketch(k) for c in _TREND_COMPONENTS} for _ in range(points)]
+
+    def add(self, metrics: Dict[str, np.ndarray]) -> None:
+        for c, (name, has) in _TREND_COMPONENTS.items():
+            values, mask = metrics[name], metrics[has]
+            if self.mode == "minmax":
+                self.count[c] += mask.sum(axis=0)
+                self.low[c] = np.minimum(self.low[c], np.where(mask, values, np.inf).min(axis=0))
+                self.high[c] = np.maximum(self.high[c], np.where(mask, values, -np.inf).max(axis=0))
+            else:
+                for j, sketches in enumerate(self.sketches):
+                    sketches[c].extend(values[mask[:, j], j])
+
+    def merge(self, other: "_TrendPopulation") -> None:
+        if self.mode == "minmax":
+            for c in _TREND_COMPONENTS:
+                self.count[c] += other.count[c]
+                self.low[c] = np.minimum(self.low[c], other.low[c])
+                self.high[c] = np.maximum(self.high[c], other.high[c])
+        else:
+            for mine, theirs in zip(self.sketches, other.sketches):
+                for c, sketch in theirs.items():
+                    mine[c].merge(sketch)
+
+    def point(self, j: int) -> SimpleNamespace:
+        """Population stand-in for `_score()` at point `j`."""
+        if self.mode != "minmax":
+            return SimpleNamespace(**self.sketches[j])
+
+        def bounds(c: str) -> tuple[float | None, float | None]:
+            if not self.count[c][j]:
+                return None, None
+            return float(self.low[c][j]), float(self.high[c][j])
+
+        (steps_min, steps_max), (sleep_min, sleep_max), (glu_min, glu_max) = map(
+            bounds, _TREND_COMPONENTS
+        )
+        return SimpleNamespace(
+            **{c: int(self.count[c][j]) for c in _TREND_COMPONENTS},
+            steps_min=steps_min,
+            steps_max=steps_max,
+            sleep_min=sleep_min,
+            sleep_max=sleep_max,
+            glu_min=glu_min,
+            glu_max=glu_max,
+        )
+
+
+def _shard_trend_population(
+    db: Session, days: int, points: int, start: date, end: date, mode: str
+) -> _TrendPopulation:
+    """Stream one shard's rollups in user order into a `_TrendPopulation`."""
+    pop = _TrendPopulation(points, mode)
+    stmt = (
+        _trend_select(start, end)
+        .order_by(UserDailyRollup.user_id)
+        .execution_options(yield_per=_SKETCH_BATCH)
+    )
+    block: list = []
+    users: List[int] = []
+    for row in db.execute(stmt):
+        if not users or row[0] != users[-1]:
+            if len(users) == _TREND_USERS_PER_BLOCK:
+                pop.add(_sliding_metrics(block, users, start, days, points))
+                block, users = [], []
+            users.append(row[0])
+        block.append(row)
+    if users:
+        pop.add(_sliding_metrics(block, users, start, days, points))
+    return pop
+
+
+_trend_populations: OrderedDict[tuple, tuple[int, _TrendPopulation]] = OrderedDict()
+_trend_lock = threading.Lock()
+
+
+def _trend_population(
+    db: Session, days: int, points: int, start: date, end: date, mode: str
+) -> _TrendPopulation:
+    """Per-point population for a series, cached until the global data version moves."""
+    key = (days, points, end, mode)
+    version = version_of(db)
+    with _trend_lock:
+        cached = _trend_populations.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    # Sharded, each shard streams its own users in parallel; partial populations merge
+    pop, *rest = scatter(db, lambda s: _shard_trend_population(s, days, points, start, end, mode))
+    for part in rest:
+        pop.merge(part)
+    with _trend_lock:
+        _trend_populations[key] = (version, pop)
+        _trend_populations.move_to_end(key)
+        while len(_trend_populations) > _TREND_CACHE_SIZE:
+            _trend_populations.popitem(last=False)
+    return pop
+
+
+def compute_health_score_trend(
+    db: Session, user_id: int, days: int = 30, points: int = 30, end: date | None = None
+) -> Dict[str, Any]:
+    """Daily score series: `points` scores ending on `end` (default today), `days` window.
+
+    Point t equals `compute_health_score(days=days, now=<t, end of day>)`. The user's series
+    comes from their own rollups over the span, each point's window read off prefix sums.
+    The population side (per-point min/max, or sketches in percentile/clipped modes) is
+    streamed from everyone's rollups a block of users at a time and cached per
+    (days, points, end) until any data changes, so repeated series cost one user query.
+    """
+    end = end or datetime.utcnow().date()
+    first = end - timedelta(days=points - 1)
+    start = first - timedelta(days=days)  # earliest day in the first point's window
+    mode = get_settings().HEALTH_SCORE_NORMALIZATION
+
+    rows = db.execute(_trend_select(start, end).where(UserDailyRollup.user_id == user_id)).all()
+    me = _sliding_metrics(rows, [user_id], start, days, points)
+    pop = _trend_population(db, days, points, start, end, mode)
+
+    series = []
+    for j in range(points):
+        day = first + timedelta(days=j)
+        user = {k: float(me[k][0, j]) for k in _USER_METRICS}
+        payload = _score(user, pop.point(j), mode, day - timedelta(days=days))
+        series.append({"date": day.isoformat(), **payload})
+    return {"days": days, "end": end.isoformat(), "series": series}
@@ -0,0 +1,173 @@
+"""In-process cache of population normalization statistics.
+
+The population side of the health score (per-user component values and their min/max)
+is identical for every user scored with the same window, so it is computed once per
+window length and reused until it expires or ingestion changes the underlying data.
+
+The percentile/clipped normalization modes use `PopulationSketches` instead: one KLL
+sketch per component, persisted in `population_sketches` so workers share them and
+memory doesn't grow with the number of users. With user sharding the sketches live on
+shard 0.
+"""
+
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Generic, Optional, TypeVar
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.sharding import GLOBAL_SHARD
+from app.db.upsert import upsert_insert
+from app.models.population_sketch import PopulationSketch
+from app.services import rollups
+from app.services.quantile_sketch import KLLSketch
+
+SKETCH_COMPONENTS = ("steps", "sleep", "glucose")
+
+
+@dataclass
+class PopulationStats:
+    """Per-user component values for one window, plus their min/max."""
+
+    since_day: date
+    steps: Dict[int, float] = field(default_factory=dict)
+    sleep: Dict[int, float] = field(default_factory=dict)
+    glucose: Dict[int, float] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @staticmethod
+    def _bounds(values: Dict[int, float]) -> tuple[Optional[float], Optional[float]]:
+        if not values:
+            return None, None
+        return min(values.values()), max(values.values())
+
+    def __post_init__(self) -> None:
+        self.steps_min, self.steps_max = self._bounds(self.steps)
+        self.sleep_min, self.sleep_max = self._bounds(self.sleep)
+        self.glu_min, self.glu_max = self._bounds(self.glucose)
+
+
+@dataclass
+class PopulationSketches:
+    """Quantile sketches of the per-user component values for one window."""
+
+    since_day: date
+    steps: KLLSketch
+    sleep: KLLSketch
+    glucose: KLLSketch
+    built_at: datetime = field(default_factory=datetime.utcnow)
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+def read_sketches(
+    db: Session, days: int, since_day: date, max_age: float
+) -> Optional[PopulationSketches]:
+    """Persisted sketches for `days`, if built for `since_day` within `max_age` seconds."""
+    rows = {
+        r.component: r
+        for r in db.scalars(
+            select(PopulationSketch).where(PopulationSketch.days == days),
+            bind_arguments={"shard_id": GLOBAL_SHARD},
+        )
+    }
+    if set(rows) != set(SKETCH_COMPONENTS):
+        return None
+    built_at = min(r.built_at for r in rows.values())
+    if any(r.since_day != since_day for r in rows.values()) or (
+        datetime.utcnow() - built_at > timedelta(seconds=max_age)
+    ):
+        return None
+    sketches = {name: KLLSketch.from_dict(rows[name].sketch) for name in SKETCH_COMPONENTS}
+    return PopulationSketches(since_day=since_day, built_at=built_at, **sketches)
+
+
+def write_sketches(db: Session, days: int, sketches: PopulationSketches) -> None:
+    """Upsert the sketches for `days`. Caller commits."""
+    rows = [
+        {
+            "days": days,
+            "component": name,
+            "since_day": sketches.since_day,
+            "sketch": getattr(sketches, name).to_dict(),
+            "built_at": sketches.built_at,
+        }
+        for name in SKETCH_COMPONENTS
+    ]
+    insert_fn = upsert_insert(db.get_bind().dialect.name)
+    if insert_fn is None:
+        for row in rows:
+            db.merge(PopulationSketch(**row))
+        return
+    stmt = insert_fn(PopulationSketch.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["days", "component"],
+        set_={c: stmt.excluded[c] for c in ("since_day", "sketch", "built_at")},
+    )
+    db.execute(stmt, rows, bind_arguments={"shard_id": GLOBAL_SHARD})
+
+
+T = TypeVar("T", PopulationStats, PopulationSketches)
+
+
+class PopulationStatsCache(Generic[T]):
+    """Window-length keyed cache with a TTL and explicit invalidation."""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, T] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry: Optional[T], since_day: date) -> bool:
+        return (
+            entry is not None
+            and entry.since_day == since_day
+            and time.monotonic() - entry.loaded_at < self.ttl_seconds
+        )
+
+    def peek(self, days: int, since_day: date) -> Optional[T]:
+        """The cached entry if it is still valid, without loading."""
+        with self._lock:
+            entry = self._entries.get(days)
+        return entry if self._fresh(entry, since_day) else None
+
+    def get(self, days: int, since_day: date, loader: Callable[[], T]) -> T:
+        with self._lock:
+            entry = self._entries.get(days)
+            generation = self._generation
+        if self._fresh(entry, since_day):
+            return entry
+
+        entry = loader()
+        with self._lock:
+            # Don't store a result that an invalidation raced past while we were loading.
+            if generation == self._generation:
+                self._entries[days] = entry
+        return entry
+
+    def invalidate(self, days: int | None = None) -> None:
+        with self._lock:
+            self._generation += 1
+            if days is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(days, None)
+
+
+population_stats: PopulationStatsCache[PopulationStats] = PopulationStatsCache(
+    get_settings().POPULATION_STATS_TTL_SECONDS
+)
+population_sketches: PopulationStatsCache[PopulationSketches] = PopulationStatsCache(
+    get_settings().POPULATION_STATS_TTL_SECONDS
+)
+
+
+@rollups.on_commit
+def _invalidate_on_ingest(user_ids) -> None:
+    # Sketches aren't dropped here: a percentile barely moves per write, and they are
+    # rebuilt by the score refresher (and after the TTL) instead of on every commit.
+    population_stats.invalidate()
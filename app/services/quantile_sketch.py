@@ -0,0 +1,127 @@
+"""KLL quantile sketch (Karnin, Lang, Liberty 2016).
+
+A stack of compactors: level h holds items of weight 2**h. When the sketch is full, the
+lowest full level is sorted and every other item (random offset) is promoted one level,
+so memory stays at O(k log(n/k)) items however many values are added. Sketches built
+over disjoint inputs can be merged, and serialize to plain JSON for persistence.
+
+Rank/quantile error is roughly 1.7/k of the population size (k=200: about ±1%).
+"""
+
+from __future__ import annotations
+import math
+import random
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+
+
+class KLLSketch:
+    def __init__(self, k: int = 200, c: float = 2.0 / 3.0) -> None:
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        self._rng = random.Random()
+        self._points: Tuple[np.ndarray, np.ndarray] | None = None
+
+    # --- building ---
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * self.c**depth)) + 1
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.compactors)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def update(self, value: float) -> None:
+        self.compactors[0].append(float(value))
+        self.n += 1
+        self._points = None
+        if len(self.compactors[0]) >= self._capacity(0) and self._size() >= self._max_size():
+            self._compress()
+
+    def extend(self, values: Iterable[float]) -> None:
+        """Add many values with one round of compaction, as `merge` does for a sketch."""
+        level0 = self.compactors[0]
+        before = len(level0)
+        level0.extend(map(float, values))
+        self.n += len(level0) - before
+        self._points = None
+        while self._size() >= self._max_size():
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Fold `other` into this sketch (both keep their own error guarantees)."""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._points = None
+        while self._size() >= self._max_size():
+            self._compress()
+
+    def _compress(self) -> None:
+        for level in range(len(self.compactors)):
+            items = self.compactors[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+            items.sort()
+            keep = len(items) % 2  # an odd leftover stays at this level
+            promoted = items[keep + self._rng.randint(0, 1) :: 2]
+            del items[keep:]
+            self.compactors[level + 1].extend(promoted)
+            if self._size() < self._max_size():
+                break
+
+    # --- queries ---
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _cdf(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Retained items sorted, with their cumulative weights."""
+        if self._points is None:
+            values = np.fromiter((v for items in self.compactors for v in items), dtype=np.float64)
+            weights = np.fromiter(
+                (2**h for h, items in enumerate(self.compactors) for _ in items), dtype=np.float64
+            )
+            order = np.argsort(values, kind="stable")
+            self._points = values[order], np.cumsum(weights[order])
+        return self._points
+
+    def rank(self, values: np.ndarray) -> np.ndarray:
+        """Mid-rank in [0, 1] of each value: (weight below + half the weight equal) / total."""
+        sorted_values, cumulative = self._cdf()
+        values = np.asarray(values, dtype=np.float64)
+        if not len(sorted_values):
+            return np.full(values.shape, 0.5)
+        padded = np.concatenate(([0.0], cumulative))
+        below = padded[np.searchsorted(sorted_values, values, side="left")]
+        at_or_below = padded[np.searchsorted(sorted_values, values, side="right")]
+        return (below + at_or_below) / (2.0 * cumulative[-1])
+
+    def quantile(self, q: float) -> float | None:
+        """Smallest retained value whose rank reaches `q` (None when empty)."""
+        sorted_values, cumulative = self._cdf()
+        if not len(sorted_values):
+            return None
+        idx = int(np.searchsorted(cumulative, q * cumulative[-1], side="left"))
+        return float(sorted_values[min(idx, len(sorted_values) - 1)])
+
+    # --- persistence ---
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "c": self.c, "n": self.n, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        sketch = cls(k=data["k"], c=data["c"])
+        sketch.n = data["n"]
+        sketch.compactors = [list(map(float, items)) for items in data["compactors"]] or [[]]
+        return sketch
@@ -0,0 +1,263 @@
+"""Incrementally maintained per-user daily rollups.
+
+Handlers describe each raw-row change as a delta keyed by (user_id, day) and pass it to
+`record()` before committing, so rollups commit or roll back together with the raw row.
+
+Sessions remember which users they touched; once the transaction commits, callbacks
+registered with `on_commit()` are told about them (e.g. to invalidate caches).
+"""
+
+from __future__ import annotations
+from collections import defaultdict
+from datetime import date, datetime
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import delete, event, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.db.session import shard_groups
+from app.db.upsert import upsert_insert
+from app.models.activity import PhysicalActivity
+from app.models.sleep import SleepActivity
+from app.models.blood_test import BloodTest, BloodTestType
+from app.models.daily_rollup import UserDailyRollup
+
+RollupKey = Tuple[int, date]
+RollupDelta = Tuple[RollupKey, Dict[str, float]]
+
+COUNTER_FIELDS = (
+    "activity_count",
+    "steps_sum",
+    "sleep_count",
+    "sleep_minutes_sum",
+    "sleep_quality_sum",
+    "sleep_quality_count",
+    "glucose_count",
+    "glucose_sum",
+)
+_COUNT_FIELDS = ("activity_count", "sleep_count", "glucose_count")
+_TOUCHED_KEY = "rollups_touched_users"
+_commit_hooks: List[Callable[[Set[int]], None]] = []
+
+
+def on_commit(hook: Callable[[Set[int]], None]) -> Callable[[Set[int]], None]:
+    """Register `hook(user_ids)` to run after a commit that changed those users' data."""
+    _commit_hooks.append(hook)
+    return hook
+
+
+def mark_touched(db: Session, *user_ids: int) -> None:
+    db.info.setdefault(_TOUCHED_KEY, set()).update(user_ids)
+
+
+def touched_users(db: Session) -> Set[int]:
+    """Users whose data the session's current transaction has changed so far."""
+    return db.info.get(_TOUCHED_KEY, set())
+
+
+@event.listens_for(Session, "after_commit")
+def _run_commit_hooks(session: Session) -> None:
+    user_ids = session.info.pop(_TOUCHED_KEY, None)
+    if user_ids:
+        for hook in _commit_hooks:
+            hook(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched(session: Session) -> None:
+    session.info.pop(_TOUCHED_KEY, None)
+
+
+def activity_delta(obj: PhysicalActivity, sign: int = 1) -> RollupDelta:
+    return (obj.user_id, obj.start_time.date()), {
+        "activity_count": sign,
+        "steps_sum": sign * (obj.steps or 0),
+    }
+
+
+def sleep_delta(obj: SleepActivity, sign: int = 1) -> RollupDelta:
+    quality = obj.sleep_quality
+    return (obj.user_id, obj.start_time.date()), {
+        "sleep_count": sign,
+        "sleep_minutes_sum": sign * (obj.duration_minutes or 0),
+        "sleep_quality_sum": sign * (quality or 0),
+        "sleep_quality_count": sign * (quality is not None),
+    }
+
+
+def blood_test_delta(obj: BloodTest, sign: int = 1) -> RollupDelta:
+    key = (obj.user_id, obj.measured_at.date())
+    # Only glucose feeds the score today; other test types change no counters, but the
+    # empty delta still marks the user as touched (see `record()`).
+    if obj.test_type != BloodTestType.glucose:
+        return key, {}
+    return key, {
+        "glucose_count": sign,
+        "glucose_sum": sign * float(obj.value or 0),
+    }
+
+
+def record(db: Session, *deltas: Optional[RollupDelta]) -> None:
+    """Apply deltas to the rollup rows in the session's current transaction.
+
+    Deltas for the same (user_id, day) are merged first, so an update that stays on
+    the same day touches its rollup row once. Counters are incremented in the database
+    (`INSERT .. ON CONFLICT DO UPDATE`), so concurrent writers for the same day neither
+    collide on insert nor lose increments. Rows whose counts drop to zero are removed.
+
+    Every user with a delta is marked as touched, even when their counters cancel out
+    (e.g. an update of `calories` only): the row changed, so must the user's version.
+    """
+    merged: Dict[RollupKey, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    touched: Set[int] = set()
+    for item in deltas:
+        if item is None:
+            continue
+        key, fields = item
+        touched.add(key[0])
+        for name, value in fields.items():
+            merged[key][name] += value
+    if touched:
+        mark_touched(db, *touched)
+    merged = {key: fields for key, fields in merged.items() if any(fields.values())}
+    if not merged:
+        return
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "day": day,
+            "updated_at": now,
+            **{f: fields.get(f, 0) for f in COUNTER_FIELDS},
+        }
+        for (user_id, day), fields in merged.items()
+    ]
+
+    insert_fn = upsert_insert(db.get_bind().dialect.name)
+    if insert_fn is None:
+        _record_orm(db, rows)
+    else:
+        table = UserDailyRollup.__table__
+        stmt = insert_fn(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day],
+            set_={
+                **{f: table.c[f] + stmt.excluded[f] for f in COUNTER_FIELDS},
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        for shard, part in shard_groups(db, rows, itemgetter("user_id")).items():
+            db.execute(stmt, part, bind_arguments={"shard_id": shard})
+
+    # Only a decrement can empty a row
+    emptied = [
+        (user_id, day) for (user_id, day), fields in merged.items() if min(fields.values()) < 0
+    ]
+    if emptied:
+        R = UserDailyRollup
+        db.execute(
+            delete(R)
+            .where(tuple_(R.user_id, R.day).in_(emptied))
+            .where(*(getattr(R, f) <= 0 for f in _COUNT_FIELDS))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _record_orm(db: Session, rows: List[Dict]) -> None:
+    """Read-modify-write fallback for backends without ON CONFLICT."""
+    for values in rows:
+        row = db.get(UserDailyRollup, (values["user_id"], values["day"]))
+        if row is None:
+            db.add(UserDailyRollup(**values))
+            continue
+        for name in COUNTER_FIELDS:
+            setattr(row, name, getattr(row, name) + values[name])
+        row.updated_at = values["updated_at"]
+    db.flush()
+
+
+def rebuild_daily_rollups(db: Session, user_ids: Iterable[int] | None = None) -> int:
+    """Recompute rollups from the raw tables (backfill/repair). Caller commits."""
+    user_ids = list(user_ids) if user_ids is not None else None
+
+    def scoped(stmt, column):
+        return stmt.where(column.in_(user_ids)) if user_ids is not None else stmt
+
+    db.execute(scoped(delete(UserDailyRollup), UserDailyRollup.user_id))
+
+    rows: Dict[RollupKey, Dict[str, float]] = defaultdict(lambda: {f: 0 for f in COUNTER_FIELDS})
+
+    day = func.date(PhysicalActivity.start_time)
+    for r in db.execute(
+        scoped(
+            select(
+                PhysicalActivity.user_id,
+                day.label("day"),
+                func.count().label("n"),
+                func.coalesce(func.sum(PhysicalActivity.steps), 0).label("steps"),
+            ),
+            PhysicalActivity.user_id,
+        ).group_by(PhysicalActivity.user_id, day)
+    ):
+        fields = rows[(r.user_id, _as_date(r.day))]
+        fields["activity_count"] = r.n
+        fields["steps_sum"] = r.steps
+
+    day = func.date(SleepActivity.start_time)
+    for r in db.execute(
+        scoped(
+            select(
+                SleepActivity.user_id,
+                day.label("day"),
+                func.count().label("n"),
+                func.coalesce(func.sum(SleepActivity.duration_minutes), 0).label("minutes"),
+                func.coalesce(func.sum(SleepActivity.sleep_quality), 0).label("quality"),
+                func.count(SleepActivity.sleep_quality).label("quality_n"),
+            ),
+            SleepActivity.user_id,
+        ).group_by(SleepActivity.user_id, day)
+    ):
+        fields = rows[(r.user_id, _as_date(r.day))]
+        fields["sleep_count"] = r.n
+        fields["sleep_minutes_sum"] = r.minutes
+        fields["sleep_quality_sum"] = r.quality
+        fields["sleep_quality_count"] = r.quality_n
+
+    day = func.date(BloodTest.measured_at)
+    for r in db.execute(
+        scoped(
+            select(
+                BloodTest.user_id,
+                day.label("day"),
+                func.count().label("n"),
+                func.coalesce(func.sum(BloodTest.value), 0).label("total"),
+            ).where(BloodTest.test_type == BloodTestType.glucose),
+            BloodTest.user_id,
+        ).group_by(BloodTest.user_id, day)
+    ):
+        fields = rows[(r.user_id, _as_date(r.day))]
+        fields["glucose_count"] = r.n
+        fields["glucose_sum"] = float(r.total)
+
+    mark_touched(db, *{user_id for user_id, _ in rows})
+    now = datetime.utcnow()
+    db.add_all(
+        UserDailyRollup(user_id=user_id, day=day_, updated_at=now, **fields)
+        for (user_id, day_), fields in rows.items()
+    )
+    return len(rows)
+
+
+def backfill_daily_rollups(db: Session) -> int:
+    """Build rollups once for databases that predate the rollup table."""
+    if db.execute(select(UserDailyRollup.user_id).limit(1)).first() is not None:
+        return 0
+    count = rebuild_daily_rollups(db)
+    db.commit()
+    return count
+
+
+def _as_date(value) -> date:
+    # SQLite's date() returns text, other backends return a date.
+    return date.fromisoformat(value) if isinstance(value, str) else value
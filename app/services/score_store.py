@@ -0,0 +1,175 @@
+"""Precomputed health scores and their background refresher.
+
+The latest payload per (user, window) lives in `health_scores`, so the score endpoint can
+answer with one primary-key lookup. Commits that change a user's data mark the user dirty
+(via `rollups.on_commit`); `ScoreRefresher`, started from the app lifespan, recomputes dirty
+users every few seconds and everyone periodically, since one user's data shifts the
+population bounds for all.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Set
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.db.session import session_context, shard_groups
+from app.db.upsert import upsert_insert
+from app.models.health_score import HealthScore
+from app.services import rollups
+from app.services.health_score import compute_health_scores, refresh_sketches
+
+logger = logging.getLogger(__name__)
+
+
+class DirtyUsers:
+    """Thread-safe set of user ids whose stored scores are stale.
+
+    Ids are kept only while `tracking` (a `ScoreRefresher` is running to drain them).
+    """
+
+    def __init__(self) -> None:
+        self._ids: Set[int] = set()
+        self._lock = threading.Lock()
+        self.tracking = False
+
+    def add(self, user_ids: Iterable[int]) -> None:
+        if not self.tracking:
+            return
+        with self._lock:
+            self._ids.update(user_ids)
+
+    def drain(self) -> Set[int]:
+        with self._lock:
+            ids, self._ids = self._ids, set()
+        return ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+dirty_users = DirtyUsers()
+
+
+@rollups.on_commit
+def _mark_dirty(user_ids: Set[int]) -> None:
+    dirty_users.add(user_ids)
+
+
+def stored_payload(row: HealthScore) -> Dict[str, Any]:
+    """The stored score payload plus its freshness timestamp."""
+    return {**row.payload, "computed_at": row.computed_at.isoformat()}
+
+
+def store_scores(db: Session, days: int, scores: List[Dict[str, Any]]) -> int:
+    """Upsert `compute_health_scores()` results for one window. Caller commits."""
+    if not scores:
+        return 0
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": s["user_id"],
+            "days": days,
+            "score": s["score"],
+            "payload": {k: v for k, v in s.items() if k != "user_id"},
+            "computed_at": now,
+        }
+        for s in scores
+    ]
+    insert_fn = upsert_insert(db.get_bind().dialect.name)
+    if insert_fn is None:
+        for row in rows:
+            db.merge(HealthScore(**row))
+        return len(rows)
+    stmt = insert_fn(HealthScore.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "days"],
+        set_={c: stmt.excluded[c] for c in ("score", "payload", "computed_at")},
+    )
+    for shard, part in shard_groups(db, rows, itemgetter("user_id")).items():
+        db.execute(stmt, part, bind_arguments={"shard_id": shard})
+    return len(rows)
+
+
+def refresh_scores(
+    db: Session, windows: Iterable[int], user_ids: Iterable[int] | None = None
+) -> int:
+    """Recompute and store scores for `user_ids` (None = everyone) in every window.
+
+    In the sketch normalization modes the population sketches are rebuilt first: always on
+    a full refresh, otherwise only once they are older than the population TTL.
+    """
+    user_ids = list(user_ids) if user_ids is not None else None
+    sketched = get_settings().HEALTH_SCORE_NORMALIZATION != "minmax"
+    stored = 0
+    for days in windows:
+        if sketched:
+            refresh_sketches(db, days, force=user_ids is None)
+        result = compute_health_scores(db, user_ids=user_ids, days=days)
+        stored += store_scores(db, days, result["scores"])
+    db.commit()
+    return stored
+
+
+class ScoreRefresher:
+    """Asyncio background task keeping `health_scores` current."""
+
+    def __init__(self, windows: List[int], interval: float, full_interval: float) -> None:
+        self.windows = windows
+        self.interval = interval
+        self.full_interval = full_interval
+        self.last_full_refresh: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        dirty_users.tracking = True
+        self._task = asyncio.create_task(self._run(), name="score-refresher")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        dirty_users.tracking = False
+        dirty_users.drain()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("health score refresh failed")
+            await asyncio.sleep(self.interval)
+
+    async def tick(self) -> int:
+        """One refresh round: everyone when the full refresh is due, else dirty users."""
+        now = time.monotonic()
+        if self.last_full_refresh is None or now - self.last_full_refresh >= self.full_interval:
+            dirty_users.drain()
+            stored = await run_in_threadpool(self._refresh, None)
+            self.last_full_refresh = now
+            return stored
+        user_ids = dirty_users.drain()
+        if not user_ids:
+            return 0
+        try:
+            return await run_in_threadpool(self._refresh, user_ids)
+        except Exception:
+            dirty_users.add(user_ids)
+            raise
+
+    def _refresh(self, user_ids: Set[int] | None) -> int:
+        with session_context() as db:
+            return refresh_scores(db, self.windows, user_ids)
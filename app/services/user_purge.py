@@ -0,0 +1,183 @@
+"""Deleting users with long histories without loading their rows.
+
+`purge_user()` deletes a user's activities, sleeps and blood tests with set-based DELETEs of
+at most `PURGE_CHUNK_SIZE` rows, one short transaction each, then removes the user with
+their rollups, stored scores and archive segments (`app.services.archive`) in one final
+small transaction, which also sweeps up rows written for the user while the chunks ran
+(no orphans). Nothing is loaded into the session, and no single transaction holds the write
+lock for long. Until that final step the user and their rollups (so their score) stay as
+they were; listings shrink chunk by chunk, and each chunk bumps the user's data version so
+ETags follow.
+
+Histories above `PURGE_INLINE_MAX_ROWS` are purged by `purge_jobs` in the background, one
+job at a time, with progress readable while they run.
+"""
+
+from __future__ import annotations
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.session import session_context
+from app.models.activity import PhysicalActivity
+from app.models.blood_test import BloodTest
+from app.models.daily_rollup import UserDailyRollup
+from app.models.health_score import HealthScore
+from app.models.sleep import SleepActivity
+from app.models.user import User
+from app.services import data_versions, rollups
+from app.services.archive import drop_user_archive, remove_files
+
+logger = logging.getLogger(__name__)
+
+# Raw per-user tables, deleted chunk by chunk
+HISTORY_MODELS = (PhysicalActivity, SleepActivity, BloodTest)
+# Finished jobs remembered for the status endpoint
+_KEEP_FINISHED = 100
+
+
+def history_counts(db: Session, user_id: int) -> Dict[str, int]:
+    """Rows per raw table owned by `user_id` (index-only counts)."""
+    return {
+        model.__tablename__: db.scalar(
+            select(func.count()).select_from(model).where(model.user_id == user_id)
+        )
+        for model in HISTORY_MODELS
+    }
+
+
+def purge_user(
+    db: Session,
+    user_id: int,
+    chunk_size: int | None = None,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, int]:
+    """Delete `user_id` and everything they own in bounded transactions. Commits.
+
+    `progress(table, rows)` is called after every committed chunk. Returns rows deleted per
+    raw table.
+    """
+    chunk_size = chunk_size or get_settings().PURGE_CHUNK_SIZE
+    deleted: Dict[str, int] = {}
+    for model in HISTORY_MODELS:
+        table = model.__tablename__
+        chunk = select(model.id).where(model.user_id == user_id).limit(chunk_size)
+        stmt = (
+            delete(model)
+            .where(model.id.in_(chunk.scalar_subquery()))
+            .execution_options(synchronize_session=False)
+        )
+        deleted[table] = 0
+        while True:
+            count = db.execute(stmt).rowcount
+            # Versions only: rollups are untouched until the end, so the score is too
+            data_versions.bump(db, [user_id])
+            db.commit()
+            deleted[table] += count
+            if progress is not None:
+                progress(table, count)
+            if count < chunk_size:
+                break
+
+    # The user still existed while the chunks ran, so writes could land behind them: sweep
+    # those up in the same transaction that deletes the user, or they'd be left orphaned
+    swept = {}
+    for model in HISTORY_MODELS:
+        swept[model.__tablename__] = db.execute(
+            delete(model)
+            .where(model.user_id == user_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    rollups.mark_touched(db, user_id)
+    for model in (UserDailyRollup, HealthScore):
+        db.execute(
+            delete(model)
+            .where(model.user_id == user_id)
+            .execution_options(synchronize_session=False)
+        )
+    archived = drop_user_archive(db, user_id)
+    db.execute(delete(User).where(User.id == user_id).execution_options(synchronize_session=False))
+    db.commit()
+    remove_files(archived)
+    for table, count in swept.items():
+        deleted[table] += count
+        if count and progress is not None:
+            progress(table, count)
+    return deleted
+
+
+@dataclass
+class PurgeJob:
+    job_id: str
+    user_id: int
+    total: int
+    deleted: int = 0
+    status: str = "running"
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: datetime | None = None
+    error: str | None = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class PurgeJobs:
+    """Background purges, run one at a time, and their progress."""
+
+    def __init__(self) -> None:
+        self._jobs: OrderedDict[str, PurgeJob] = OrderedDict()
+        self._lock = threading.Lock()
+        # One worker: concurrent purges would only queue on the write lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-purge")
+
+    def get(self, job_id: str) -> PurgeJob | None:
+        return self._jobs.get(job_id)
+
+    def running_for(self, user_id: int) -> PurgeJob | None:
+        with self._lock:
+            return next(
+                (j for j in self._jobs.values() if j.user_id == user_id and j.status == "running"),
+                None,
+            )
+
+    def start(self, user_id: int, total: int) -> PurgeJob:
+        """Queue a purge of `user_id` (`total` raw rows), or return the one already running."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.user_id == user_id and job.status == "running":
+                    return job
+            job = PurgeJob(uuid.uuid4().hex, user_id, total)
+            self._jobs[job.job_id] = job
+            self._forget_finished()
+        self._executor.submit(self._run, job)
+        return job
+
+    def _forget_finished(self) -> None:
+        finished = [k for k, j in self._jobs.items() if j.status != "running"]
+        for key in finished[: max(len(finished) - _KEEP_FINISHED, 0)]:
+            del self._jobs[key]
+
+    def _run(self, job: PurgeJob) -> None:
+        def progress(table: str, count: int) -> None:
+            job.deleted += count
+
+        try:
+            with session_context() as db:
+                purge_user(db, job.user_id, progress=progress)
+            job.status = "done"
+        except Exception as e:
+            logger.exception("purge of user %s failed", job.user_id)
+            job.status = "failed"
+            job.error = f"{e.__class__.__name__}: {e}".splitlines()[0]
+        job.finished_at = datetime.utcnow()
+
+
+purge_jobs = PurgeJobs()
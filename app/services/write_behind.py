@@ -0,0 +1,268 @@
+"""Write-behind ingestion: acknowledge creates at once, persist them in group commits.
+
+With `WRITE_BEHIND_ENABLED`, a validated POST to activities, sleeps or blood tests is put
+on a bounded in-process queue and answered `202 Accepted` with a ticket. A flusher thread
+takes up to `WRITE_BEHIND_BATCH_SIZE` writes (or whatever arrived within
+`WRITE_BEHIND_FLUSH_SECONDS`) and commits them in one transaction: one fsync for the whole
+batch instead of one per request. Rows, rollups and an `ingest_receipts` row per ticket
+commit together, so a receipt is proof of persistence; `status()` covers tickets still in
+memory (queued, or failed). Each flush re-checks that the users still exist; writes for a
+user deleted since they were queued fail instead of leaving orphan rows.
+
+When the queue is full, `submit()` waits up to `WRITE_BEHIND_ENQUEUE_TIMEOUT_SECONDS` and
+then raises `QueueFull`. Writes still queued when the process dies are lost; clients that
+need durability poll the ticket.
+"""
+
+from __future__ import annotations
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_DEPTH, WRITE_BEHIND_WRITES
+from app.db.base import Base
+from app.db.session import session_context, shard_groups
+from app.models.activity import PhysicalActivity
+from app.models.blood_test import BloodTest
+from app.models.ingest_receipt import IngestReceipt
+from app.models.sleep import SleepActivity
+from app.models.user import User
+from app.services import rollups
+
+logger = logging.getLogger(__name__)
+
+# kind -> (model, rollup delta), as in the matching POST handler
+WRITE_KINDS: Dict[str, Tuple[Type[Base], Callable[[Any], Optional[rollups.RollupDelta]]]] = {
+    "activity": (PhysicalActivity, rollups.activity_delta),
+    "sleep": (SleepActivity, rollups.sleep_delta),
+    "blood_test": (BloodTest, rollups.blood_test_delta),
+}
+
+
+class QueueFull(Exception):
+    """The write-behind queue stayed full for the whole enqueue timeout."""
+
+
+class UserGone(Exception):
+    """The write's user was deleted between enqueue and flush."""
+
+
+@dataclass
+class PendingWrite:
+    ticket: str
+    kind: str
+    payload: BaseModel
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def persist_writes(db: Session, writes: List[PendingWrite]) -> List[PendingWrite]:
+    """Insert `writes`, their rollups and their receipts in the current transaction.
+
+    The user check at enqueue time can be stale by now (SQLite doesn't enforce the foreign
+    keys): writes whose user no longer exists are left out and returned.
+    """
+    user_ids = {w.payload.user_id for w in writes}
+    existing = set(db.scalars(select(User.id).where(User.id.in_(user_ids))))
+    orphans = [w for w in writes if w.payload.user_id not in existing]
+    writes = [w for w in writes if w.payload.user_id in existing]
+    now = datetime.utcnow()
+    receipts: List[Dict[str, Any]] = []
+    by_kind: Dict[str, List[PendingWrite]] = defaultdict(list)
+    for w in writes:
+        by_kind[w.kind].append(w)
+    for kind, items in by_kind.items():
+        model, delta = WRITE_KINDS[kind]
+        table = model.__table__
+        stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        for shard, part in shard_groups(db, items, lambda w: w.payload.user_id).items():
+            ids = db.execute(
+                stmt, [w.payload.model_dump() for w in part], bind_arguments={"shard_id": shard}
+            ).scalars()
+            receipts.extend(
+                {
+                    "ticket": w.ticket,
+                    "user_id": w.payload.user_id,
+                    "kind": kind,
+                    "record_id": record_id,
+                    "persisted_at": now,
+                }
+                for w, record_id in zip(part, ids)
+            )
+        rollups.record(db, *(delta(w.payload) for w in items))
+    stmt = insert(IngestReceipt.__table__)
+    for shard, part in shard_groups(db, receipts, lambda r: r["user_id"]).items():
+        db.execute(stmt, part, bind_arguments={"shard_id": shard})
+    return orphans
+
+
+class WriteBehindQueue:
+    """Bounded queue of pending creates and the thread that group-commits them."""
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_seconds: float,
+        enqueue_timeout: float,
+        receipt_ttl: float,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self.receipt_ttl = receipt_ttl
+        self._queue: queue.Queue[PendingWrite] = queue.Queue(maxsize=max_size)
+        self._queued: Dict[str, str] = {}
+        self._failed: Dict[str, Tuple[str, str, float]] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_prune = 0.0
+
+    @classmethod
+    def from_settings(cls) -> "WriteBehindQueue":
+        s = get_settings()
+        return cls(
+            s.WRITE_BEHIND_QUEUE_SIZE,
+            s.WRITE_BEHIND_BATCH_SIZE,
+            s.WRITE_BEHIND_FLUSH_SECONDS,
+            s.WRITE_BEHIND_ENQUEUE_TIMEOUT_SECONDS,
+            s.WRITE_BEHIND_RECEIPT_TTL_SECONDS,
+        )
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush everything still queued, then stop the flusher (blocking)."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, kind: str, payload: BaseModel) -> str:
+        """Queue a validated create; returns its ticket or raises `QueueFull`."""
+        write = PendingWrite(uuid.uuid4().hex, kind, payload)
+        with self._lock:
+            self._queued[write.ticket] = kind
+        try:
+            self._queue.put(write, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._queued.pop(write.ticket, None)
+            WRITE_BEHIND_WRITES.inc(outcome="rejected")
+            raise QueueFull()
+        WRITE_BEHIND_DEPTH.set(self._queue.qsize())
+        return write.ticket
+
+    def status(self, ticket: str) -> Dict[str, Any] | None:
+        """`queued`/`failed` status of a ticket this process still holds, else None."""
+        with self._lock:
+            if ticket in self._queued:
+                return {"ticket": ticket, "kind": self._queued[ticket], "status": "queued"}
+            if ticket in self._failed:
+                kind, detail, _ = self._failed[ticket]
+                return {"ticket": ticket, "kind": kind, "status": "failed", "detail": detail}
+        return None
+
+    def _next_batch(self) -> List[PendingWrite]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_seconds)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            WRITE_BEHIND_DEPTH.set(self._queue.qsize())
+            try:
+                if batch:
+                    self._flush(batch)
+                self._prune()
+            except Exception:
+                logger.exception("write-behind flush failed")
+
+    def _flush(self, batch: List[PendingWrite]) -> None:
+        WRITE_BEHIND_BATCH_SIZE.observe(len(batch))
+        with session_context() as db:
+            try:
+                orphans = persist_writes(db, batch)
+                db.commit()
+                self._done([w for w in batch if w not in orphans])
+                self._fail_orphans(orphans)
+                return
+            except Exception as e:
+                db.rollback()
+                if len(batch) == 1:
+                    self._fail(batch[0], e)
+                    return
+            # One bad row shouldn't sink the batch: retry one by one to isolate it
+            for write in batch:
+                try:
+                    orphans = persist_writes(db, [write])
+                    db.commit()
+                    if orphans:
+                        self._fail_orphans(orphans)
+                    else:
+                        self._done([write])
+                except Exception as e:
+                    db.rollback()
+                    self._fail(write, e)
+
+    def _done(self, writes: List[PendingWrite]) -> None:
+        with self._lock:
+            for w in writes:
+                self._queued.pop(w.ticket, None)
+        WRITE_BEHIND_WRITES.inc(len(writes), outcome="persisted")
+
+    def _fail_orphans(self, writes: List[PendingWrite]) -> None:
+        for w in writes:
+            self._fail(w, UserGone(f"user {w.payload.user_id} no longer exists"))
+
+    def _fail(self, write: PendingWrite, error: Exception) -> None:
+        detail = f"{error.__class__.__name__}: {error}".splitlines()[0]
+        logger.warning("write-behind %s %s failed: %s", write.kind, write.ticket, detail)
+        with self._lock:
+            self._queued.pop(write.ticket, None)
+            self._failed[write.ticket] = (write.kind, detail, time.monotonic())
+        WRITE_BEHIND_WRITES.inc(outcome="failed")
+
+    def _prune(self) -> None:
+        """Forget failures and delete receipts older than the receipt TTL (about once a minute)."""
+        now = time.monotonic()
+        if now - self._last_prune < min(60.0, self.receipt_ttl):
+            return
+        self._last_prune = now
+        with self._lock:
+            self._failed = {t: f for t, f in self._failed.items() if now - f[2] < self.receipt_ttl}
+        cutoff = datetime.utcnow() - timedelta(seconds=self.receipt_ttl)
+        with session_context() as db:
+            db.execute(delete(IngestReceipt).where(IngestReceipt.persisted_at < cutoff))
+            db.commit()
@@ -0,0 +1,7 @@
+"""Reproducible performance benchmarks for the Health Tracker API.
+
+`python -m benchmarks run` fills a scratch SQLite database with a synthetic population,
+drives the real FastAPI app in-process through httpx's ASGI transport, and writes latency
+percentiles and throughput per scenario to a JSON result file.
+`python -m benchmarks compare old.json new.json` diffs two result files.
+"""
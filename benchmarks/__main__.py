@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime
+
+
+def _run(args: argparse.Namespace) -> None:
+    # Point the app at a scratch database *before* anything imports app.db.session
+    scratch = args.database or os.path.join(tempfile.mkdtemp(prefix="health-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    if args.profile:
+        os.environ["DB_ENGINE_PROFILE"] = args.profile
+
+    from benchmarks.datagen import PopulationSpec
+    from benchmarks.runner import RunConfig, run
+
+    spec = PopulationSpec(
+        users=args.users,
+        activities_per_user=args.activities,
+        sleeps_per_user=args.sleeps,
+        glucose_per_user=args.glucose,
+        span_days=args.span_days,
+        seed=args.seed,
+    )
+    config = RunConfig(requests=args.requests, concurrency=args.concurrency, warmup=args.warmup)
+    result = asyncio.run(run(spec, config, only=args.only))
+
+    output = args.output
+    if output is None:
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        commit = result["meta"]["git_commit"] or "nogit"
+        output = os.path.join("bench_results", f"{stamp}-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {output}")
+
+
+def _compare(args: argparse.Namespace) -> None:
+    from benchmarks.runner import compare
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    print("\n".join(compare(old, new)))
+
+
+def _serialize(args: argparse.Namespace) -> None:
+    from benchmarks.serialization import run
+
+    print("\n".join(run(rows=args.rows, repeat=args.repeat)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="generate data, run scenarios, write a result file")
+    run_p.add_argument("--users", type=int, default=200)
+    run_p.add_argument("--activities", type=int, default=200, help="per user")
+    run_p.add_argument("--sleeps", type=int, default=60, help="per user")
+    run_p.add_argument("--glucose", type=int, default=20, help="per user")
+    run_p.add_argument("--span-days", type=int, default=90)
+    run_p.add_argument("--seed", type=int, default=42)
+    run_p.add_argument("--requests", type=int, default=200, help="per scenario")
+    run_p.add_argument("--concurrency", type=int, default=8)
+    run_p.add_argument("--warmup", type=int, default=10)
+    run_p.add_argument("--profile", choices=["default", "throughput"])
+    run_p.add_argument("--only", nargs="*", help="scenario names to run")
+    run_p.add_argument("--database", help="scratch SQLite file (default: a temp dir)")
+    run_p.add_argument("--output", help="result file (default: bench_results/<time>-<commit>.json)")
+    run_p.set_defaults(func=_run)
+
+    cmp_p = sub.add_parser("compare", help="diff two result files")
+    cmp_p.add_argument("old")
+    cmp_p.add_argument("new")
+    cmp_p.set_defaults(func=_compare)
+
+    ser_p = sub.add_parser("serialize", help="time response serialization stages (no database)")
+    ser_p.add_argument("--rows", type=int, default=1000, help="rows per list payload")
+    ser_p.add_argument("--repeat", type=int, default=200)
+    ser_p.set_defaults(func=_serialize)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Synthetic population generator.
+
+Writes users plus per-user activities, sleeps and glucose tests spread over a time span,
+using Core executemany inserts (per shard), then builds the daily rollups from the raw rows. The same
+seed always produces the same data.
+"""
+
+from __future__ import annotations
+import random
+from dataclasses import dataclass
+from operator import itemgetter
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.db.session import shard_groups
+from app.models.activity import PhysicalActivity
+from app.models.blood_test import BloodTest, BloodTestType
+from app.models.sleep import SleepActivity
+from app.models.user import User
+from app.services.rollups import rebuild_daily_rollups
+
+_INSERT_CHUNK = 5000
+
+
+@dataclass
+class PopulationSpec:
+    users: int = 200
+    activities_per_user: int = 200
+    sleeps_per_user: int = 60
+    glucose_per_user: int = 20
+    span_days: int = 90
+    seed: int = 42
+
+
+def _chunks(rows: list, size: int = _INSERT_CHUNK):
+    for i in range(0, len(rows), size):
+        yield rows[i : i + size]
+
+
+def _insert(db: Session, model, rows: list) -> None:
+    for shard, part in shard_groups(db, rows, itemgetter("user_id")).items():
+        for chunk in _chunks(part):
+            db.execute(insert(model.__table__), chunk, bind_arguments={"shard_id": shard})
+
+
+def generate(db: Session, spec: PopulationSpec, end: datetime | None = None) -> dict:
+    """Insert a synthetic population and return row counts per table."""
+    rng = random.Random(spec.seed)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    span = timedelta(days=spec.span_days).total_seconds()
+
+    def moment() -> datetime:
+        return end - timedelta(seconds=rng.uniform(0, span))
+
+    # Users go through the ORM so each lands on (and takes its id from) its shard
+    users = [
+        User(
+            email=f"bench-user-{i}@example.com",
+            full_name=f"Bench User {i}",
+            gender=rng.choice(["male", "female", "other"]),
+            height_cm=round(rng.gauss(170, 10), 1),
+            weight_kg=round(rng.gauss(72, 12), 1),
+            created_at=end,
+        )
+        for i in range(spec.users)
+    ]
+    db.add_all(users)
+    db.flush()
+    user_ids = [u.id for u in users]
+
+    activities, sleeps, tests = [], [], []
+    for user_id in user_ids:
+        # Each user gets a personal baseline so the population has a real spread
+        steps_base = rng.uniform(2000, 14000)
+        sleep_base = rng.uniform(330, 520)
+        glucose_base = rng.uniform(80, 130)
+        for _ in range(spec.activities_per_user):
+            start = moment()
+            activities.append(
+                {
+                    "user_id": user_id,
+                    "start_time": start,
+                    "end_time": start + timedelta(minutes=rng.randint(5, 90)),
+                    "steps": max(0, int(rng.gauss(steps_base, 1500)) // 4),
+                    "distance_km": round(rng.uniform(0.2, 6.0), 2),
+                    "calories": round(rng.uniform(20, 500), 1),
+                }
+            )
+        for _ in range(spec.sleeps_per_user):
+            start = moment()
+            minutes = max(60, int(rng.gauss(sleep_base, 45)))
+            sleeps.append(
+                {
+                    "user_id": user_id,
+                    "start_time": start,
+                    "end_time": start + timedelta(minutes=minutes),
+                    "duration_minutes": minutes,
+                    "sleep_quality": rng.choice([None, *range(40, 100)]),
+                }
+            )
+        for _ in range(spec.glucose_per_user):
+            tests.append(
+                {
+                    "user_id": user_id,
+                    "measured_at": moment(),
+                    "test_type": BloodTestType.glucose.value,
+                    "value": round(rng.gauss(glucose_base, 8), 1),
+                    "unit": "mg/dL",
+                }
+            )
+
+    _insert(db, PhysicalActivity, activities)
+    _insert(db, SleepActivity, sleeps)
+    _insert(db, BloodTest, tests)
+    rollup_rows = rebuild_daily_rollups(db)
+    db.commit()
+    return {
+        "users": spec.users,
+        "activities": len(activities),
+        "sleeps": len(sleeps),
+        "blood_tests": len(tests),
+        "daily_rollups": rollup_rows,
+    }
@@ -0,0 +1,203 @@
+"""Drive the app in-process and measure latency/throughput per scenario.
+
+Import this module only after DATABASE_URL points at the scratch database: the app's
+engines are created from Settings at import time.
+"""
+
+from __future__ import annotations
+import asyncio
+import platform
+import random
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.db.base import Base
+from app.db.session import create_schema, session_context
+from app.main import app
+from app.models.activity import PhysicalActivity
+from app.models.user import User
+from benchmarks.datagen import PopulationSpec, generate
+
+Scenario = Callable[[httpx.AsyncClient, random.Random], Awaitable[httpx.Response]]
+
+
+@dataclass
+class RunConfig:
+    requests: int = 200
+    concurrency: int = 8
+    warmup: int = 10
+    score_days: int = 30
+
+
+def _scenarios(
+    config: RunConfig, user_ids: List[int], activity_ids: List[int]
+) -> Dict[str, Scenario]:
+    # Drawn from the generated rows: with DB_SHARDS > 1 ids are ranged per shard
+    def user(rng: random.Random) -> int:
+        return rng.choice(user_ids)
+
+    def activity_id(rng: random.Random) -> int:
+        return rng.choice(activity_ids)
+
+    async def create_activity(c, rng):
+        now = datetime.utcnow().isoformat()
+        body = {"user_id": user(rng), "start_time": now, "end_time": now, "steps": 500}
+        return await c.post("/api/v1/activities/", json=body)
+
+    async def get_activity(c, rng):
+        return await c.get(f"/api/v1/activities/{activity_id(rng)}")
+
+    async def update_activity(c, rng):
+        return await c.put(f"/api/v1/activities/{activity_id(rng)}", json={"steps": 750})
+
+    async def list_activities(c, rng):
+        return await c.get("/api/v1/activities/", params={"user_id": user(rng)})
+
+    async def list_sleeps(c, rng):
+        return await c.get("/api/v1/sleeps/", params={"user_id": user(rng)})
+
+    async def list_blood_tests(c, rng):
+        return await c.get("/api/v1/blood-tests/", params={"user_id": user(rng)})
+
+    async def list_users(c, rng):
+        return await c.get("/api/v1/users/")
+
+    async def get_health_score(c, rng):
+        params = {"user_id": user(rng), "days": config.score_days}
+        return await c.get("/api/v1/health/get_health_score", params=params)
+
+    return {
+        "create_activity": create_activity,
+        "get_activity": get_activity,
+        "update_activity": update_activity,
+        "list_activities": list_activities,
+        "list_sleeps": list_sleeps,
+        "list_blood_tests": list_blood_tests,
+        "list_users": list_users,
+        "get_health_score": get_health_score,
+    }
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies: List[float], errors: int, wall: float, sizes: List[int]) -> dict:
+    ms = sorted(v * 1000 for v in latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50_ms": round(_percentile(ms, 0.50), 3),
+        "p90_ms": round(_percentile(ms, 0.90), 3),
+        "p99_ms": round(_percentile(ms, 0.99), 3),
+        "max_ms": round(ms[-1], 3) if ms else 0.0,
+        "mean_response_bytes": round(statistics.fmean(sizes), 1) if sizes else 0.0,
+    }
+
+
+async def _run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, config: RunConfig, seed: int
+) -> dict:
+    rng = random.Random(seed)
+    for _ in range(config.warmup):
+        await scenario(client, rng)
+
+    latencies: List[float] = []
+    sizes: List[int] = []
+    errors = 0
+    remaining = config.requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            r = await scenario(client, rng)
+            latencies.append(time.perf_counter() - started)
+            sizes.append(len(r.content))
+            if r.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(config.concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started, sizes)
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(spec: PopulationSpec, config: RunConfig, only: List[str] | None = None) -> dict:
+    """Generate the population, run every scenario and return the result document."""
+    create_schema(Base.metadata)
+    started = time.perf_counter()
+    with session_context() as db:
+        counts = generate(db, spec)
+    generate_s = time.perf_counter() - started
+    with session_context() as db:
+        user_ids = db.scalars(select(User.id)).all()
+        activity_ids = db.scalars(select(PhysicalActivity.id)).all()
+
+    scenarios = _scenarios(config, user_ids, activity_ids)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for i, (name, scenario) in enumerate(scenarios.items()):
+                if only and name not in only:
+                    continue
+                results[name] = await _run_scenario(client, scenario, config, spec.seed + i)
+                print(f"{name:>20}: {results[name]}")
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database_url": get_settings().DATABASE_URL,
+            "engine_profile": get_settings().DB_ENGINE_PROFILE,
+            "shards": get_settings().DB_SHARDS,
+            "population": asdict(spec),
+            "rows": counts,
+            "generate_seconds": round(generate_s, 3),
+            "run": asdict(config),
+        },
+        "scenarios": results,
+    }
+
+
+def compare(old: dict, new: dict) -> List[str]:
+    """Human-readable p50/p99/throughput deltas between two result documents."""
+    lines = [f"{'scenario':>20}  {'p50 ms':>26}  {'p99 ms':>26}  {'rps':>26}"]
+    for name, after in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if before is None:
+            continue
+        cells = []
+        for key in ("p50_ms", "p99_ms", "throughput_rps"):
+            a, b = before[key], after[key]
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            cells.append(f"{a:.2f} -> {b:.2f} ({change})".rjust(26))
+        lines.append(f"{name:>20}  " + "  ".join(cells))
+    return lines
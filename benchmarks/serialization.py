@@ -0,0 +1,92 @@
+"""Micro-benchmark of response serialization, independent of the database.
+
+Times each stage a response goes through for representative payloads: a health-score
+Observation and list pages of activities and users. It compares the stdlib encoders
+(`jsonable_encoder` + `JSONResponse`) with the orjson path the app uses.
+"""
+
+from __future__ import annotations
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from app.schemas.activity import ActivityOut
+from app.schemas.user import UserOut
+from app.services.fhir import build_health_observation
+
+
+def _time(fn: Callable[[], object], repeat: int) -> float:
+    """Best-of-3 mean microseconds per call."""
+    return min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat * 1e6
+
+
+def _rows(rows: int) -> Dict[str, list]:
+    now = datetime.utcnow()
+    activities = [
+        SimpleNamespace(
+            id=i,
+            user_id=1,
+            start_time=now - timedelta(hours=i),
+            end_time=now - timedelta(hours=i) + timedelta(minutes=30),
+            steps=1000 + i,
+            distance_km=1.5,
+            calories=120.0,
+        )
+        for i in range(rows)
+    ]
+    users = [
+        SimpleNamespace(
+            id=i,
+            email=f"user{i}@example.com",
+            full_name="Bench User",
+            gender="other",
+            date_of_birth=None,
+            height_cm=170.0,
+            weight_kg=70.0,
+            created_at=now,
+        )
+        for i in range(rows)
+    ]
+    return {"activities": activities, "users": users}
+
+
+def run(rows: int = 1000, repeat: int = 200) -> List[str]:
+    payload = {
+        "since": "2024-01-01T00:00:00",
+        "components": {"steps_score": 61.2, "sleep_score": 48.0, "glucose_score": 73.9},
+        "score": 60.6,
+    }
+    observation = build_health_observation(1, payload)
+    lines = [f"{'stage':>40}  {'us/call':>10}"]
+
+    def row(name: str, fn: Callable[[], object], n: int = repeat) -> None:
+        lines.append(f"{name:>40}  {_time(fn, n):>10.1f}")
+
+    row("observation: build", lambda: build_health_observation(1, payload))
+    row(
+        "observation: jsonable_encoder + json",
+        lambda: JSONResponse(jsonable_encoder(observation)).body,
+    )
+    row("observation: orjson", lambda: ORJSONResponse(observation).body)
+
+    data = _rows(rows)
+    list_repeat = max(repeat // 20, 3)
+    for name, schema in (("activities", ActivityOut), ("users", UserOut)):
+        adapter = TypeAdapter(List[schema])
+        models = adapter.validate_python(data[name], from_attributes=True)
+        dumped = adapter.dump_python(models, mode="json")
+        label = f"{rows} {name}"
+        row(
+            f"{label}: validate",
+            lambda: adapter.validate_python(data[name], from_attributes=True),
+            list_repeat,
+        )
+        row(f"{label}: dump", lambda: adapter.dump_python(models, mode="json"), list_repeat)
+        row(f"{label}: json", lambda: JSONResponse(dumped).body, list_repeat)
+        row(f"{label}: orjson", lambda: ORJSONResponse(dumped).body, list_repeat)
+    return lines
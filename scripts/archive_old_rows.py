@@ -0,0 +1,32 @@
+"""Move old raw activities and sleeps into the cold archive.
+
+Archives every whole month older than `--days` (default `ARCHIVE_AFTER_DAYS`) into
+compressed per-user, per-month column files under `ARCHIVE_DIR`. Safe to re-run (e.g. from
+cron): months that got late rows are rewritten, everything else is left alone.
+
+    python -m scripts.archive_old_rows --days 365
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from app.core.config import get_settings
+from app.db.base import Base
+from app.db.session import create_schema, session_context
+from app.main import app  # noqa: F401  (register all mappers)
+from app.services.archive import archive_old_rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=get_settings().ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+    create_schema(Base.metadata, skip_if_current=True)
+    older_than = datetime.utcnow() - timedelta(days=args.days)
+    with session_context() as db:
+        moved = archive_old_rows(db, older_than)
+    print({"older_than": older_than.date().isoformat(), "archived_rows": moved})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Compare SQLite engine profiles under concurrent writes and reads.
+
+Runs the same workload against a scratch database per profile: writer threads insert
+activities one commit at a time (like POST /activities/) while reader threads run
+list-style queries. Prints commits/s, reads/s and "database is locked" errors.
+
+    python -m scripts.bench_engine_profile --writers 8 --readers 4 --seconds 5
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import get_settings
+from app.db.base import Base
+from app.db.session import build_engine
+from app.main import app  # noqa: F401  (register all mappers)
+from app.models.activity import PhysicalActivity
+from app.models.user import User
+
+
+def run_profile(profile: str, writers: int, readers: int, seconds: float) -> dict:
+    settings = get_settings()
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+    url = f"sqlite:///{path}"
+    write_engine = build_engine(url, settings, profile=profile)
+    read_engine = (
+        build_engine(url, settings, profile=profile, read_only=True)
+        if profile == "throughput"
+        else write_engine
+    )
+    Base.metadata.create_all(write_engine)
+    with write_engine.begin() as conn:
+        conn.execute(insert(User), [{"email": f"bench{i}@example.com"} for i in range(writers)])
+
+    counts = {"commits": 0, "reads": 0, "locked": 0}
+    errors: list = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def bump(key: str) -> None:
+        with lock:
+            counts[key] += 1
+
+    def writer(user_id: int) -> None:
+        while time.perf_counter() < deadline:
+            now = datetime.utcnow()
+            try:
+                with write_engine.begin() as conn:
+                    conn.execute(
+                        insert(PhysicalActivity),
+                        {"user_id": user_id, "start_time": now, "end_time": now, "steps": 100},
+                    )
+                bump("commits")
+            except OperationalError:
+                bump("locked")
+
+    def reader(user_id: int) -> None:
+        stmt = (
+            select(PhysicalActivity)
+            .where(PhysicalActivity.user_id == user_id)
+            .order_by(PhysicalActivity.start_time.desc())
+            .limit(100)
+        )
+        while time.perf_counter() < deadline:
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(stmt).all()
+                bump("reads")
+            except OperationalError:
+                bump("locked")
+
+    def guarded(fn, user_id: int) -> None:
+        # A worker that dies would otherwise just show up as 0/s
+        try:
+            fn(user_id)
+        except Exception as exc:
+            with lock:
+                errors.append(exc)
+
+    threads = [threading.Thread(target=guarded, args=(writer, i + 1)) for i in range(writers)]
+    threads += [
+        threading.Thread(target=guarded, args=(reader, i % writers + 1)) for i in range(readers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    write_engine.dispose()
+    read_engine.dispose()
+    if errors:
+        raise RuntimeError(f"{len(errors)} {profile} worker thread(s) failed") from errors[0]
+    return {
+        "profile": profile,
+        "commits_per_s": round(counts["commits"] / seconds, 1),
+        "reads_per_s": round(counts["reads"] / seconds, 1),
+        "locked_errors": counts["locked"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    for profile in ("default", "throughput"):
+        print(run_profile(profile, args.writers, args.readers, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
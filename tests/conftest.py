@@ -0,0 +1,19 @@
+import os
+import tempfile
+
+# Before anything imports the app: settings are read once
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["ARCHIVE_DIR"] = f"{_tmp}/archive"
+os.environ["SCORE_WORKER_ENABLED"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
@@ -0,0 +1,22 @@
+"""Route classes: long exports and remote FHIR fetches don't share the scoring limit."""
+
+import pytest
+
+from app.core.admission import route_class
+
+
+@pytest.mark.parametrize(
+    "method, path, expected",
+    [
+        ("GET", "/api/v1/health/get_health_score", "score"),
+        ("GET", "/api/v1/health/trend", "score"),
+        ("POST", "/api/v1/health/scores", "score"),
+        ("GET", "/api/v1/health/$export", "export"),
+        ("GET", "/api/v1/health/external_patient/123", "external"),
+        ("GET", "/api/v1/activities/", "read"),
+        ("PUT", "/api/v1/activities/1", "write"),
+        ("GET", "/metrics", None),
+    ],
+)
+def test_route_class(method, path, expected):
+    assert route_class(method, path) == expected
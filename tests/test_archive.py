@@ -0,0 +1,48 @@
+"""Archived records stay reachable by id, read-only, and months are archived one at a time."""
+
+from datetime import datetime
+
+from app.db.session import session_context
+from app.models.archive_segment import ArchiveSegment
+from app.services.archive import archive_old_rows
+
+
+def _activity(client, user_id, start):
+    return client.post(
+        "/api/v1/activities/",
+        json={
+            "user_id": user_id,
+            "start_time": start,
+            "end_time": start.replace("T08", "T09"),
+            "steps": 1000,
+            "calories": 100,
+        },
+    ).json()
+
+
+def test_archived_record_by_id(client):
+    user_id = client.post("/api/v1/users/", json={"email": "archive@example.com"}).json()["id"]
+    old = [
+        _activity(client, user_id, "2020-01-05T08:00:00"),
+        _activity(client, user_id, "2020-02-05T08:00:00"),
+    ]
+    live = _activity(client, user_id, "2026-01-05T08:00:00")
+    with session_context() as db:
+        archive_old_rows(db, datetime(2021, 1, 1))
+        months = db.query(ArchiveSegment.month).filter(ArchiveSegment.user_id == user_id).count()
+    assert months == 2
+
+    listed = client.get("/api/v1/activities/", params={"user_id": user_id}).json()
+    assert {a["id"] for a in listed} == {live["id"], *(a["id"] for a in old)}
+
+    for activity in old:
+        r = client.get(f"/api/v1/activities/{activity['id']}")
+        assert r.status_code == 200
+        assert r.json() == activity
+        r = client.put(f"/api/v1/activities/{activity['id']}", json={"steps": 5})
+        assert r.status_code == 409
+        assert client.delete(f"/api/v1/activities/{activity['id']}").status_code == 409
+
+    assert client.put(f"/api/v1/activities/{live['id']}", json={"steps": 5}).status_code == 200
+    assert client.get("/api/v1/activities/999999999").status_code == 404
+    assert client.delete("/api/v1/activities/999999999").status_code == 404
@@ -0,0 +1,61 @@
+"""ETags must change on every write, including ones that leave the rollup counters as they were."""
+
+
+def _etags(client, user_id):
+    return [
+        client.get(path, params={"user_id": user_id}).headers["etag"]
+        for path in (
+            "/api/v1/activities/",
+            "/api/v1/activities/aggregate",
+            "/api/v1/blood-tests/",
+            "/api/v1/blood-tests/aggregate",
+        )
+    ]
+
+
+def _assert_changed(client, user_id, etags):
+    after = _etags(client, user_id)
+    assert all(a != b for a, b in zip(etags, after)), (etags, after)
+    r = client.get(
+        "/api/v1/activities/", params={"user_id": user_id}, headers={"If-None-Match": etags[0]}
+    )
+    assert r.status_code == 200
+
+
+def _user(client, email):
+    return client.post("/api/v1/users/", json={"email": email}).json()["id"]
+
+
+def test_calories_only_update_changes_etag(client):
+    user_id = _user(client, "calories@example.com")
+    activity = client.post(
+        "/api/v1/activities/",
+        json={
+            "user_id": user_id,
+            "start_time": "2026-01-01T08:00:00",
+            "end_time": "2026-01-01T09:00:00",
+            "steps": 1000,
+            "calories": 100,
+        },
+    ).json()
+    etags = _etags(client, user_id)
+    r = client.put(f"/api/v1/activities/{activity['id']}", json={"calories": 999})
+    assert r.status_code == 200
+    _assert_changed(client, user_id, etags)
+
+
+def test_non_glucose_blood_test_changes_etag(client):
+    user_id = _user(client, "cholesterol@example.com")
+    etags = _etags(client, user_id)
+    r = client.post(
+        "/api/v1/blood-tests/",
+        json={
+            "user_id": user_id,
+            "measured_at": "2026-01-01T08:00:00",
+            "test_type": "cholesterol",
+            "value": 180,
+            "unit": "mg/dL",
+        },
+    )
+    assert r.status_code == 200
+    _assert_changed(client, user_id, etags)
@@ -0,0 +1,113 @@
+"""FHIRClient against a local stand-in server (`httpx.MockTransport`)."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.clients.fhir_client import FHIRClient
+
+PATIENT = {"resourceType": "Patient", "id": "p1"}
+
+
+class StandIn:
+    """Answers Patient reads from a script of responses, recording every request."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def _client(server, **kwargs):
+    kwargs.setdefault("retry_backoff", 0)
+    return FHIRClient("http://fhir.test/base/", transport=httpx.MockTransport(server), **kwargs)
+
+
+def _run(client, *patient_ids):
+    async def go():
+        try:
+            return [await client.fetch_patient(p) for p in patient_ids]
+        finally:
+            await client.aclose()
+
+    return asyncio.run(go())
+
+
+def test_fresh_entries_are_served_from_cache():
+    server = StandIn(httpx.Response(200, json=PATIENT))
+    assert _run(_client(server), "p1", "p1") == [PATIENT, PATIENT]
+    assert len(server.requests) == 1
+    assert str(server.requests[0].url) == "http://fhir.test/base/Patient/p1"
+
+
+def test_lru_evicts_least_recently_used():
+    server = StandIn(*(httpx.Response(200, json=PATIENT) for _ in range(4)))
+    _run(_client(server, cache_size=2), "a", "b", "a", "c", "a", "b")
+    # "b" was evicted by "c"; "a" stayed recent
+    assert [r.url.path for r in server.requests] == [
+        "/base/Patient/a",
+        "/base/Patient/b",
+        "/base/Patient/c",
+        "/base/Patient/b",
+    ]
+
+
+def test_stale_entry_is_revalidated_with_etag():
+    server = StandIn(
+        httpx.Response(200, json=PATIENT, headers={"ETag": 'W/"1"'}),
+        httpx.Response(304),
+        httpx.Response(200, json={**PATIENT, "active": True}, headers={"ETag": 'W/"2"'}),
+    )
+    first, revalidated, changed = _run(_client(server, cache_ttl=0), "p1", "p1", "p1")
+    assert first == revalidated == PATIENT
+    assert changed == {**PATIENT, "active": True}
+    assert "if-none-match" not in server.requests[0].headers
+    assert server.requests[1].headers["if-none-match"] == 'W/"1"'
+    assert server.requests[2].headers["if-none-match"] == 'W/"1"'
+
+
+def test_retries_transient_failures():
+    server = StandIn(
+        httpx.ConnectError("refused"),
+        httpx.Response(503),
+        httpx.Response(200, json=PATIENT),
+    )
+    assert _run(_client(server, retries=2), "p1") == [PATIENT]
+    assert len(server.requests) == 3
+
+
+def test_gives_up_after_retries():
+    server = StandIn(httpx.Response(503), httpx.Response(502))
+    with pytest.raises(httpx.HTTPStatusError):
+        _run(_client(server, retries=1), "p1")
+    assert len(server.requests) == 2
+
+    server = StandIn(httpx.ConnectError("refused"), httpx.ConnectError("refused"))
+    with pytest.raises(httpx.ConnectError):
+        _run(_client(server, retries=1), "p1")
+
+
+def test_client_errors_are_not_retried():
+    server = StandIn(httpx.Response(404))
+    with pytest.raises(httpx.HTTPStatusError):
+        _run(_client(server, retries=3), "missing")
+    assert len(server.requests) == 1
+
+
+def test_backoff_doubles(monkeypatch):
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    server = StandIn(httpx.Response(503), httpx.Response(503), httpx.Response(200, json=PATIENT))
+    _run(_client(server, retries=2, retry_backoff=0.5), "p1")
+    assert delays == [0.5, 1.0]
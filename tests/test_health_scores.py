@@ -0,0 +1,20 @@
+"""Batch scoring: unknown users are reported, bad windows rejected."""
+
+
+def test_fhir_bundle_reports_missing_users(client):
+    user_id = client.post("/api/v1/users/", json={"email": "batch@example.com"}).json()["id"]
+    r = client.post("/api/v1/health/scores", json={"user_ids": [user_id, 999999999], "fhir": True})
+    assert r.status_code == 200
+    resources = [e["resource"] for e in r.json()["entry"]]
+    assert [o["subject"]["reference"] for o in resources[:-1]] == [f"Patient/{user_id}"]
+    outcome = resources[-1]
+    assert outcome["resourceType"] == "OperationOutcome"
+    assert outcome["issue"] == [
+        {"severity": "error", "code": "not-found", "diagnostics": "Patient/999999999 not found"}
+    ]
+
+
+def test_non_positive_days_are_rejected(client):
+    assert client.post("/api/v1/health/scores", json={"days": 0}).status_code == 422
+    assert client.get("/api/v1/health/$export", params={"days": 0}).status_code == 422
+    assert client.get("/api/v1/health/$export", params={"days": -5}).status_code == 422
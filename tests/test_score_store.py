@@ -0,0 +1,22 @@
+"""Live score computations only queue rescores the refresher will actually store."""
+
+from app.services.score_store import dirty_users
+
+
+def test_live_scores_mark_only_stored_windows(client):
+    user_id = client.post("/api/v1/users/", json={"email": "dirty@example.com"}).json()["id"]
+
+    # SCORE_WORKER_ENABLED=false: nothing drains the set, so nothing is kept
+    assert client.get("/api/v1/health/get_health_score", params={"user_id": user_id}).is_success
+    assert not dirty_users.drain()
+
+    dirty_users.tracking = True
+    try:
+        r = client.get("/api/v1/health/get_health_score", params={"user_id": user_id, "days": 7})
+        assert r.is_success
+        assert not dirty_users.drain()
+        r = client.get("/api/v1/health/get_health_score", params={"user_id": user_id, "days": 30})
+        assert r.is_success
+        assert dirty_users.drain() == {user_id}
+    finally:
+        dirty_users.tracking = False
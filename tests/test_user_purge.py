@@ -0,0 +1,68 @@
+"""User purges: writes racing a chunked purge, and background jobs."""
+
+import time
+
+from app.db.session import session_context
+from app.models.activity import PhysicalActivity
+from app.models.daily_rollup import UserDailyRollup
+from app.models.user import User
+from app.services.user_purge import purge_jobs, purge_user
+
+
+def _activity(client, user_id, day):
+    r = client.post(
+        "/api/v1/activities/",
+        json={
+            "user_id": user_id,
+            "start_time": f"2026-01-{day:02d}T08:00:00",
+            "end_time": f"2026-01-{day:02d}T09:00:00",
+            "steps": 100,
+        },
+    )
+    assert r.status_code == 200
+    return r.json()["id"]
+
+
+def _user(client, email, activities):
+    user_id = client.post("/api/v1/users/", json={"email": email}).json()["id"]
+    for day in range(1, activities + 1):
+        _activity(client, user_id, day)
+    return user_id
+
+
+def _leftovers(user_id):
+    with session_context() as db:
+        return (
+            db.get(User, user_id),
+            db.query(PhysicalActivity).filter(PhysicalActivity.user_id == user_id).count(),
+            db.query(UserDailyRollup).filter(UserDailyRollup.user_id == user_id).count(),
+        )
+
+
+def test_writes_during_purge_are_swept(client):
+    user_id = _user(client, "purge-race@example.com", 5)
+    late = []
+
+    def progress(table, count):
+        # An activity landing once its table is done: the user still exists, so it is accepted
+        if table == "blood_tests" and not late:
+            late.append(_activity(client, user_id, 20))
+
+    with session_context() as db:
+        deleted = purge_user(db, user_id, chunk_size=2, progress=progress)
+    assert late
+    assert deleted["physical_activities"] == 6
+    assert _leftovers(user_id) == (None, 0, 0)
+
+
+def test_background_purge_completes(client):
+    user_id = _user(client, "purge-job@example.com", 3)
+    job = purge_jobs.start(user_id, 3)
+    deadline = time.monotonic() + 10
+    while job.status == "running" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    r = client.get(f"/api/v1/users/purges/{job.job_id}").json()
+    assert r["status"] == "done"
+    assert r["deleted"] == r["total"] == 3
+    assert _leftovers(user_id) == (None, 0, 0)
+    assert client.get(f"/api/v1/users/{user_id}").status_code == 404
@@ -0,0 +1,57 @@
+"""Write-behind flushes re-check the user: no orphan rows for users deleted meanwhile."""
+
+import pytest
+
+from app.db.session import session_context
+from app.main import app
+from app.models.activity import PhysicalActivity
+from app.services.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def write_behind(client):
+    queue = WriteBehindQueue(
+        max_size=100, batch_size=10, flush_seconds=0.01, enqueue_timeout=1, receipt_ttl=3600
+    )
+    app.state.write_behind = queue
+    try:
+        yield queue
+    finally:
+        queue.stop()
+        app.state.write_behind = None
+
+
+def _enqueue(client, user_id):
+    r = client.post(
+        "/api/v1/activities/",
+        json={
+            "user_id": user_id,
+            "start_time": "2026-01-01T08:00:00",
+            "end_time": "2026-01-01T09:00:00",
+            "steps": 10,
+        },
+    )
+    assert r.status_code == 202
+    return r.json()["ticket"]
+
+
+def test_flush_fails_writes_for_deleted_users(client, write_behind):
+    kept = client.post("/api/v1/users/", json={"email": "wb-kept@example.com"}).json()["id"]
+    gone = client.post("/api/v1/users/", json={"email": "wb-gone@example.com"}).json()["id"]
+    kept_ticket = _enqueue(client, kept)
+    gone_ticket = _enqueue(client, gone)
+    assert client.get(f"/api/v1/ingest/{gone_ticket}").json()["status"] == "queued"
+
+    # Deleted after its write was accepted, before the flusher ran
+    assert client.delete(f"/api/v1/users/{gone}").json() == {"ok": True}
+    write_behind.start()
+    write_behind.stop()
+
+    persisted = client.get(f"/api/v1/ingest/{kept_ticket}").json()
+    assert persisted["status"] == "persisted"
+    failed = client.get(f"/api/v1/ingest/{gone_ticket}").json()
+    assert failed["status"] == "failed"
+    assert failed["detail"] == f"UserGone: user {gone} no longer exists"
+    with session_context() as db:
+        assert not db.query(PhysicalActivity).filter(PhysicalActivity.user_id == gone).count()
+        assert db.get(PhysicalActivity, persisted["record_id"]).user_id == kept